@@ -12,5 +12,6 @@ class YourApp(Application):
 __all__ tuple defines items that can be imported from aigym.app package.
 """
 from .classes import AIApplication, BackendedAIApplication
+from .serving import ServingAIApplication
 
-__all__ = ('AIApplication', 'BackendedAIApplication')
+__all__ = ('AIApplication', 'BackendedAIApplication', 'ServingAIApplication')
@@ -0,0 +1,218 @@
+"""
+This module defines asyncio based serving application class.
+
+ServingAIApplication accepts requests over a local TCP or unix socket and responds on them with its backend.
+Protocol is line based: each request is a json object on a separate line, each response too.
+Request looks like {"id": 1, "image": [[...], ...]}, response like {"id": 1, "result": [...]} or {"id": 1, "error": "..."}.
+Responses on one connection may come in a different order than requests, use "id" to match them.
+
+Application lifecycle is the same as for other applications:
+    1.Creation with a backend and serving options.
+    2.Running, run(self) serves requests until the application is closed.
+    3.Closing, close(self) stops accepting connections and requests, waits for in-flight requests,
+    closes connections and then stops running.
+"""
+import json
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from threading import Event
+from typing import Any
+
+from numpy import asarray, float32
+
+from aigym.logging import logger
+
+from .classes import BackendedAIApplication
+
+
+class ServingAIApplication(BackendedAIApplication):
+    """
+    Application which serves backend responses over a local socket.
+
+    Synchronous backend.respond_on is offloaded to a thread pool executor,
+    number of requests being responded at once is capped by max_in_flight.
+    """
+    def __init__(self, backend=None, host: str='127.0.0.1', port: int=8765, path: str=None,
+                 max_in_flight: int=64, workers: int=None, shutdown_timeout: float=30.0):
+        """
+        :param backend: object with respond_on method.
+        :param host: host to listen on.
+        :param port: port to listen on, 0 means any free port.
+        :param path: unix socket path, if given host and port are ignored.
+        :param max_in_flight: maximum number of requests being responded at once.
+        :param workers: number of executor threads, defaults to max_in_flight.
+        :param shutdown_timeout: seconds shutdown waits for in-flight requests or None to wait forever,
+        requests which aren't responded by then are cancelled.
+        """
+        super().__init__(backend)
+        self.host = host
+        self.port = port
+        self.path = path
+        self.max_in_flight = max_in_flight
+        self.workers = workers or max_in_flight
+        self.shutdown_timeout = shutdown_timeout
+        self._loop = None
+        self._server = None
+        self._executor = None
+        self._stopping = None
+        self._in_flight = None
+        self._requests_tasks = set()
+        self._connections = {}
+        self._ready = Event()
+
+    @property
+    def address(self) -> Any:
+        """
+        :return: address the application listens on or None if it isn't serving.
+        """
+        if self._server is None or not self._server.sockets:
+            return None
+        return self._server.sockets[0].getsockname()
+
+    def wait_ready(self, timeout: float=None) -> bool:
+        """
+        Waits until the application starts serving.
+
+        :param timeout: seconds to wait or None to wait forever.
+        :return: bool indicating that the application is serving.
+        """
+        return self._ready.wait(timeout)
+
+    def run(self):
+        """
+        Serves requests until the application is closed.
+        """
+        self._loop = asyncio.new_event_loop()
+        try:
+            self._loop.run_until_complete(self.serve())
+        except KeyboardInterrupt:
+            self._loop.run_until_complete(self.shutdown())
+        finally:
+            self._loop.close()
+            self._loop = None
+
+    def close(self):
+        """
+        Requests graceful shutdown of the running application.
+
+        Can be called from any thread.
+        """
+        loop, stopping = self._loop, self._stopping
+        if loop is not None and stopping is not None and not loop.is_closed():
+            loop.call_soon_threadsafe(stopping.set)
+
+    async def serve(self):
+        """
+        Starts server and serves until shutdown is requested.
+        """
+        self._stopping = asyncio.Event()
+        self._in_flight = asyncio.Semaphore(self.max_in_flight)
+        self._executor = ThreadPoolExecutor(self.workers)
+        if self.path is not None:
+            self._server = await asyncio.start_unix_server(self.handle_connection, self.path)
+        else:
+            self._server = await asyncio.start_server(self.handle_connection, self.host, self.port)
+        logger.debug("{} serving on {}".format(self.__class__.__name__, self.address))
+        self._ready.set()
+        try:
+            await self._stopping.wait()
+        finally:
+            await self.shutdown()
+
+    async def shutdown(self):
+        """
+        Stops accepting connections and requests, waits for in-flight requests and only then closes connections.
+        """
+        if self._server is None:
+            return
+        self._ready.clear()
+        self._stopping.set()
+        self._server.close()
+        pending = set()
+        if self._requests_tasks:
+            _, pending = await asyncio.wait(set(self._requests_tasks), timeout=self.shutdown_timeout)
+        for task in pending:
+            task.cancel()
+        if pending:
+            logger.warning("{} cancelled {} requests which weren't responded in {} seconds".format(
+                self.__class__.__name__, len(pending), self.shutdown_timeout
+            ))
+            await asyncio.wait(pending)
+        for writer in self._connections:
+            writer.close()
+        if self._connections:
+            await asyncio.wait(set(self._connections.values()))
+        await self._server.wait_closed()
+        self._server = None
+        self._executor.shutdown(wait=not pending)
+        logger.debug("{} stopped serving".format(self.__class__.__name__))
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """
+        Reads requests lines of a connection and starts responding on each of them.
+
+        :param reader: connection reader.
+        :param writer: connection writer.
+        """
+        self._connections[writer] = closed = asyncio.Future()
+        write_lock = asyncio.Lock()
+        try:
+            while not self._stopping.is_set():
+                line = await reader.readline()
+                if not line or self._stopping.is_set():
+                    break
+                if not line.strip():
+                    continue
+                await self._in_flight.acquire()
+                task = asyncio.ensure_future(self.respond(line, writer, write_lock))
+                self._requests_tasks.add(task)
+                task.add_done_callback(self._requests_tasks.discard)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            del self._connections[writer]
+            closed.set_result(None)
+
+    async def respond(self, line: bytes, writer: asyncio.StreamWriter, write_lock: asyncio.Lock):
+        """
+        Responds on a request line.
+
+        :param line: json encoded request.
+        :param writer: connection writer.
+        :param write_lock: lock of the connection writes.
+        """
+        response = {}
+        try:
+            message = json.loads(line.decode())
+            response['id'] = message.get('id')
+            request = self.decode_request(message)
+            result = await asyncio.get_event_loop().run_in_executor(self._executor, self.backend.respond_on, request)
+            response['result'] = self.encode_response(result)
+        except Exception as exception:
+            response['error'] = "{}: {}".format(exception.__class__.__name__, exception)
+        finally:
+            self._in_flight.release()
+        try:
+            async with write_lock:
+                writer.write((json.dumps(response) + '\n').encode())
+                await writer.drain()
+        except ConnectionError:
+            pass
+
+    def decode_request(self, message: dict) -> Any:
+        """
+        Converts decoded json request to backend request.
+
+        :param message: dict with 'image' key.
+        :return: float32 numpy.ndarray of image.
+        """
+        return asarray(message['image'], float32)
+
+    def encode_response(self, result: Any) -> Any:
+        """
+        Converts backend response to json serializable object.
+
+        :param result: backend response.
+        :return: json serializable object.
+        """
+        return None if result is None else asarray(result).tolist()
@@ -1,13 +1,14 @@
 """
 Defines ready to use backend classes.
 """
-from tflearn.layers.conv import conv_2d, max_pool_2d
-from tflearn.layers.core import input_data, dropout, fully_connected
-from tflearn.layers.estimator import regression
+from numpy import asarray, concatenate, cumsum, split, zeros, float32
 
 from aigym.dataset import Fer2013PreparedDataset
+from aigym.dataset.classifiers import FaceDetector
 
-from .base import DNNBackend
+from .base import DNNBackend, instrumented
+from .config import TrainingConfig
+from .inference import InferencePreprocessor
 
 
 def get_backend_class_by_name(value: str) -> type:
@@ -34,11 +35,39 @@ class EmrecBackend(DNNBackend):
         """
         super().__init__()
         self.prepared_dataset = Fer2013PreparedDataset()
+        self._inference_preprocessor = None
 
+    @property
+    def inference_preprocessor(self) -> InferencePreprocessor:
+        """
+        :return: InferencePreprocessor object used by self.respond_on_image, a default one is created lazily.
+        It wraps images with the same gray border as the dataset preparation does, so faces are cropped alike.
+        """
+        if self._inference_preprocessor is None:
+            first_dimension, second_dimension = self.prepared_dataset.gray_border_dimensions
+            self._inference_preprocessor = InferencePreprocessor(
+                FaceDetector(
+                    scale_factor=self.prepared_dataset.face_detection_scale_factor,
+                    min_neighbors=self.prepared_dataset.face_detection_min_neighbors,
+                ),
+                self.prepared_dataset.face_size,
+                border=first_dimension - second_dimension,
+            )
+        return self._inference_preprocessor
+
+    @inference_preprocessor.setter
+    def inference_preprocessor(self, obj: InferencePreprocessor):
+        self._inference_preprocessor = obj
+
+    @instrumented('build_algorithm')
     def build_algorithm(self):
         """
         Builds architecture of emotion recognition DNN.
         """
+        from tflearn.layers.conv import conv_2d, max_pool_2d
+        from tflearn.layers.core import input_data, dropout, fully_connected
+        from tflearn.layers.estimator import regression
+
         self.log_named('algorithm building started...')
         self.algorithm = input_data([None, self.prepared_dataset.face_size, self.prepared_dataset.face_size, 1])
         self.algorithm = conv_2d(self.algorithm, 64, 5, activation='relu')
@@ -52,37 +81,163 @@ class EmrecBackend(DNNBackend):
         self.algorithm = regression(self.algorithm, optimizer='momentum', loss='categorical_crossentropy')
         self.log_named('algorithm building finished.')
 
-    def learn_model(self):
+    @instrumented('learn_model')
+    def learn_model(self, stream=False, stream_chunk_size=2000, augmentation=None, prefetch=2, workers=1):
         """
         Learns model on prepared fer2013 dataset by using its fit method.
+
+        Batch size, number of epochs and snapshots cadence are taken from self.training_config.
+        In stream mode prepared dataset is memory-mapped and the model is fitted on shuffled chunks of it,
+        which are read, normalized and optionally augmented by background threads while the previous chunk is fitted.
+
+        :param stream: bool indicating to stream dataset from disk instead of loading it to memory.
+        :param stream_chunk_size: number of images fitted at once in stream mode.
+        :param augmentation: aigym.dataset.loaders.Augmentation object or other callable used in stream mode.
+        :param prefetch: number of chunks prepared in advance by each worker thread in stream mode.
+        :param workers: number of worker threads in stream mode.
         """
         self.log_named('model learning started')
-        self.prepared_dataset.load(use_private_test=True)
-        if self.model is not None:
-            self.model.fit(
-                self.prepared_dataset.images, self.prepared_dataset.images_labels,
-                validation_set=(self.prepared_dataset.test_images, self.prepared_dataset.test_images_labels),
-                n_epoch=100,
-                batch_size=50,
-                shuffle=True,
-                show_metric=True,
-                snapshot_step=200,
-                snapshot_epoch=True,
-                run_id="{}Net".format(self.name),
-            )
-            self.log_named('model learning finished')
-        else:
+        if self.model is None:
             self.log_named_warning('model learning failed, because model is None!')
+            return
+        self.forget_loaded_model(self.model)
+        if stream:
+            self.learn_model_streaming(stream_chunk_size, augmentation, prefetch, workers)
+            self.log_named('model learning finished')
+            return
+        self.prepared_dataset.load(use_private_test=True)
+        steps_per_epoch = -(-len(self.prepared_dataset.images) // self.training_config.batch_size)
+        self.model.fit(
+            self.prepared_dataset.images, self.prepared_dataset.images_labels,
+            validation_set=(self.prepared_dataset.test_images, self.prepared_dataset.test_images_labels),
+            n_epoch=self.training_config.epochs,
+            batch_size=self.training_config.batch_size,
+            shuffle=True,
+            show_metric=True,
+            snapshot_step=self.training_config.snapshot_step,
+            snapshot_epoch=self.training_config.snapshot_epoch,
+            run_id="{}Net".format(self.name),
+            callbacks=self.checkpoint_callback(steps_per_epoch),
+        )
+        self.log_named('model learning finished')
+
+    def learn_model_streaming(self, chunk_size=2000, augmentation=None, prefetch=2, workers=1):
+        """
+        Learns model on memory-mapped prepared fer2013 dataset chunk by chunk.
+
+        Checkpoint with validation accuracy is saved at the end of each epoch.
 
+        :param chunk_size: number of images fitted at once.
+        :param augmentation: callable which augments chunks of normalized images or None.
+        :param prefetch: number of chunks prepared in advance by each worker thread.
+        :param workers: number of worker threads.
+        """
+        self.prepared_dataset.load(use_private_test=True, compact=True, mmap=True)
+        chunks = self.prepared_dataset.batches(
+            batch_size=chunk_size, augmentation=augmentation, prefetch=prefetch, workers=workers
+        )
+        test_chunks = self.prepared_dataset.batches('test', batch_size=chunk_size, shuffle=False, prefetch=prefetch)
+        images_number, batch_size = len(self.prepared_dataset.images), self.training_config.batch_size
+        steps_per_epoch = (
+            images_number // chunk_size * -(-chunk_size // batch_size) + -(-(images_number % chunk_size) // batch_size)
+        )
+        for epoch in range(self.training_config.epochs):
+            for images, images_labels in chunks:
+                self.model.fit(
+                    images, images_labels,
+                    n_epoch=1,
+                    batch_size=self.training_config.batch_size,
+                    shuffle=False,
+                    show_metric=True,
+                    snapshot_step=self.training_config.snapshot_step,
+                    snapshot_epoch=False,
+                    run_id="{}Net".format(self.name),
+                    callbacks=self.checkpoint_callback(steps_per_epoch),
+                )
+            accuracy = sum(
+                self.model.evaluate(images, images_labels, batch_size=self.training_config.batch_size)[0] * len(images)
+                for images, images_labels in test_chunks
+            ) / max(len(self.prepared_dataset.test_images), 1)
+            self.log_named('epoch {} finished, validation accuracy {:.4f}'.format(epoch + 1, accuracy))
+            self.save_checkpoint(steps_per_epoch, {'val_acc': accuracy})
+
+    @instrumented('respond_on')
     def respond_on(self, request):
         """
         Uses model to predict emotion on face image.
 
+        If prediction cache is enabled results of equal requests to the same model version are reused.
+        If micro-batching is enabled the request is predicted together with concurrent ones.
+
         :param request: image object.
         :return: prediction result.
         """
         if request is None:
             return None
-        return self.model.predict(
-            request.reshape([-1, self.prepared_dataset.face_size, self.prepared_dataset.face_size, 1])
-        )
+        return self.respond_on_cached(request, self.predict)
+
+    def predict(self, request):
+        """
+        Predicts emotion on face image by the model or by micro-batcher if micro-batching is enabled.
+
+        Only single image requests are micro-batched, others are predicted on their own.
+
+        :param request: image object.
+        :return: prediction result.
+        """
+        face_size = self.prepared_dataset.face_size
+        if self.micro_batcher is not None and asarray(request).size == face_size * face_size:
+            return self.micro_batcher(request)
+        with self.model_in_use() as model:
+            return model.predict(
+                request.reshape([-1, self.prepared_dataset.face_size, self.prepared_dataset.face_size, 1])
+            )
+
+    @instrumented('respond_on_batch')
+    def respond_on_batch(self, requests, batch_size=None):
+        """
+        Uses model to predict emotions on face images in a single forward pass per batch.
+
+        :param requests: sequence of image objects or array of them.
+        :param batch_size: maximum number of images predicted at once, None means all of them.
+        :return: numpy.ndarray of prediction results with (number of images, number of emotions) shape.
+        """
+        images = asarray(requests).reshape([-1, self.prepared_dataset.face_size, self.prepared_dataset.face_size, 1])
+        batch_size = batch_size or max(len(images), 1)
+        with self.model_in_use() as model:
+            return concatenate([
+                asarray(model.predict(images[start:start + batch_size]))
+                for start in range(0, len(images), batch_size)
+            ] or [asarray([]).reshape([0, len(self.prepared_dataset.emotion_choices)])])
+
+    @instrumented('respond_on_image')
+    def respond_on_image(self, image):
+        """
+        Uses model to predict emotions on all faces of a raw image.
+
+        Faces are detected and preprocessed by self.inference_preprocessor
+        and predicted by a single model forward pass.
+
+        :param image: BGR, BGRA, grayscale or encoded image.
+        :return: tuple of two values - numpy.ndarray of (x, y, width, height) faces rectangles,
+        float32 numpy.ndarray of prediction results with (number of faces, number of emotions) shape.
+        """
+        faces, faces_images = self.inference_preprocessor.preprocess(image)
+        if not len(faces):
+            return faces, zeros((0, len(self.prepared_dataset.emotion_choices)), float32)
+        with self.model_in_use() as model:
+            return faces, asarray(model.predict(faces_images), float32)
+
+    def respond_on_micro_batch(self, requests):
+        """
+        Predicts emotions on micro-batch of face images.
+
+        :param requests: sequence of objects of one or several images each.
+        :return: list of prediction results shaped as ones returned by self.respond_on.
+        """
+        requests_images = [
+            asarray(request).reshape([-1, self.prepared_dataset.face_size, self.prepared_dataset.face_size, 1])
+            for request in requests
+        ]
+        results = self.respond_on_batch(concatenate(requests_images))
+        return split(results, cumsum([len(images) for images in requests_images])[:-1])
@@ -2,19 +2,31 @@
 Provides command-line interface to backends of aigym.
 
 usage: python -m aigym.backends [-h] [-visualize backend name] [-train backend name] [-restore--training backend name]
+                                [-plot] [-evaluate split] [-batch-size n] [-epochs n] [-snapshot-step n]
+                                [-tensorboard-verbose n] [-threads n] [-keep-best-checkpoints n] [-stream]
+                                [-benchmark-training backend name]
 
 optional arguments:
   -h, --help                        show this help message and exit
   -visualize backend name           visualize with tensorboard model of backend with a name 'name'
   -train backend name               train model of backend with a name 'name'
   -restore--training backend name   restore model learning of backend with a name 'name'
+  -plot                             plots model prediction matrix using pyplot from matplotlib
+  -evaluate split                   prints emrec model prediction matrix for 'training', 'test' or 'private_test' split
+  -batch-size n                     number of images in a learning step, defaults to 50
+  -epochs n                         number of learning epochs, defaults to 100
+  -snapshot-step n                  number of learning steps between checkpoints, defaults to 200
+  -tensorboard-verbose n            tensorboard verbosity from 0 to 3, defaults to 3
+  -threads n                        number of threads used by tensorflow, defaults to tensorflow default
+  -keep-best-checkpoints n          number of checkpoints with the best validation accuracy kept, defaults to 1
+  -stream                           streams prepared dataset from disk while learning
+  -benchmark-training backend name  prints learning step time of backend with a name 'name' for training settings
 
 """
 from argparse import ArgumentParser
 from subprocess import run
 
-from aigym.backends import get_backend_class_by_name
-from aigym.backends.plots import plot_emrecbackend_model_prediction_matrix
+from aigym.backends import get_backend_class_by_name, TrainingConfig
 
 
 argument_parser = ArgumentParser('aigym backends')
@@ -38,9 +50,48 @@ argument_parser.add_argument(
     action='store_true',
     help="plots model prediction matrix using pyplot from matplotlib",
 )
+argument_parser.add_argument(
+    '-evaluate',
+    metavar='split',
+    choices=('training', 'test', 'private_test'),
+    help="prints emrec model prediction matrix for 'training', 'test' or 'private_test' split",
+)
+
+argument_parser.add_argument(
+    '-batch-size', metavar='n', type=int, default=50, help="number of images in a learning step"
+)
+argument_parser.add_argument('-epochs', metavar='n', type=int, default=100, help="number of learning epochs")
+argument_parser.add_argument(
+    '-snapshot-step', metavar='n', type=int, default=200, help="number of learning steps between checkpoints"
+)
+argument_parser.add_argument(
+    '-tensorboard-verbose', metavar='n', type=int, choices=range(4), default=3, help="tensorboard verbosity from 0 to 3"
+)
+argument_parser.add_argument(
+    '-threads', metavar='n', type=int, default=0, help="number of threads used by tensorflow"
+)
+argument_parser.add_argument(
+    '-keep-best-checkpoints', metavar='n', type=int, default=1,
+    help="number of checkpoints with the best validation accuracy kept",
+)
+argument_parser.add_argument('-stream', action='store_true', help="streams prepared dataset from disk while learning")
+argument_parser.add_argument(
+    '-benchmark-training',
+    metavar='backend name',
+    help="prints learning step time of backend with a name 'name' for training settings",
+)
 
 parsed_arguments = argument_parser.parse_args()
 
+training_config = TrainingConfig(
+    batch_size=parsed_arguments.batch_size,
+    epochs=parsed_arguments.epochs,
+    snapshot_step=parsed_arguments.snapshot_step,
+    tensorboard_verbose=parsed_arguments.tensorboard_verbose,
+    threads=parsed_arguments.threads,
+    keep_best_checkpoints=parsed_arguments.keep_best_checkpoints,
+)
+
 
 if parsed_arguments.visualize:
     backend_class = get_backend_class_by_name(parsed_arguments.visualize)
@@ -54,18 +105,38 @@ if parsed_arguments.train:
     backend_class = get_backend_class_by_name(parsed_arguments.train)
     if backend_class is not None:
         backend = backend_class()
+        backend.training_config = training_config
         backend.build_algorithm()
         backend.create_model()
-        backend.learn_model()
+        backend.learn_model(stream=parsed_arguments.stream)
         backend.save_model()
 
 if parsed_arguments.restore__training:
     backend_class = get_backend_class_by_name(parsed_arguments.restore__training)
     if backend_class is not None:
         backend = backend_class()
+        backend.training_config = training_config
         backend.build_algorithm()
         backend.create_model()
-        backend.restore_model_learning()
+        backend.restore_model_learning(stream=parsed_arguments.stream)
 
 if parsed_arguments.plot:
+    from aigym.backends.plots import plot_emrecbackend_model_prediction_matrix
     plot_emrecbackend_model_prediction_matrix()
+
+if parsed_arguments.evaluate:
+    from aigym.backends.plots import compute_emrecbackend_model_prediction_matrix
+    print(compute_emrecbackend_model_prediction_matrix(split=parsed_arguments.evaluate))
+
+if parsed_arguments.benchmark_training:
+    from aigym.backends.benchmarks import benchmark_training_configs, training_config_variants
+
+    backend_class = get_backend_class_by_name(parsed_arguments.benchmark_training)
+    if backend_class is not None:
+        row_format = "{batch_size:>10} {snapshot_step:>13} {tensorboard_verbose:>19} {threads:>7} {step_time:>13}"
+        print(row_format.format(
+            batch_size='batch size', snapshot_step='snapshot step', tensorboard_verbose='tensorboard verbose',
+            threads='threads', step_time='step time, s',
+        ))
+        for result in benchmark_training_configs(backend_class, training_config_variants(training_config)):
+            print(row_format.format(**dict(result, step_time="{:.4f}".format(result['step_time']))))
@@ -4,14 +4,53 @@ To define your own backend you need to inherit from this class.
 """
 import os
 from abc import ABC, abstractmethod
-from typing import Any, Callable
-from functools import partialmethod
-
-from tflearn import DNN
+from collections import Counter, OrderedDict
+from contextlib import contextmanager
+from threading import Condition, RLock
+from time import perf_counter
+from typing import Any, Callable, Sequence, Tuple
+from functools import partialmethod, wraps
 
 from aigym.logging import logger
 from aigym.logging.mixins import LoggerMixin
+from aigym.metrics import metrics as aigym_metrics
 from aigym.conf.settings import CHECKPOINTS_BASE_DIR, LEARN_LOGS_BASE_DIR, MODELS_BASE_DIR, ASSETS_BASE_DIR
+from aigym.dataset.cache import file_digest
+
+from .batching import MicroBatcher
+from .caching import PredictionCache
+from .checkpoints import CheckpointIndex, create_checkpoint_index_callback, read_checkpoint_state
+from .config import TrainingConfig
+from .registry import ModelRegistry
+
+
+def instrumented(stage: str) -> Callable:
+    """
+    Creates decorator of backend methods which times each call if aigym metrics are enabled.
+
+    Seconds are observed in 'aigym_backend_stage_seconds' histogram and failed calls are counted in
+    'aigym_backend_stage_errors_total' counter, both are labeled by backend name and stage.
+
+    :param stage: stage label value.
+    :return: decorator.
+    """
+    def decorator(method: Callable) -> Callable:
+        @wraps(method)
+        def wrapper(self, *args, **kwargs):
+            if not aigym_metrics.enabled:
+                return method(self, *args, **kwargs)
+            started = perf_counter()
+            try:
+                return method(self, *args, **kwargs)
+            except Exception:
+                aigym_metrics.increment('aigym_backend_stage_errors_total', backend=self.name, stage=stage)
+                raise
+            finally:
+                aigym_metrics.observe(
+                    'aigym_backend_stage_seconds', perf_counter() - started, backend=self.name, stage=stage
+                )
+        return wrapper
+    return decorator
 
 
 class BaseBackend(LoggerMixin, ABC):
@@ -22,6 +61,11 @@ class BaseBackend(LoggerMixin, ABC):
         self._algorithm = None
         self._model = None
         self._prepared_dataset = None
+        self._micro_batcher = None
+        self._prediction_cache = None
+        self._model_version = None
+        self._models_in_use = Counter()
+        self._models_condition = Condition()
         self.setup()
 
     @property
@@ -39,6 +83,7 @@ class BaseBackend(LoggerMixin, ABC):
     @model.setter
     def model(self, obj):
         self._model = obj
+        self.invalidate_prediction_cache()
 
     @property
     def prepared_dataset(self):
@@ -48,6 +93,68 @@ class BaseBackend(LoggerMixin, ABC):
     def prepared_dataset(self, obj):
         self._prepared_dataset = obj
 
+    @property
+    def micro_batcher(self) -> MicroBatcher:
+        return self._micro_batcher
+
+    @property
+    def prediction_cache(self) -> PredictionCache:
+        return self._prediction_cache
+
+    @property
+    def model_version(self) -> int:
+        """
+        :return: registry version of the loaded model or None if the model isn't loaded from registry.
+        """
+        return self._model_version
+
+    @contextmanager
+    def model_in_use(self):
+        """
+        Context manager which gives the current model and counts it as in use until exit.
+
+        Respond on requests through it, so a model swapped out by self.swap_model can be drained.
+
+        :return: the current model.
+        """
+        with self._models_condition:
+            model = self._model
+            self._models_in_use[id(model)] += 1
+        try:
+            yield model
+        finally:
+            with self._models_condition:
+                self._models_in_use[id(model)] -= 1
+                if not self._models_in_use[id(model)]:
+                    del self._models_in_use[id(model)]
+                    self._models_condition.notify_all()
+
+    def swap_model(self, algorithm: Any, model: Any, version: int=None) -> Any:
+        """
+        Atomically makes a model current, calls already using the previous model keep using it.
+
+        :param algorithm: algorithm of the model.
+        :param model: model object.
+        :param version: registry version of the model.
+        :return: the previous model.
+        """
+        with self._models_condition:
+            previous_model = self._model
+            self._algorithm, self._model, self._model_version = algorithm, model, version
+        self.invalidate_prediction_cache()
+        return previous_model
+
+    def wait_model_drained(self, model: Any, timeout: float=None) -> bool:
+        """
+        Waits until no call uses a model.
+
+        :param model: model object.
+        :param timeout: seconds to wait or None to wait forever.
+        :return: bool indicating that the model isn't in use.
+        """
+        with self._models_condition:
+            return self._models_condition.wait_for(lambda: id(model) not in self._models_in_use, timeout)
+
     @property
     def name(self):
         return self.__class__.__name__.replace('Backend', '')
@@ -156,66 +263,376 @@ class BaseBackend(LoggerMixin, ABC):
         """
         raise NotImplementedError
 
+    def respond_on_batch(self, requests: Sequence[Any]) -> Sequence[Any]:
+        """
+        Responds on a batch of requests.
+
+        This implementation responds on each request separately, override it to respond on a batch at once.
+
+        :param requests: sequence of any objects.
+        :return: sequence of responses in the requests order.
+        """
+        return [self.respond_on(request) for request in requests]
+
+    def respond_on_micro_batch(self, requests: Sequence[Any]) -> Sequence[Any]:
+        """
+        Responds on a batch gathered by micro-batcher.
+
+        Each response is shaped as a response returned by self.respond_on.
+
+        :param requests: sequence of any objects.
+        :return: sequence of responses in the requests order.
+        """
+        return self.respond_on_batch(requests)
+
+    def enable_micro_batching(self, max_batch_size: int=32, max_wait: float=0.005):
+        """
+        Starts gathering concurrent self.respond_on calls into batches handled by self.respond_on_micro_batch.
+
+        :param max_batch_size: maximum number of requests in a batch.
+        :param max_wait: maximum number of seconds to wait for a batch to be filled.
+        """
+        self.disable_micro_batching()
+        self._micro_batcher = MicroBatcher(self.respond_on_micro_batch, max_batch_size, max_wait)
+        self.log_named("micro-batching enabled")
+
+    def disable_micro_batching(self):
+        """
+        Stops micro-batching after already submitted requests are responded.
+        """
+        if self._micro_batcher is not None:
+            micro_batcher, self._micro_batcher = self._micro_batcher, None
+            micro_batcher.close()
+            self.log_named("micro-batching disabled")
+
+    def enable_prediction_cache(self, max_size: int=1024, ttl: float=None):
+        """
+        Starts caching results of self.respond_on_cached by request content and model version.
+
+        :param max_size: maximum number of cached results.
+        :param ttl: seconds a result is cached for or None to cache it until eviction.
+        """
+        self._prediction_cache = PredictionCache(max_size, ttl)
+        self.log_named("prediction cache enabled")
+
+    def disable_prediction_cache(self):
+        """
+        Stops caching results and drops cached ones.
+        """
+        if self._prediction_cache is not None:
+            self._prediction_cache = None
+            self.log_named("prediction cache disabled")
+
+    def invalidate_prediction_cache(self):
+        """
+        Drops cached results, it must be called whenever the model gets new weights.
+        """
+        if self._prediction_cache is not None:
+            self._prediction_cache.clear()
+
+    def respond_on_cached(self, request: Any, respond: Callable[[Any], Any]) -> Any:
+        """
+        Responds on request with a cached result of an equal request to the same model version.
+
+        If prediction cache is disabled request is just responded.
+
+        :param request: array-like object.
+        :param respond: callable which takes request and returns uncached result.
+        :return: result.
+        """
+        prediction_cache = self._prediction_cache
+        if prediction_cache is None:
+            return respond(request)
+        generation = prediction_cache.generation
+        key = prediction_cache.key_of(request, self._model_version)
+        hit, result = prediction_cache.get(key)
+        if hit:
+            aigym_metrics.increment('aigym_prediction_cache_hits_total', backend=self.name)
+            return result
+        aigym_metrics.increment('aigym_prediction_cache_misses_total', backend=self.name)
+        result = respond(request)
+        prediction_cache.put(key, result, generation)
+        return result
+
 
 # noinspection PyAbstractClass,PyCallingNonCallable
 class DNNBackend(BaseBackend):
+    """
+    Base class for tflearn DNN backends.
+
+    Learning is configured by self.training_config.
+    Checkpoints are recorded in self.checkpoint_index, so learning can be resumed from the latest one.
+    Saved models are published as versions of self.model_registry.
+    Models of the last loaded_models_cache_size loaded versions are kept in memory with their graphs,
+    so switching back to one of them neither rebuilds the graph nor reads its files again.
+    Sessions of models which are neither current, cached nor in use are closed by self.release_model.
+    """
+    loaded_models_cache_size = 2
+
+    def __init__(self):
+        self._model_registry = None
+        self._loaded_models = OrderedDict()
+        self._loaded_models_lock = RLock()
+        self._training_config = TrainingConfig()
+        self._checkpoint_index = None
+        super().__init__()
+
+    @property
+    def training_config(self) -> TrainingConfig:
+        return self._training_config
+
+    @training_config.setter
+    def training_config(self, obj: TrainingConfig):
+        if obj is not None:
+            self._training_config = obj
+
+    @property
+    def model_registry(self) -> ModelRegistry:
+        if self._model_registry is None:
+            self._model_registry = ModelRegistry(self.model_file_dir_path)
+        return self._model_registry
+
+    @property
+    def checkpoint_path(self) -> str:
+        """
+        :return: path prefix of checkpoints, tflearn appends learning step to it.
+        """
+        return os.path.join(self.checkpoints_dir_path, self.name)
+
+    @property
+    def checkpoint_index(self) -> CheckpointIndex:
+        if self._checkpoint_index is None:
+            self._checkpoint_index = CheckpointIndex(self.checkpoints_dir_path)
+        self._checkpoint_index.keep_best = self.training_config.keep_best_checkpoints
+        return self._checkpoint_index
+
+    @property
+    def architecture(self) -> list:
+        """
+        :return: list of [name, shape] pairs of trainable variables of built algorithm.
+        """
+        if self.algorithm is None:
+            return []
+        return [
+            [variable.name, variable.get_shape().as_list()]
+            for variable in self.algorithm.graph.get_collection('trainable_variables')
+        ]
+
+    @property
+    def dataset_digest(self) -> str:
+        """
+        :return: digest of prepared dataset manifest or None if the manifest doesn't exist.
+        """
+        manifest_filepath = getattr(self.prepared_dataset, 'prepared_manifest_filepath', None)
+        if manifest_filepath is None or not os.path.exists(manifest_filepath):
+            return None
+        return file_digest(manifest_filepath)
+
+    @instrumented('create_model')
     def create_model(self):
         """
         Creates DNN model that is based on built algorithm.
 
         Needed algorithm is builded with self.build_algorithm call.
+        Threads number and tensorboard verbosity are taken from self.training_config.
         """
+        from tflearn import DNN, init_graph
+
         self.log_named("model creation started")
         if self.algorithm is not None:
+            if self.training_config.threads:
+                init_graph(num_cores=self.training_config.threads)
             self.model = DNN(
                 self.algorithm,
-                checkpoint_path=self.checkpoints_dir_path,
-                max_checkpoints=1,
-                tensorboard_verbose=3,
+                checkpoint_path=self.checkpoint_path,
+                max_checkpoints=None,
+                tensorboard_verbose=self.training_config.tensorboard_verbose,
                 tensorboard_dir=self.learn_logs_dir_path
             )
             self.log_named("model creation finished")
         else:
             self.log_named_warning("model was not created, because algorithm is None!")
 
-    def save_model(self):
+    def save_model(self, metrics: dict=None) -> int:
         """
-        Saves created DNN model to a file.
+        Saves created DNN model as a new version of self.model_registry.
 
-        Path to is got from self.model_file_path property.
+        :param metrics: dict of the model metrics recorded in the version metadata.
+        :return: saved version or None if the model is None.
         """
         if self.model is not None:
-            self.model.save(self.model_file_path)
-            self.log_named("model saved")
+            version = self.model_registry.publish(
+                lambda dir_path: self.model.save(os.path.join(dir_path, self.model_filename)),
+                dataset_digest=self.dataset_digest,
+                metrics=metrics,
+                architecture=self.architecture,
+            )
+            self._model_version = version
+            self.invalidate_prediction_cache()
+            self.forget_loaded_model(self.model)
+            self.log_named("model saved as version {}".format(version))
+            return version
         else:
             self.log_named_warning("model file was not saved, because model is None!")
 
-    def load_model(self):
+    @instrumented('load_model')
+    def load_model(self, version: int=None):
         """
-        Loads saved DNN model from a file.
+        Loads saved DNN model of a registry version.
+
+        If the registry has no versions model is loaded from self.model_file_path as before.
+        Artifacts are verified against their checksums before loading.
 
-        Path to is got from self.model_file_path property.
+        :param version: registry version, None means the latest one.
         """
-        if self.model is not None:
-            if os.path.exists(self.model_file_dir_path) and len(os.listdir(self.model_file_dir_path)):
+        if self.model is None:
+            self.log_named_warning("model is None!")
+            return
+        if version is None:
+            version = self.model_registry.latest_version
+        if version is None:
+            if os.path.exists(self.model_file_path + '.index') or os.path.exists(self.model_file_path):
                 self.model.load(self.model_file_path)
+                self.invalidate_prediction_cache()
                 self.log_named("model loaded")
             else:
                 self.log_named_warning("model file doesn't exist!")
-        else:
-            self.log_named_warning("model is None!")
+            return
+        algorithm, model = self.load_model_version(version, new_graph=self._model_version is not None)
+        self.swap_model(algorithm, model, version)
+        self.log_named("model version {} loaded".format(version))
 
-    def restore_model_learning(self):
+    def load_model_version(self, version: int, new_graph: bool=True) -> Tuple[Any, Any]:
         """
-        Restores model learning from the last checkpoint if such exists.
+        Loads model of a registry version without making it current.
+
+        Models of cached versions are returned as they are,
+        only models loaded into a new graph are cached, because self.model may be learned further.
+        Versions are loaded one at a time, so a version isn't loaded twice concurrently.
+
+        :param version: registry version.
+        :param new_graph: bool indicating to build the model in a new graph instead of loading to self.model.
+        :return: tuple of two values - algorithm, model.
         """
-        if self.model is not None:
-            if os.path.exists(self.checkpoints_dir_path):
-                with open(os.path.join(self.checkpoints_dir_path, 'checkpoint')) as checkpoint_file:
-                    self.model.load(checkpoint_file.readline().split(': ')[-1][1:-2])
-                    self.learn_model()
-                    self.save_model()
+        with self._loaded_models_lock:
+            if version in self._loaded_models:
+                self._loaded_models.move_to_end(version)
+                return self._loaded_models[version]
+            self.model_registry.verify(version)
+            algorithm, model = self.build_in_new_graph() if new_graph else (self.algorithm, self.model)
+            model.load(self.model_registry.artifact_path(version, self.model_filename))
+            if new_graph:
+                self._cache_loaded_model(version, algorithm, model)
             else:
-                self.log_named_warning("checkpoints directory doesn't exist!")
-        else:
+                self.forget_loaded_model(model)
+            return algorithm, model
+
+    def build_in_new_graph(self) -> Tuple[Any, Any]:
+        """
+        Builds algorithm and creates model in a new graph by a sibling backend, so self isn't touched.
+
+        :return: tuple of two values - algorithm, model.
+        """
+        from tensorflow import Graph
+
+        backend = self.__class__()
+        with Graph().as_default():
+            backend.build_algorithm()
+            backend.create_model()
+        return backend.algorithm, backend.model
+
+    def forget_loaded_model(self, model: Any):
+        """
+        Removes a model from cache of loaded versions, it must be called before the model weights are changed.
+
+        :param model: model object.
+        """
+        with self._loaded_models_lock:
+            for version, (_, loaded_model) in list(self._loaded_models.items()):
+                if loaded_model is model:
+                    del self._loaded_models[version]
+
+    def release_model(self, model: Any) -> bool:
+        """
+        Closes session of a model, so its graph can be freed, if the model is neither current, cached nor in use.
+
+        :param model: model object.
+        :return: bool indicating that the model was released.
+        """
+        with self._models_condition:
+            if model is self._model or id(model) in self._models_in_use:
+                return False
+        with self._loaded_models_lock:
+            if any(loaded_model is model for _, loaded_model in self._loaded_models.values()):
+                return False
+        session = getattr(model, 'session', None)
+        if session is not None:
+            session.close()
+        return True
+
+    def _cache_loaded_model(self, version: int, algorithm: Any, model: Any):
+        evicted_models = []
+        with self._loaded_models_lock:
+            replaced = self._loaded_models.pop(version, None)
+            if replaced is not None and replaced[1] is not model:
+                evicted_models.append(replaced[1])
+            self._loaded_models[version] = (algorithm, model)
+            while len(self._loaded_models) > self.loaded_models_cache_size:
+                evicted_models.append(self._loaded_models.popitem(last=False)[1][1])
+        for evicted_model in evicted_models:
+            self.release_model(evicted_model)
+
+    def checkpoint_callback(self, steps_per_epoch: int):
+        """
+        :param steps_per_epoch: number of learning steps in an epoch.
+        :return: tflearn callback which records checkpoints made while fitting in self.checkpoint_index.
+        """
+        return create_checkpoint_index_callback(self.checkpoint_index, self.checkpoint_path, steps_per_epoch)
+
+    def save_checkpoint(self, steps_per_epoch: int, metrics: dict=None) -> dict:
+        """
+        Saves checkpoint of the current learning step and records it in self.checkpoint_index.
+
+        :param steps_per_epoch: number of learning steps in an epoch.
+        :param metrics: dict of metrics values of the checkpoint.
+        :return: checkpoint index entry.
+        """
+        step = int(self.model.get_weights(self.model.trainer.global_step))
+        path = "{}-{}".format(self.checkpoint_path, step)
+        self.model.save(path)
+        return self.checkpoint_index.record(path, step // max(steps_per_epoch, 1), step, metrics)
+
+    def restore_model_learning(self, **kwargs):
+        """
+        Restores model learning from the last checkpoint if such exists.
+
+        Checkpoint restores weights, optimizer state and learning step,
+        learning continues for epochs left to self.training_config.epochs.
+        If checkpoint index is absent the latest checkpoint of tensorflow checkpoint state file is used.
+
+        :param kwargs: keyword arguments of self.learn_model.
+        """
+        if self.model is None:
             self.log_named_warning("can't restore model learning process, because model is None!")
+            return
+        entry = self.checkpoint_index.latest
+        if entry is not None:
+            checkpoint_path, epoch = self.checkpoint_index.path_of(entry), entry['epoch']
+        else:
+            checkpoint_paths = read_checkpoint_state(self.checkpoints_dir_path)
+            if not checkpoint_paths:
+                self.log_named_warning("there are no checkpoints to restore model learning from!")
+                return
+            checkpoint_path, epoch = checkpoint_paths[-1], 0
+        self.forget_loaded_model(self.model)
+        self.model.load(checkpoint_path)
+        self.invalidate_prediction_cache()
+        self.log_named("model learning restored from {} after {} epochs".format(checkpoint_path, epoch))
+        training_config = self.training_config
+        if epoch < training_config.epochs:
+            self.training_config = training_config.replace(epochs=training_config.epochs - epoch)
+            try:
+                self.learn_model(**kwargs)
+            finally:
+                self.training_config = training_config
+        self.save_model()
@@ -0,0 +1,134 @@
+"""
+Defines micro-batching of backend requests.
+
+MicroBatcher gathers requests submitted concurrently from different threads
+and handles them by a single call of a batch handler, e.g. by a single model forward pass.
+"""
+from concurrent.futures import Future
+from queue import Queue, Empty
+from threading import Thread, Lock
+from time import monotonic
+from typing import Any, Callable, Sequence
+
+
+class MicroBatcher:
+    """
+    Gathers concurrent requests into batches.
+
+    Batch is handled as soon as it contains max_batch_size requests
+    or max_wait seconds passed since its first request was received.
+    """
+    def __init__(self, handler: Callable[[Sequence[Any]], Sequence[Any]], max_batch_size: int=32,
+                 max_wait: float=0.005):
+        """
+        Starts batching thread.
+
+        :param handler: callable which takes a list of requests and returns a sequence of results in the same order.
+        :param max_batch_size: maximum number of requests in a batch.
+        :param max_wait: maximum number of seconds to wait for a batch to be filled.
+        """
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be positive")
+        self._handler = handler
+        self._max_batch_size = max_batch_size
+        self._max_wait = max_wait
+        self._queue = Queue()
+        self._closed = False
+        self._lock = Lock()
+        self._thread = Thread(target=self._run, name='aigym micro-batcher', daemon=True)
+        self._thread.start()
+
+    @property
+    def max_batch_size(self) -> int:
+        return self._max_batch_size
+
+    @property
+    def max_wait(self) -> float:
+        return self._max_wait
+
+    def submit(self, request: Any) -> Future:
+        """
+        Submits request for batched handling.
+
+        :param request: any object.
+        :return: concurrent.futures.Future object of the request result.
+        """
+        future = Future()
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("can't submit request to closed micro-batcher")
+            self._queue.put((request, future))
+        return future
+
+    def __call__(self, request: Any) -> Any:
+        """
+        Submits request and waits for its result.
+
+        :param request: any object.
+        :return: result of the request.
+        """
+        return self.submit(request).result()
+
+    def close(self):
+        """
+        Handles already submitted requests and stops batching thread.
+        """
+        with self._lock:
+            closing = not self._closed
+            if closing:
+                self._closed = True
+                self._queue.put(None)
+        if closing:
+            self._thread.join()
+
+    def _run(self):
+        """
+        Collects batches from the queue and handles them until the micro-batcher is closed.
+        """
+        stopped = False
+        while not stopped:
+            item = self._queue.get()
+            if item is None:
+                break
+            batch = [item]
+            deadline = monotonic() + self._max_wait
+            while len(batch) < self._max_batch_size:
+                try:
+                    item = self._queue.get(timeout=max(deadline - monotonic(), 0))
+                except Empty:
+                    break
+                if item is None:
+                    stopped = True
+                    break
+                batch.append(item)
+            self._handle(batch)
+        self._fail_queued()
+
+    def _fail_queued(self):
+        """
+        Sets exception to futures of requests left in the queue after the batching thread stopped.
+        """
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except Empty:
+                return
+            if item is not None:
+                item[1].set_exception(RuntimeError("micro-batcher is closed"))
+
+    def _handle(self, batch: list):
+        """
+        Handles a batch and sets results or exception to its futures.
+
+        :param batch: list of (request, future) tuples.
+        """
+        try:
+            results = self._handler([request for request, _ in batch])
+            if len(results) != len(batch):
+                raise RuntimeError("handler returned {} results for {} requests".format(len(results), len(batch)))
+        except Exception as exception:
+            for _, future in batch:
+                future.set_exception(exception)
+        else:
+            for (_, future), result in zip(batch, results):
+                future.set_result(result)
@@ -0,0 +1,96 @@
+"""
+Defines learning benchmarks of backends.
+
+benchmark_training_configs - measures mean learning step time of a DNN backend for each of training configs.
+
+training_config_variants - configs which differ from a base one by a single setting.
+
+relocated_backend_class - subclass of a backend which keeps all its files in a directory.
+"""
+import os
+from tempfile import TemporaryDirectory
+from time import perf_counter
+from typing import Iterable, List
+
+from numpy import eye, float32
+from numpy.random import RandomState
+
+from .config import TrainingConfig
+
+
+def training_config_variants(training_config: TrainingConfig) -> List[TrainingConfig]:
+    """
+    Creates configs which differ from a base one by batch size, tensorboard verbosity or threads number.
+
+    :param training_config: base TrainingConfig object.
+    :return: list of TrainingConfig objects starting from the base one.
+    """
+    cpu_count = os.cpu_count() or 1
+    variants = [training_config]
+    variants += [training_config.replace(batch_size=batch_size) for batch_size in (25, 50, 100, 200)]
+    variants += [training_config.replace(tensorboard_verbose=verbose) for verbose in range(4)]
+    variants += [training_config.replace(threads=threads) for threads in sorted({1, max(cpu_count // 2, 1), cpu_count})]
+    return [variant for index, variant in enumerate(variants) if variant not in variants[:index]]
+
+
+def relocated_backend_class(backend_class: type, dir_path: str) -> type:
+    """
+    :param backend_class: BaseBackend subclass.
+    :param dir_path: path to an existing directory, e.g. a temporary one.
+    :return: subclass of backend_class with the same name whose checkpoints, learning logs and model files
+    are kept in subdirectories of dir_path, so its setup doesn't touch aigym directories.
+    """
+    return type(backend_class.__name__, (backend_class, ), {
+        'checkpoints_dir_path': os.path.join(dir_path, 'checkpoints'),
+        'learn_logs_dir_path': os.path.join(dir_path, 'learn_logs'),
+        'model_file_dir_path': os.path.join(dir_path, 'models'),
+    })
+
+
+def benchmark_training_configs(backend_class: type, training_configs: Iterable[TrainingConfig], steps: int=20,
+                               warmup_steps: int=2) -> List[dict]:
+    """
+    Measures mean learning step time of a backend for each of training configs.
+
+    Each config is measured on a fresh model in its own graph fitted on random images,
+    checkpoints, learning logs and model files are written to a temporary directory.
+    Backend must have prepared_dataset with face_size and emotion_choices attributes, like EmrecBackend.
+
+    :param backend_class: DNNBackend subclass.
+    :param training_configs: iterable of TrainingConfig objects.
+    :param steps: number of measured learning steps.
+    :param warmup_steps: number of learning steps made before measuring.
+    :return: list of dicts with config fields, 'steps' and 'step_time' in seconds, one per config.
+    """
+    from tensorflow import Graph
+
+    results = []
+    with TemporaryDirectory() as dir_path:
+        benchmarked_backend_class = relocated_backend_class(backend_class, dir_path)
+        for training_config in training_configs:
+            with Graph().as_default():
+                backend = benchmarked_backend_class()
+                backend.training_config = training_config
+                backend.build_algorithm()
+                backend.create_model()
+                face_size = backend.prepared_dataset.face_size
+                emotion_number = len(backend.prepared_dataset.emotion_choices)
+                random_state = RandomState(0)
+                size = training_config.batch_size * (steps + warmup_steps)
+                images = random_state.random_sample((size, face_size, face_size, 1)).astype(float32)
+                images_labels = eye(emotion_number, dtype=float32)[random_state.randint(emotion_number, size=size)]
+                fit_kwargs = {
+                    'n_epoch': 1,
+                    'batch_size': training_config.batch_size,
+                    'shuffle': False,
+                    'snapshot_step': training_config.snapshot_step,
+                    'snapshot_epoch': False,
+                }
+                warmup_size = training_config.batch_size * warmup_steps
+                if warmup_size:
+                    backend.model.fit(images[:warmup_size], images_labels[:warmup_size], **fit_kwargs)
+                started = perf_counter()
+                backend.model.fit(images[warmup_size:], images_labels[warmup_size:], **fit_kwargs)
+                elapsed = perf_counter() - started
+            results.append(dict(training_config.to_dict(), steps=steps, step_time=elapsed / steps))
+    return results
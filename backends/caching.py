@@ -0,0 +1,109 @@
+"""
+Defines caching of backend responses.
+
+PredictionCache is a bounded LRU cache with optional expiration of entries,
+keyed by a hash of request array bytes and the model version.
+"""
+from collections import OrderedDict
+from hashlib import blake2b
+from threading import Lock
+from time import monotonic
+from typing import Any, Hashable, Tuple
+
+from numpy import ascontiguousarray
+
+
+class PredictionCache:
+    """
+    Thread-safe cache of predictions.
+
+    Each clear increments generation, results computed before it are not cached by put with an older generation,
+    so a result of a replaced model isn't cached after the model is swapped.
+    Cached results are shared between callers and must not be mutated.
+    """
+    def __init__(self, max_size: int=1024, ttl: float=None):
+        """
+        :param max_size: maximum number of cached results, the least recently used ones are evicted.
+        :param ttl: seconds a result is cached for or None to cache it until eviction.
+        """
+        if max_size < 1:
+            raise ValueError("max_size must be positive")
+        if ttl is not None and ttl <= 0:
+            raise ValueError("ttl must be positive or None")
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.generation = 0
+        self._entries = OrderedDict()
+        self._lock = Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @staticmethod
+    def key_of(request: Any, model_version: int=None) -> Tuple:
+        """
+        :param request: array-like object.
+        :param model_version: version of the model which responds on request.
+        :return: hashable key of request content, dtype, shape and model version.
+        """
+        array = ascontiguousarray(request)
+        return model_version, array.dtype.str, array.shape, blake2b(array.data, digest_size=16).digest()
+
+    def get(self, key: Hashable) -> Tuple[bool, Any]:
+        """
+        :param key: key returned by self.key_of.
+        :return: tuple of two values - bool indicating a hit, cached result or None.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self.ttl is not None and monotonic() - entry[1] > self.ttl:
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return False, None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return True, entry[0]
+
+    def put(self, key: Hashable, result: Any, generation: int=None):
+        """
+        Caches result, the least recently used results are evicted if the cache is full.
+
+        :param key: key returned by self.key_of.
+        :param result: result of responding on request.
+        :param generation: self.generation read before the result was computed or None to cache it anyway.
+        """
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return
+            self._entries[key] = (result, monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        """
+        Removes all cached results.
+        """
+        with self._lock:
+            self._entries.clear()
+            self.generation += 1
+
+    def statistics(self) -> dict:
+        """
+        :return: dict with numbers of 'hits', 'misses', 'evictions', cached results 'size' and 'hit_rate'.
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'size': len(self._entries),
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+            }
@@ -0,0 +1,189 @@
+"""
+Defines index of learning checkpoints.
+
+CheckpointIndex - json file which records epoch, step and metrics of each checkpoint and keeps only the best ones.
+
+read_checkpoint_state - robust reader of tensorflow 'checkpoint' state files.
+
+create_checkpoint_index_callback - creates tflearn callback which records checkpoints made while fitting.
+"""
+import os
+import re
+import json
+from glob import glob, escape
+from time import time
+from typing import List
+
+CHECKPOINT_STATE_LINE_PATTERN = re.compile(r'^\s*(model_checkpoint_path|all_model_checkpoint_paths)\s*:\s*(".*")\s*$')
+
+
+def read_checkpoint_state(dir_path: str) -> List[str]:
+    """
+    Reads paths of checkpoints from tensorflow 'checkpoint' state file of a directory.
+
+    Malformed lines are skipped, relative paths are resolved against the directory.
+
+    :param dir_path: path to a directory with 'checkpoint' file.
+    :return: list of checkpoints paths, the latest one is the last, empty if there is no state file.
+    """
+    state_filepath = os.path.join(dir_path, 'checkpoint')
+    if not os.path.exists(state_filepath):
+        return []
+    model_checkpoint_path, all_model_checkpoint_paths = None, []
+    with open(state_filepath) as state_file:
+        for line in state_file:
+            match = CHECKPOINT_STATE_LINE_PATTERN.match(line)
+            if match is None:
+                continue
+            try:
+                path = json.loads(match.group(2))
+            except ValueError:
+                continue
+            path = os.path.join(dir_path, path)
+            if match.group(1) == 'model_checkpoint_path':
+                model_checkpoint_path = path
+            else:
+                all_model_checkpoint_paths.append(path)
+    if model_checkpoint_path is not None:
+        if model_checkpoint_path in all_model_checkpoint_paths:
+            all_model_checkpoint_paths.remove(model_checkpoint_path)
+        all_model_checkpoint_paths.append(model_checkpoint_path)
+    return all_model_checkpoint_paths
+
+
+class CheckpointIndex:
+    """
+    Index of checkpoints of a directory.
+
+    Each entry is a dict with 'path', 'epoch', 'step', 'metrics' and 'created' keys.
+    Checkpoints files are kept only for the keep_best best entries by metric and the latest entry,
+    which is kept to resume learning from.
+    """
+    filename = 'index.json'
+
+    def __init__(self, dir_path: str, keep_best: int=1, metric: str='val_acc', greater_is_better: bool=True):
+        """
+        Reads index file if it exists.
+
+        :param dir_path: path to the checkpoints directory.
+        :param keep_best: number of the best checkpoints to keep.
+        :param metric: name of the metric checkpoints are compared by.
+        :param greater_is_better: bool indicating that greater metric values are better.
+        """
+        if keep_best < 1:
+            raise ValueError("keep_best must be positive")
+        self.dir_path = dir_path
+        self.keep_best = keep_best
+        self.metric = metric
+        self.greater_is_better = greater_is_better
+        self._entries = []
+        if os.path.exists(self.filepath):
+            try:
+                with open(self.filepath) as index_file:
+                    self._entries = [
+                        dict({'epoch': 0, 'metrics': {}}, **entry) for entry in json.load(index_file)['checkpoints']
+                        if isinstance(entry, dict) and isinstance(entry.get('step'), int) and 'path' in entry
+                    ]
+            except (ValueError, KeyError, TypeError):
+                self._entries = []
+
+    @property
+    def filepath(self) -> str:
+        return os.path.join(self.dir_path, self.filename)
+
+    @property
+    def entries(self) -> List[dict]:
+        """
+        :return: list of entries sorted by step.
+        """
+        return sorted(self._entries, key=lambda entry: entry['step'])
+
+    @property
+    def latest(self) -> dict:
+        """
+        :return: entry of the latest checkpoint or None if there are no checkpoints.
+        """
+        entries = self.entries
+        return entries[-1] if entries else None
+
+    @property
+    def best(self) -> List[dict]:
+        """
+        :return: list of entries with metric values from the best to the worst.
+        """
+        entries = [entry for entry in self._entries if entry['metrics'].get(self.metric) is not None]
+        return sorted(entries, key=lambda entry: entry['metrics'][self.metric], reverse=self.greater_is_better)
+
+    def record(self, path: str, epoch: int, step: int, metrics: dict=None) -> dict:
+        """
+        Records a checkpoint, removes files of checkpoints which aren't kept anymore and saves the index.
+
+        :param path: checkpoint path prefix.
+        :param epoch: number of completed epochs.
+        :param step: learning step of the checkpoint.
+        :param metrics: dict of metrics values of the checkpoint.
+        :return: recorded entry.
+        """
+        entry = {
+            'path': os.path.relpath(path, self.dir_path),
+            'epoch': epoch,
+            'step': step,
+            'metrics': {name: value for name, value in (metrics or {}).items() if value is not None},
+            'created': time(),
+        }
+        self._entries = [existing for existing in self._entries if existing['path'] != entry['path']] + [entry]
+        kept_entries = self.best[:self.keep_best] + [self.latest]
+        for removed_entry in [existing for existing in self._entries if existing not in kept_entries]:
+            self._entries.remove(removed_entry)
+            for filepath in glob(escape(self.path_of(removed_entry)) + '.*'):
+                os.remove(filepath)
+        self.save()
+        return entry
+
+    def path_of(self, entry: dict) -> str:
+        """
+        :param entry: index entry.
+        :return: absolute checkpoint path prefix.
+        """
+        return os.path.join(self.dir_path, entry['path'])
+
+    def save(self):
+        """
+        Atomically writes the index file.
+        """
+        os.makedirs(self.dir_path, exist_ok=True)
+        temporary_filepath = "{}.{}.tmp".format(self.filepath, os.getpid())
+        with open(temporary_filepath, 'w') as index_file:
+            json.dump({'checkpoints': self.entries}, index_file, indent=2, sort_keys=True)
+        os.replace(temporary_filepath, self.filepath)
+
+
+def create_checkpoint_index_callback(checkpoint_index: CheckpointIndex, checkpoint_path: str, steps_per_epoch: int):
+    """
+    Creates tflearn callback which records checkpoints made by tflearn while fitting.
+
+    tflearn saves a snapshot to '<checkpoint_path>-<step>' before the callback is called.
+
+    :param checkpoint_index: CheckpointIndex object.
+    :param checkpoint_path: checkpoint path the model is created with.
+    :param steps_per_epoch: number of learning steps in an epoch.
+    :return: tflearn.callbacks.Callback object.
+    """
+    from tflearn.callbacks import Callback
+
+    class CheckpointIndexCallback(Callback):
+        def on_batch_end(self, training_state, snapshot=False):
+            if snapshot:
+                checkpoint_index.record(
+                    "{}-{}".format(checkpoint_path, training_state.step),
+                    epoch=training_state.step // max(steps_per_epoch, 1),
+                    step=training_state.step,
+                    metrics={
+                        'val_acc': getattr(training_state, 'val_acc', None),
+                        'val_loss': getattr(training_state, 'val_loss', None),
+                        'acc': getattr(training_state, 'acc_value', None),
+                        'loss': getattr(training_state, 'loss_value', None),
+                    },
+                )
+
+    return CheckpointIndexCallback()
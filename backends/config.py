@@ -0,0 +1,59 @@
+"""
+Defines training configuration of backends.
+"""
+
+
+class TrainingConfig:
+    """
+    Settings of model learning.
+
+    batch_size - number of images in a learning step.
+    epochs - number of learning epochs.
+    snapshot_step - number of steps between checkpoints or None to make them only at epochs ends.
+    snapshot_epoch - bool indicating to make checkpoints at epochs ends.
+    tensorboard_verbose - tflearn tensorboard verbosity from 0 (loss and metrics only) to 3 (all histograms).
+    threads - number of threads tensorflow uses for computations, 0 means tensorflow default.
+    keep_best_checkpoints - number of checkpoints with the best validation accuracy which are kept.
+    """
+    fields = (
+        'batch_size', 'epochs', 'snapshot_step', 'snapshot_epoch', 'tensorboard_verbose', 'threads',
+        'keep_best_checkpoints',
+    )
+
+    def __init__(self, batch_size: int=50, epochs: int=100, snapshot_step: int=200, snapshot_epoch: bool=True,
+                 tensorboard_verbose: int=3, threads: int=0, keep_best_checkpoints: int=1):
+        if batch_size < 1 or epochs < 1:
+            raise ValueError("batch_size and epochs must be positive")
+        if snapshot_step is not None and snapshot_step < 1:
+            raise ValueError("snapshot_step must be positive or None")
+        if tensorboard_verbose not in range(4):
+            raise ValueError("tensorboard_verbose must be in [0, 3] range")
+        if threads < 0:
+            raise ValueError("threads must not be negative")
+        if keep_best_checkpoints < 1:
+            raise ValueError("keep_best_checkpoints must be positive")
+        self.batch_size = batch_size
+        self.epochs = epochs
+        self.snapshot_step = snapshot_step
+        self.snapshot_epoch = snapshot_epoch
+        self.tensorboard_verbose = tensorboard_verbose
+        self.threads = threads
+        self.keep_best_checkpoints = keep_best_checkpoints
+
+    def __eq__(self, other):
+        return isinstance(other, TrainingConfig) and self.to_dict() == other.to_dict()
+
+    def __repr__(self):
+        return "{}({})".format(
+            self.__class__.__name__, ', '.join("{}={!r}".format(name, getattr(self, name)) for name in self.fields)
+        )
+
+    def to_dict(self) -> dict:
+        return {name: getattr(self, name) for name in self.fields}
+
+    def replace(self, **kwargs) -> 'TrainingConfig':
+        """
+        :param kwargs: values of fields to replace.
+        :return: new TrainingConfig object with replaced fields values.
+        """
+        return self.__class__(**dict(self.to_dict(), **kwargs))
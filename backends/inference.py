@@ -0,0 +1,150 @@
+"""
+Defines fused inference preprocessing of raw images.
+
+InferencePreprocessor converts a raw image to a float32 batch of all faces found on it in a single pass:
+grayscaling, optional gray border wrapping, faces detection, cropping, resizing and scaling to [0, 1] range.
+Intermediate and output arrays are preallocated per thread and reused between images of the same size.
+"""
+from threading import local
+from typing import Tuple
+
+from numpy import ndarray, asarray, empty, full, argsort, clip, float32, uint8
+
+from aigym.dataset.classifiers import FaceDetector
+
+
+class InferencePreprocessor:
+    """
+    Thread-safe preprocessor of raw images to backend input.
+
+    Arrays returned by preprocess and preprocess_faces are views of buffers of the calling thread,
+    they are overwritten by the next call in the same thread, so copy them to keep.
+    """
+    def __init__(self, face_detector: FaceDetector=None, face_size: int=48, border: int=0, border_value: int=200,
+                 max_faces: int=None):
+        """
+        :param face_detector: FaceDetector object, if None a default one is used.
+        :param face_size: size of a side of preprocessed face.
+        :param border: width of gray border images are wrapped with before detection, e.g. for tight face crops.
+        :param border_value: gray level of the border.
+        :param max_faces: maximum number of the largest faces preprocessed per image or None to preprocess all.
+        """
+        if border < 0:
+            raise ValueError("border must not be negative")
+        if max_faces is not None and max_faces < 1:
+            raise ValueError("max_faces must be positive or None")
+        self.face_detector = face_detector if face_detector is not None else FaceDetector()
+        self.face_size = face_size
+        self.border = border
+        self.border_value = border_value
+        self.max_faces = max_faces
+        self._buffers = local()
+
+    def _buffer(self, name: str, shape: Tuple[int, ...], fill_value: int=None) -> ndarray:
+        """
+        :param name: buffer name.
+        :param shape: buffer shape.
+        :param fill_value: value a new buffer is filled with or None to leave it uninitialized.
+        :return: uint8 buffer of the calling thread, new one if shape differs.
+        """
+        buffer = getattr(self._buffers, name, None)
+        if buffer is None or buffer.shape != shape:
+            buffer = empty(shape, uint8) if fill_value is None else full(shape, fill_value, uint8)
+            setattr(self._buffers, name, buffer)
+        return buffer
+
+    def _faces_buffer(self, faces_number: int) -> ndarray:
+        """
+        :param faces_number: number of faces.
+        :return: float32 buffer of the calling thread for at least faces_number faces, its capacity grows twice.
+        """
+        buffer = getattr(self._buffers, 'faces', None)
+        if buffer is None or len(buffer) < faces_number:
+            capacity = max(faces_number, 2 * (0 if buffer is None else len(buffer)), 1)
+            buffer = empty((capacity, self.face_size, self.face_size, 1), float32)
+            self._buffers.faces = buffer
+        return buffer
+
+    def gray_scale(self, image) -> ndarray:
+        """
+        :param image: BGR, BGRA, grayscale or encoded image.
+        :return: grayscale image, it is the image itself if it is already grayscale.
+        """
+        from cv2 import cvtColor, imdecode, COLOR_BGR2GRAY, COLOR_BGRA2GRAY, IMREAD_GRAYSCALE
+
+        image = asarray(image)
+        if image.ndim == 2:
+            return image
+        if image.ndim == 3 and image.shape[2] in (3, 4):
+            return cvtColor(
+                image, COLOR_BGR2GRAY if image.shape[2] == 3 else COLOR_BGRA2GRAY,
+                dst=self._buffer('gray', image.shape[:2]),
+            )
+        return imdecode(image, IMREAD_GRAYSCALE)
+
+    def wrap_with_border(self, image: ndarray) -> ndarray:
+        """
+        :param image: grayscale image.
+        :return: image wrapped with self.border wide gray border, the image itself if there is no border.
+        """
+        if not self.border:
+            return image
+        height, width = image.shape
+        canvas = self._buffer(
+            'canvas', (height + 2 * self.border, width + 2 * self.border), fill_value=self.border_value
+        )
+        canvas[self.border:self.border + height, self.border:self.border + width] = image
+        return canvas
+
+    def preprocess_faces(self, image: ndarray, faces: ndarray) -> ndarray:
+        """
+        Crops faces from grayscale image and converts them to backend input.
+
+        :param image: grayscale image.
+        :param faces: numpy.ndarray of (x, y, width, height) faces rectangles.
+        :return: float32 numpy.ndarray with (number of faces, face size, face size, 1) shape.
+        """
+        from cv2 import resize, INTER_CUBIC
+
+        faces_images = self._faces_buffer(len(faces))[:len(faces)]
+        resized = self._buffer('resized', (self.face_size, self.face_size))
+        for index, (x, y, width, height) in enumerate(faces):
+            resize(
+                image[y:y + height, x:x + width], (self.face_size, self.face_size),
+                dst=resized, interpolation=INTER_CUBIC,
+            )
+            faces_images[index, :, :, 0] = resized
+        faces_images *= float32(1 / 255)
+        return faces_images
+
+    def preprocess(self, image) -> Tuple[ndarray, ndarray]:
+        """
+        Detects faces on raw image and converts them to backend input.
+
+        :param image: BGR, BGRA, grayscale or encoded image.
+        :return: tuple of two values - numpy.ndarray of (x, y, width, height) faces rectangles clipped to the image,
+        float32 numpy.ndarray of faces with (number of faces, face size, face size, 1) shape.
+        """
+        gray_image = self.gray_scale(image)
+        image = self.wrap_with_border(gray_image)
+        faces = asarray(self.face_detector.detect_faces(image)).astype(int).reshape([-1, 4])
+        if self.max_faces is not None and len(faces) > self.max_faces:
+            faces = faces[argsort(faces[:, 2] * faces[:, 3])[::-1][:self.max_faces]]
+        faces_images = self.preprocess_faces(image, faces)
+        if self.border:
+            faces = self.clip_faces(faces - [self.border, self.border, 0, 0], gray_image.shape)
+        return faces, faces_images
+
+    @staticmethod
+    def clip_faces(faces: ndarray, shape: Tuple[int, ...]) -> ndarray:
+        """
+        :param faces: numpy.ndarray of (x, y, width, height) faces rectangles.
+        :param shape: shape of the image.
+        :return: numpy.ndarray of faces rectangles clipped to the image bounds.
+        """
+        height, width = shape[:2]
+        left, top = clip(faces[:, 0], 0, width), clip(faces[:, 1], 0, height)
+        right, bottom = clip(faces[:, 0] + faces[:, 2], 0, width), clip(faces[:, 1] + faces[:, 3], 0, height)
+        faces = faces.copy()
+        faces[:, 0], faces[:, 1], faces[:, 2], faces[:, 3] = left, top, right - left, bottom - top
+        return faces
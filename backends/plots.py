@@ -1,32 +1,66 @@
-from numpy import zeros, argmax, sum, arange, all
-from matplotlib import pyplot
+from numpy import zeros, bincount, divide, arange, all, ndarray
 
+from aigym.dataset import Fer2013PreparedDataset
 from aigym.backends import EmrecBackend
 
 
-def plot_emrecbackend_model_prediction_matrix():
+def compute_emrecbackend_model_prediction_matrix(emrec_backend: EmrecBackend=None, split: str='training',
+                                                 batch_size: int=1024) -> ndarray:
+    """
+    Computes EmrecBackend model's prediction matrix for a split of its prepared dataset.
+
+    Prepared data are memory-mapped as they were prepared, images are normalized per batch if they are compact.
+    Images are predicted in batches and the matrix is built with numpy over whole arrays.
+    Rows of the matrix are real emotions, columns are predicted ones, each row is normalized to sum up to 1.
+
+    :param emrec_backend: EmrecBackend instance with loaded model, if None it is created and loaded here.
+    Only its prepared_dataset and respond_on_batch are used.
+    :param split: 'training', 'test' or 'private_test'.
+    :param batch_size: number of images predicted at once.
+    :return: numpy.ndarray with (number of emotions, number of emotions) shape.
+    """
+    if split not in ('training', 'test', 'private_test'):
+        raise ValueError("unknown split {}".format(split))
+    if emrec_backend is None:
+        emrec_backend = EmrecBackend()
+        emrec_backend.build_algorithm()
+        emrec_backend.create_model()
+        emrec_backend.load_model()
+    prepared_dataset = emrec_backend.prepared_dataset
+    prepared_dataset.load(use_private_test=split == 'private_test', raw=True, mmap=True)
+    if split == 'training':
+        images, images_labels = prepared_dataset.images, prepared_dataset.images_labels
+    else:
+        images, images_labels = prepared_dataset.test_images, prepared_dataset.test_images_labels
+
+    emotion_number = len(prepared_dataset.emotion_choices)
+    predicted_labels = zeros(len(images), int)
+    for start in range(0, len(images), batch_size):
+        results = emrec_backend.respond_on_batch(prepared_dataset.normalize_images(images[start:start + batch_size]))
+        predicted_labels[start:start + batch_size] = results.argmax(axis=1)
+
+    real_labels = prepared_dataset.to_indices(images_labels).astype(int)
+    data = bincount(
+        real_labels * emotion_number + predicted_labels, minlength=emotion_number * emotion_number
+    ).reshape([emotion_number, emotion_number]).astype(float)
+    totals = data.sum(axis=1, keepdims=True)
+    return divide(data, totals, out=zeros(data.shape), where=totals != 0)
+
+
+def plot_emrecbackend_model_prediction_matrix(split: str='training', show: bool=True, filepath: str=None) -> ndarray:
     """
     Plots EmrecBackend model's prediction matrix for used by it training data.
+
+    :param split: 'training', 'test' or 'private_test'.
+    :param show: boolean flag indicating to display plotted matrix or not.
+    :param filepath: path to a file to which plotted matrix is saved, None means it is not saved.
+    :return: numpy.ndarray of plotted matrix.
     """
-    # Initializing EmrecBackend instance.
-    emrec_backend = EmrecBackend()
-    emrec_backend.build_algorithm()
-    emrec_backend.create_model()
-    emrec_backend.load_model()
-    emrec_backend.prepared_dataset.load()
-
-    emotion_number = len(emrec_backend.prepared_dataset.emotion_choices)
-
-    # Calculating effectiveness
-    data = zeros((emotion_number, emotion_number))
-    for i in range(emrec_backend.prepared_dataset.images.shape[0]):
-        result = emrec_backend.respond_on(emrec_backend.prepared_dataset.images[i])
-        data[argmax(emrec_backend.prepared_dataset.images_labels[i]), result[0].tolist().index(max(result[0]))] += 1
-    #
-    for i in range(len(data)):
-        total = sum(data[i])
-        for x in range(len(data[0])):
-            data[i][x] = data[i][x] / total
+    from matplotlib import pyplot
+
+    data = compute_emrecbackend_model_prediction_matrix(split=split)
+    emotion_choices = Fer2013PreparedDataset.emotion_choices
+    emotion_number = len(emotion_choices)
 
     # Configuring plotting
     plt_color = pyplot.pcolor(data, edgecolors='k', linewidths=4, cmap='Greens', vmin=0.0, vmax=1.0)
@@ -34,8 +68,8 @@ def plot_emrecbackend_model_prediction_matrix():
     ax = plt_color.axes
     ax.set_yticks(arange(emotion_number) + 0.5, minor=False)
     ax.set_xticks(arange(emotion_number) + 0.5, minor=False)
-    ax.set_xticklabels(emrec_backend.prepared_dataset.emotion_choices, minor=False)
-    ax.set_yticklabels(emrec_backend.prepared_dataset.emotion_choices, minor=False)
+    ax.set_xticklabels(emotion_choices, minor=False)
+    ax.set_yticklabels(emotion_choices, minor=False)
     # Populating plotting with data
     for p, color, value in zip(plt_color.get_paths(), plt_color.get_facecolors(), plt_color.get_array()):
         x, y = p.vertices[:-2, :].mean(0)
@@ -47,5 +81,9 @@ def plot_emrecbackend_model_prediction_matrix():
     pyplot.xlabel("Predicted emotion")
     pyplot.ylabel("Real emotion")
 
+    if filepath is not None:
+        pyplot.savefig(filepath)
     # Displaying plotted matrix
-    pyplot.show()
+    if show:
+        pyplot.show()
+    return data
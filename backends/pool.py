@@ -0,0 +1,365 @@
+"""
+Defines multi-process pool of warm backends.
+
+Each BackendWorkerPool worker process builds algorithm, creates and loads model of its own backend once at startup
+and then responds on batches of requests dispatched to it.
+Requests images are passed to workers through shared memory buffers instead of pickling.
+"""
+import multiprocessing
+from concurrent.futures import Future
+from itertools import count, cycle
+from multiprocessing.connection import wait
+from queue import Queue, Empty
+from threading import Thread, Lock, Event
+from typing import Any, Sequence, Tuple
+
+from numpy import asarray, float32, frombuffer, prod
+
+from aigym.logging.mixins import LoggerMixin
+
+DISPATCH_POLICIES = ('round_robin', 'least_loaded')
+
+
+def _buffer_view(buffer, shape: Tuple[int, ...]):
+    """
+    :param buffer: multiprocessing float32 shared array.
+    :param shape: shape of the view.
+    :return: float32 numpy.ndarray view on the beginning of the buffer.
+    """
+    return frombuffer(buffer, float32, int(prod(shape))).reshape(shape)
+
+
+def _run_backend_worker(backend_class: type, worker_index: int, buffers: Sequence, tasks, results):
+    """
+    Runs backend worker process.
+
+    Creates and warms up a backend, then responds on tasks until None task is received.
+    Task is a (request id, slot, images shape) tuple, images are read from the slot buffer.
+    Each result is put to results queue as a (worker index, request id, slot, result, exception) tuple,
+    exceptions which can't be pickled are replaced with RuntimeError with their representation.
+
+    :param backend_class: backend class, its object must have respond_on_batch method.
+    :param worker_index: index of the worker in the pool.
+    :param buffers: sequence of multiprocessing float32 shared arrays, one per slot.
+    :param tasks: multiprocessing queue of tasks.
+    :param results: multiprocessing queue of results.
+    """
+    try:
+        backend = backend_class()
+        backend.build_algorithm()
+        backend.create_model()
+        backend.load_model()
+    except Exception as exception:
+        results.put((worker_index, None, None, None, exception))
+        return
+    results.put((worker_index, None, None, None, None))
+    while True:
+        task = tasks.get()
+        if task is None:
+            break
+        request_id, slot, shape = task
+        try:
+            result, exception = asarray(backend.respond_on_batch(_buffer_view(buffers[slot], shape))), None
+        except Exception as exception_:
+            result, exception = None, exception_
+        try:
+            results.put((worker_index, request_id, slot, result, exception))
+        except Exception as put_exception:
+            results.put((worker_index, request_id, slot, None, RuntimeError(
+                "backend worker result can't be sent: {!r}, {!r}".format(exception, put_exception)
+            )))
+
+
+class BackendWorkerPool(LoggerMixin):
+    """
+    Pool of worker processes with warm backends.
+
+    Each worker has several slots, each slot is a shared memory buffer for a single request.
+    Request waits for a free slot of the chosen worker, so each worker has at most slots requests queued.
+
+    Dispatch policies:
+        'round_robin' - workers are chosen in turn;
+        'least_loaded' - worker with the least number of pending requests is chosen.
+
+    If a worker process dies its pending requests fail with RuntimeError, its slots are freed and it is respawned.
+    Worker which fails to warm up after respawning isn't respawned again and isn't chosen anymore.
+    """
+    def __init__(self, backend_class: type, workers: int=None, dispatch: str='least_loaded',
+                 request_shape: Tuple[int, ...]=(48, 48, 1), max_batch_size: int=32, slots: int=2,
+                 start_method: str=None, timeout: float=None, watch_interval: float=0.1):
+        """
+        :param backend_class: backend class, its object must have respond_on_batch method.
+        :param workers: number of worker processes, defaults to number of CPUs.
+        :param dispatch: one of DISPATCH_POLICIES.
+        :param request_shape: shape of a single image of a request.
+        :param max_batch_size: maximum number of images in a single request.
+        :param slots: number of requests which can be pending on a single worker at once.
+        :param start_method: multiprocessing start method or None for the platform default.
+        :param timeout: seconds respond_on and respond_on_batch wait for a slot and for a result or None.
+        :param watch_interval: seconds between checks of workers processes being alive.
+        """
+        if dispatch not in DISPATCH_POLICIES:
+            raise ValueError("dispatch must be one of {}".format(DISPATCH_POLICIES))
+        if max_batch_size < 1 or slots < 1:
+            raise ValueError("max_batch_size and slots must be positive")
+        self.backend_class = backend_class
+        self.workers_number = workers or multiprocessing.cpu_count()
+        self.dispatch = dispatch
+        self.request_shape = tuple(request_shape)
+        self.max_batch_size = max_batch_size
+        self.slots = slots
+        self.timeout = timeout
+        self.watch_interval = watch_interval
+        self._context = multiprocessing.get_context(start_method)
+        self._processes = []
+        self._buffers = ()
+        self._tasks = []
+        self._free_slots = ()
+        self._loads = []
+        self._warm = []
+        self._alive = []
+        self._results = None
+        self._results_thread = None
+        self._watch_thread = None
+        self._closing = Event()
+        self._futures = {}
+        self._request_ids = count()
+        self._round_robin = None
+        self._lock = Lock()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    @property
+    def loads(self) -> Tuple[int, ...]:
+        """
+        :return: numbers of pending requests of workers.
+        """
+        with self._lock:
+            return tuple(self._loads)
+
+    def start(self):
+        """
+        Starts worker processes and waits until all of their backends are warm.
+        """
+        if self._processes:
+            return
+        slot_size = self.max_batch_size * int(prod(self.request_shape))
+        self._buffers = tuple(
+            tuple(self._context.RawArray('f', slot_size) for _ in range(self.slots))
+            for _ in range(self.workers_number)
+        )
+        self._results = self._context.SimpleQueue()
+        self._tasks = [None] * self.workers_number
+        self._processes = [None] * self.workers_number
+        for worker_index in range(self.workers_number):
+            self._start_process(worker_index)
+        exceptions = [exception for *_, exception in (self._results.get() for _ in self._processes) if exception]
+        if exceptions:
+            self._stop_processes()
+            raise RuntimeError("backend workers failed to start: {}".format(exceptions))
+        self._free_slots = tuple(self._new_free_slots() for _ in range(self.workers_number))
+        self._loads = [0] * self.workers_number
+        self._warm = [True] * self.workers_number
+        self._alive = [True] * self.workers_number
+        self._round_robin = cycle(range(self.workers_number))
+        self._closing.clear()
+        self._results_thread = Thread(target=self._collect_results, name='aigym backend pool results', daemon=True)
+        self._results_thread.start()
+        self._watch_thread = Thread(target=self._watch_workers, name='aigym backend pool watcher', daemon=True)
+        self._watch_thread.start()
+        self.logger.debug("{} backend workers started".format(self.workers_number))
+
+    def close(self):
+        """
+        Stops worker processes after already submitted requests are responded.
+        """
+        if not self._processes:
+            return
+        self._closing.set()
+        self._watch_thread.join()
+        self._stop_processes()
+        self._results.put(None)
+        self._results_thread.join()
+        for future, _, _ in self._futures.values():
+            future.set_exception(RuntimeError("backend worker pool was closed"))
+        self._futures.clear()
+        self.logger.debug("backend workers stopped")
+
+    def submit(self, requests: Any) -> Future:
+        """
+        Submits a batch of images to a worker.
+
+        :param requests: array-like of images with request_shape shape or a single image.
+        :return: concurrent.futures.Future object of numpy.ndarray result of backend respond_on_batch.
+        :raise TimeoutError: if no slot of the chosen worker is freed in self.timeout seconds.
+        """
+        if not self._processes:
+            raise RuntimeError("backend worker pool is not started")
+        images = asarray(requests, float32).reshape((-1, ) + self.request_shape)
+        if len(images) > self.max_batch_size:
+            raise ValueError("request contains more than {} images".format(self.max_batch_size))
+        worker_index = self._choose_worker()
+        try:
+            slot = self._free_slots[worker_index].get(timeout=self.timeout)
+        except Empty:
+            with self._lock:
+                self._loads[worker_index] -= 1
+            raise TimeoutError("no free slot of backend worker {}".format(worker_index))
+        _buffer_view(self._buffers[worker_index][slot], images.shape)[:] = images
+        future = Future()
+        with self._lock:
+            request_id = next(self._request_ids)
+            self._futures[request_id] = (future, worker_index, slot)
+            self._tasks[worker_index].put((request_id, slot, images.shape))
+        return future
+
+    def respond_on_batch(self, requests: Any) -> Any:
+        """
+        Responds on a batch of images by one of workers.
+
+        :param requests: array-like of images.
+        :return: numpy.ndarray result of backend respond_on_batch.
+        """
+        return self.submit(requests).result(self.timeout)
+
+    def respond_on(self, request: Any) -> Any:
+        """
+        Responds on a single image by one of workers.
+
+        :param request: image.
+        :return: numpy.ndarray result of backend respond_on_batch.
+        """
+        if request is None:
+            return None
+        return self.respond_on_batch(request)
+
+    def _new_free_slots(self) -> Queue:
+        free_slots = Queue()
+        for slot in range(self.slots):
+            free_slots.put(slot)
+        return free_slots
+
+    def _choose_worker(self) -> int:
+        """
+        Chooses worker due to dispatch policy and counts the request in its load.
+
+        :return: index of the chosen worker.
+        """
+        with self._lock:
+            alive_indices = [worker_index for worker_index in range(self.workers_number) if self._alive[worker_index]]
+            if not alive_indices:
+                raise RuntimeError("all backend workers are dead")
+            if self.dispatch == 'round_robin':
+                worker_index = next(self._round_robin)
+                while not self._alive[worker_index]:
+                    worker_index = next(self._round_robin)
+            else:
+                worker_index = min(alive_indices, key=self._loads.__getitem__)
+            self._loads[worker_index] += 1
+        return worker_index
+
+    def _start_process(self, worker_index: int):
+        """
+        Starts worker process with a new tasks queue.
+
+        :param worker_index: index of the worker.
+        """
+        self._tasks[worker_index] = self._context.SimpleQueue()
+        self._processes[worker_index] = self._context.Process(
+            target=_run_backend_worker,
+            args=(self.backend_class, worker_index, self._buffers[worker_index], self._tasks[worker_index],
+                  self._results),
+            name="aigym backend worker {}".format(worker_index),
+            daemon=True,
+        )
+        self._processes[worker_index].start()
+
+    def _collect_results(self):
+        """
+        Sets results of workers to requests futures and frees their slots.
+        """
+        while True:
+            item = self._results.get()
+            if item is None:
+                break
+            worker_index, request_id, slot, result, exception = item
+            if request_id is None:
+                self._warm_up_finished(worker_index, exception)
+                continue
+            with self._lock:
+                future = self._futures.pop(request_id, None)
+                if future is None:
+                    continue
+                self._loads[worker_index] -= 1
+            future, _, _ = future
+            self._free_slots[worker_index].put(slot)
+            if exception is not None:
+                future.set_exception(exception)
+            else:
+                future.set_result(result)
+
+    def _warm_up_finished(self, worker_index: int, exception: Exception):
+        """
+        Handles warm up result of a respawned worker.
+
+        :param worker_index: index of the worker.
+        :param exception: exception raised while warming up or None.
+        """
+        with self._lock:
+            self._warm[worker_index] = exception is None
+        if exception is not None:
+            self.logger.warning("backend worker {} failed to warm up: {!r}".format(worker_index, exception))
+
+    def _watch_workers(self):
+        """
+        Fails requests of dead workers and respawns them until the pool is closed.
+        """
+        while not self._closing.is_set():
+            processes = list(self._processes)
+            sentinels = {process.sentinel: worker_index for worker_index, process in enumerate(processes)
+                         if self._alive[worker_index]}
+            for sentinel in wait(list(sentinels), self.watch_interval):
+                if self._closing.is_set():
+                    return
+                self._worker_died(sentinels[sentinel])
+
+    def _worker_died(self, worker_index: int):
+        """
+        Fails pending requests of a dead worker, frees their slots and respawns the worker if it was warm.
+
+        :param worker_index: index of the worker.
+        """
+        process = self._processes[worker_index]
+        process.join()
+        exception = RuntimeError("backend worker {} died with exit code {}".format(worker_index, process.exitcode))
+        with self._lock:
+            failed = [
+                (request_id, future, slot) for request_id, (future, index, slot) in self._futures.items()
+                if index == worker_index
+            ]
+            for request_id, _, _ in failed:
+                del self._futures[request_id]
+            self._loads[worker_index] -= len(failed)
+            respawn = self._warm[worker_index]
+            if respawn:
+                self._warm[worker_index] = False
+                self._start_process(worker_index)
+            else:
+                self._alive[worker_index] = False
+        for _, future, slot in failed:
+            self._free_slots[worker_index].put(slot)
+            future.set_exception(exception)
+        self.logger.warning("{}, it was {}".format(exception, 'respawned' if respawn else 'stopped'))
+
+    def _stop_processes(self):
+        for worker_index, tasks in enumerate(self._tasks):
+            if self._processes[worker_index].is_alive():
+                tasks.put(None)
+        for process in self._processes:
+            process.join()
+        self._processes = []
@@ -0,0 +1,135 @@
+"""
+Defines persistent registry of versioned backend models.
+
+Each model version lives in its own directory with artifact files saved by a backend
+and metadata.json file with checksums of the artifacts, dataset digest, metrics and architecture of the model.
+Versions are positive integers, version directory is published atomically, so a half-saved version is never seen.
+"""
+import os
+import json
+import shutil
+from tempfile import mkdtemp
+from time import time
+from typing import Any, Callable, List
+
+from aigym.dataset.cache import file_digest
+
+
+class ModelRegistry:
+    """
+    Directory backed registry of model versions.
+    """
+    metadata_filename = 'metadata.json'
+
+    def __init__(self, dir_path: str):
+        """
+        :param dir_path: path to the registry directory, it is created on the first publishing.
+        """
+        self._dir_path = dir_path
+        self._metadata = {}
+
+    @property
+    def dir_path(self) -> str:
+        return self._dir_path
+
+    @property
+    def versions(self) -> List[int]:
+        """
+        :return: sorted list of published versions.
+        """
+        if not os.path.isdir(self._dir_path):
+            return []
+        return sorted(
+            int(name) for name in os.listdir(self._dir_path)
+            if name.isdigit() and os.path.exists(os.path.join(self._dir_path, name, self.metadata_filename))
+        )
+
+    @property
+    def latest_version(self) -> int:
+        """
+        :return: the latest published version or None if there are no versions.
+        """
+        versions = self.versions
+        return versions[-1] if versions else None
+
+    def version_dir_path(self, version: int) -> str:
+        return os.path.join(self._dir_path, str(version))
+
+    def artifact_path(self, version: int, filename: str) -> str:
+        return os.path.join(self.version_dir_path(version), filename)
+
+    def metadata(self, version: int) -> dict:
+        """
+        :param version: published version.
+        :return: dict of version metadata.
+        """
+        if version not in self._metadata:
+            try:
+                with open(self.artifact_path(version, self.metadata_filename)) as metadata_file:
+                    self._metadata[version] = json.load(metadata_file)
+            except FileNotFoundError:
+                raise KeyError("model version {} doesn't exist".format(version))
+        return self._metadata[version]
+
+    def publish(self, save: Callable[[str], Any], dataset_digest: str=None, metrics: dict=None,
+                architecture: Any=None) -> int:
+        """
+        Saves artifacts of a new version and publishes it.
+
+        :param save: callable which takes a directory path and saves artifacts to it.
+        :param dataset_digest: digest of the dataset the model was learned on.
+        :param metrics: dict of the model metrics.
+        :param architecture: json serializable description of the model architecture.
+        :return: published version.
+        """
+        os.makedirs(self._dir_path, exist_ok=True)
+        temporary_dir_path = mkdtemp(prefix='.', dir=self._dir_path)
+        try:
+            save(temporary_dir_path)
+            metadata = {
+                'created': time(),
+                'files': {
+                    filename: file_digest(os.path.join(temporary_dir_path, filename))
+                    for filename in sorted(os.listdir(temporary_dir_path))
+                },
+                'dataset_digest': dataset_digest,
+                'metrics': metrics or {},
+                'architecture': architecture,
+            }
+            with open(os.path.join(temporary_dir_path, self.metadata_filename), 'w') as metadata_file:
+                json.dump(metadata, metadata_file, indent=2, sort_keys=True)
+            version = (self.latest_version or 0) + 1
+            while True:
+                try:
+                    os.rename(temporary_dir_path, self.version_dir_path(version))
+                    return version
+                except OSError:
+                    if not os.path.exists(self.version_dir_path(version)):
+                        raise
+                    version += 1
+        finally:
+            if os.path.exists(temporary_dir_path):
+                shutil.rmtree(temporary_dir_path)
+
+    def verify(self, version: int):
+        """
+        Checks artifacts of a version against their recorded checksums.
+
+        :param version: published version.
+        :raise ValueError: if an artifact is missing or its checksum doesn't match.
+        """
+        for filename, digest in self.metadata(version)['files'].items():
+            filepath = self.artifact_path(version, filename)
+            if not os.path.exists(filepath):
+                raise ValueError("artifact {} of model version {} is missing".format(filename, version))
+            if file_digest(filepath) != digest:
+                raise ValueError("artifact {} of model version {} is corrupted".format(filename, version))
+
+    def remove(self, version: int):
+        """
+        Removes a version with its artifacts.
+
+        :param version: published version.
+        """
+        self._metadata.pop(version, None)
+        shutil.rmtree(self.version_dir_path(version))
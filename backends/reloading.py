@@ -0,0 +1,89 @@
+"""
+Defines hot reloading of backend models.
+
+ModelReloader watches model registry of a backend and loads new model versions on a background thread.
+Loaded model is swapped with the current one atomically between requests,
+requests which already use the previous model finish on it.
+"""
+from threading import Thread, Event
+
+from aigym.logging.mixins import LoggerMixin
+
+
+class ModelReloader(LoggerMixin):
+    """
+    Background reloader of backend models.
+
+    Backend must provide model_registry, model_version, load_model_version, swap_model, wait_model_drained
+    and release_model, like DNNBackend does.
+    The previous model is released once it is drained, a model which isn't drained in time is left open.
+    """
+    def __init__(self, backend, interval: float=1.0, version: int=None, drain_timeout: float=30.0):
+        """
+        :param backend: backend whose models are reloaded.
+        :param interval: seconds between registry checks.
+        :param version: registry version to keep loaded, None means the latest one.
+        :param drain_timeout: maximum number of seconds to wait for calls using the previous model.
+        """
+        self.backend = backend
+        self.interval = interval
+        self.version = version
+        self.drain_timeout = drain_timeout
+        self._stopped = Event()
+        self._thread = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+    def start(self):
+        """
+        Starts watching thread.
+        """
+        if self._thread is None:
+            self._stopped.clear()
+            self._thread = Thread(target=self._run, name='aigym model reloader', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """
+        Stops watching thread after the current reload if any.
+        """
+        if self._thread is not None:
+            self._stopped.set()
+            self._thread.join()
+            self._thread = None
+
+    def reload(self, version: int=None) -> bool:
+        """
+        Loads model of a version and swaps it with the current one if it is a different version.
+
+        :param version: registry version, None means self.version or the latest one.
+        :return: bool indicating that the model was swapped.
+        """
+        if version is None:
+            version = self.version if self.version is not None else self.backend.model_registry.latest_version
+        if version is None or version == self.backend.model_version:
+            return False
+        algorithm, model = self.backend.load_model_version(version)
+        previous_version = self.backend.model_version
+        previous_model = self.backend.swap_model(algorithm, model, version)
+        if not self.backend.wait_model_drained(previous_model, self.drain_timeout):
+            self.logger.warning("model version {} is still in use after swap".format(previous_version))
+        else:
+            self.backend.release_model(previous_model)
+        self.logger.debug("model version {} swapped with version {}".format(previous_version, version))
+        return True
+
+    def _run(self):
+        """
+        Reloads model every self.interval seconds until stopped.
+        """
+        while not self._stopped.wait(self.interval):
+            try:
+                self.reload()
+            except Exception as exception:
+                self.logger.warning("model reloading failed: {}".format(exception))
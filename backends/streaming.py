@@ -0,0 +1,312 @@
+"""
+Defines real-time video stream inference pipeline for backends.
+
+VideoStreamPipeline runs decoding, face detection and batched model inference on separate threads
+joined by bounded queues and yields per-frame predictions.
+"""
+from collections import namedtuple, deque
+from queue import Queue, Full, Empty
+from threading import Thread, Event, Lock
+from time import perf_counter
+
+from numpy import asarray, concatenate, cumsum, percentile, split, zeros
+
+from aigym.dataset.classifiers import FaceDetector
+
+from .inference import InferencePreprocessor
+
+FramePrediction = namedtuple('FramePrediction', ('frame_index', 'faces', 'predictions', 'latency'))
+FramePrediction.__doc__ = """
+Prediction of a single frame.
+
+frame_index - index of the frame in the source.
+faces - numpy.ndarray of (x, y, width, height) faces rectangles.
+predictions - numpy.ndarray of backend predictions, one per face.
+latency - seconds passed from reading the frame to its prediction.
+"""
+
+OVERFLOW_POLICIES = ('block', 'drop_oldest', 'skip_newest')
+
+
+class VideoStreamPipeline:
+    """
+    Video stream inference pipeline.
+
+    Stages:
+        1.Decoding of frames from any cv2.VideoCapture source, e.g. camera index, video file or stream url.
+        2.Faces detection and preprocessing of faces to backend input.
+        3.Batched inference of faces of several frames by a single backend.respond_on_batch call.
+    Each stage runs on its own thread, stages and the predictions consumer are joined by bounded queues.
+
+    When a queue is full its overflow policy decides what to do:
+        'block' - waits for a free slot, so frames are never lost;
+        'drop_oldest' - drops the oldest queued frame, so the freshest frames are processed;
+        'skip_newest' - skips the new frame.
+    Predictions which the consumer doesn't keep up with are subject to the same policy.
+    Only every frame_step-th frame of the source is processed at all.
+
+    Pipeline is stopped when iteration ends, e.g. when the consumer breaks out of it, or by stop:
+    waiting frames are discarded, threads are joined and the source is released.
+    """
+
+    # Seconds blocked queue operations wait before checking whether the pipeline is stopped.
+    poll_interval = 0.05
+
+    def __init__(self, backend, source, face_detector: FaceDetector=None, face_size: int=48, queue_size: int=4,
+                 max_batch_size: int=32, frame_step: int=1, overflow_policy: str='drop_oldest',
+                 latency_window: int=1000):
+        """
+        :param backend: object with respond_on_batch method which takes an array of preprocessed faces,
+        its inference_preprocessor, if it has one, is used unless face_detector is given, so faces are cropped alike.
+        :param source: cv2.VideoCapture source.
+        :param face_detector: FaceDetector object, if None a default one or the one of backend preprocessor is used.
+        :param face_size: size of a side of preprocessed face, if backend preprocessor isn't used.
+        :param queue_size: maximum number of frames waiting between stages and of predictions waiting for consumer.
+        :param max_batch_size: maximum number of frames inferred at once.
+        :param frame_step: only every frame_step-th frame is processed.
+        :param overflow_policy: one of OVERFLOW_POLICIES.
+        :param latency_window: number of the last frames latencies statistics are calculated on.
+        """
+        if overflow_policy not in OVERFLOW_POLICIES:
+            raise ValueError("overflow policy must be one of {}".format(OVERFLOW_POLICIES))
+        if frame_step < 1:
+            raise ValueError("frame_step must be positive")
+        self.backend = backend
+        self.source = source
+        backend_preprocessor = getattr(backend, 'inference_preprocessor', None)
+        if face_detector is None and backend_preprocessor is not None:
+            self.preprocessor = backend_preprocessor
+        else:
+            self.preprocessor = InferencePreprocessor(
+                face_detector if face_detector is not None else FaceDetector(), face_size,
+                border=getattr(backend_preprocessor, 'border', 0),
+            )
+        self.face_detector = self.preprocessor.face_detector
+        self.face_size = self.preprocessor.face_size
+        self.max_batch_size = max_batch_size
+        self.frame_step = frame_step
+        self.overflow_policy = overflow_policy
+        self._decoded_frames = Queue(queue_size)
+        self._detected_frames = Queue(queue_size)
+        self._predictions = Queue(queue_size)
+        self._stopped = Event()
+        self._lock = Lock()
+        self._latencies = deque(maxlen=latency_window)
+        self._dropped_frames_number = 0
+        self._threads = ()
+
+    def __iter__(self):
+        """
+        Starts pipeline threads and yields predictions until the source is exhausted or the pipeline is stopped.
+
+        :return: generator of FramePrediction objects in frames order.
+        """
+        self.start()
+        try:
+            while True:
+                item = self._get(self._predictions, discard=False)
+                if item is None:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            self.stop()
+
+    @property
+    def dropped_frames_number(self) -> int:
+        return self._dropped_frames_number
+
+    @property
+    def latency_stats(self) -> dict:
+        """
+        :return: dict of latency statistics in seconds and number of dropped frames.
+        """
+        with self._lock:
+            latencies = asarray(self._latencies)
+        stats = {'frames': len(latencies), 'dropped_frames': self._dropped_frames_number}
+        if len(latencies):
+            stats.update(
+                mean=float(latencies.mean()),
+                p50=float(percentile(latencies, 50)),
+                p95=float(percentile(latencies, 95)),
+                max=float(latencies.max()),
+            )
+        return stats
+
+    def start(self):
+        """
+        Starts pipeline threads.
+        """
+        if self._threads:
+            return
+        self._threads = (
+            Thread(target=self._run_stage, args=(self._decode, ), name='aigym stream decoding', daemon=True),
+            Thread(target=self._run_stage, args=(self._detect, ), name='aigym stream detection', daemon=True),
+            Thread(target=self._run_stage, args=(self._infer, ), name='aigym stream inference', daemon=True),
+        )
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self):
+        """
+        Stops decoding, discards waiting frames, joins pipeline threads and releases the source.
+
+        Iteration in another thread ends after already inferred predictions.
+        """
+        self._stopped.set()
+        for thread in self._threads:
+            thread.join()
+
+    def preprocess(self, frame):
+        """
+        Detects faces on a frame and converts them to backend input.
+
+        Faces are preprocessed in buffers of self.preprocessor and copied out, because they wait for inference.
+
+        :param frame: BGR, BGRA or grayscale frame.
+        :return: tuple of two values - numpy.ndarray of (x, y, width, height) faces rectangles,
+        float32 numpy.ndarray with (number of faces, face size, face size, 1) shape.
+        """
+        faces, faces_images = self.preprocessor.preprocess(frame)
+        return faces, faces_images.copy()
+
+    def _put(self, queue: Queue, item):
+        """
+        Puts item to a queue due to overflow policy.
+
+        :param queue: queue.Queue object.
+        :param item: any object.
+        """
+        if self.overflow_policy == 'block':
+            self._put_blocking(queue, item)
+            return
+        while True:
+            try:
+                queue.put_nowait(item)
+                return
+            except Full:
+                with self._lock:
+                    self._dropped_frames_number += 1
+                if self.overflow_policy == 'skip_newest':
+                    return
+                try:
+                    queue.get_nowait()
+                except Empty:
+                    pass
+
+    def _put_blocking(self, queue: Queue, item) -> bool:
+        """
+        Puts item to a queue waiting for a free slot until the pipeline is stopped.
+
+        :param queue: queue.Queue object.
+        :param item: any object.
+        :return: bool indicating that the item was put.
+        """
+        while not self._stopped.is_set():
+            try:
+                queue.put(item, timeout=self.poll_interval)
+                return True
+            except Full:
+                pass
+        return False
+
+    def _get(self, queue: Queue, discard: bool=True):
+        """
+        Gets item from a queue waiting for it until the pipeline is stopped.
+
+        :param queue: queue.Queue object.
+        :param discard: bool indicating to discard waiting items once the pipeline is stopped.
+        :return: item or None if the pipeline is stopped.
+        """
+        while not (discard and self._stopped.is_set()):
+            try:
+                return queue.get(timeout=self.poll_interval)
+            except Empty:
+                if self._stopped.is_set():
+                    return None
+        return None
+
+    def _run_stage(self, stage):
+        """
+        Runs stage and forwards its exception to the predictions consumer.
+
+        The exception replaces the oldest prediction if there is no room for it.
+
+        :param stage: callable of a pipeline stage.
+        """
+        try:
+            stage()
+        except Exception as exception:
+            while True:
+                try:
+                    self._predictions.put_nowait(exception)
+                    break
+                except Full:
+                    try:
+                        self._predictions.get_nowait()
+                    except Empty:
+                        pass
+            self._stopped.set()
+
+    def _decode(self):
+        """
+        Reads frames from the source and puts every frame_step-th one to decoded frames queue.
+        """
+        from cv2 import VideoCapture
+
+        capture = VideoCapture(self.source)
+        try:
+            frame_index = 0
+            while not self._stopped.is_set():
+                read, frame = capture.read()
+                if not read:
+                    break
+                if frame_index % self.frame_step == 0:
+                    self._put(self._decoded_frames, (frame_index, frame, perf_counter()))
+                frame_index += 1
+        finally:
+            capture.release()
+            self._put_blocking(self._decoded_frames, None)
+
+    def _detect(self):
+        """
+        Detects and preprocesses faces of decoded frames and puts them to detected frames queue.
+        """
+        while True:
+            item = self._get(self._decoded_frames)
+            if item is None:
+                break
+            frame_index, frame, read_time = item
+            faces, faces_images = self.preprocess(frame)
+            self._put(self._detected_frames, (frame_index, faces, faces_images, read_time))
+        self._put_blocking(self._detected_frames, None)
+
+    def _infer(self):
+        """
+        Infers faces of up to max_batch_size detected frames at once and puts frames predictions to the output queue.
+        """
+        finished = False
+        while not finished:
+            item = self._get(self._detected_frames)
+            if item is None:
+                break
+            batch = [item]
+            while len(batch) < self.max_batch_size:
+                try:
+                    item = self._detected_frames.get_nowait()
+                except Empty:
+                    break
+                if item is None:
+                    finished = True
+                    break
+                batch.append(item)
+            faces_images = concatenate([faces_images for _, _, faces_images, _ in batch])
+            predictions = asarray(self.backend.respond_on_batch(faces_images)) if len(faces_images) else zeros((0, 0))
+            frames_predictions = split(predictions, cumsum([len(faces) for _, faces, _, _ in batch])[:-1])
+            for (frame_index, faces, _, read_time), frame_predictions in zip(batch, frames_predictions):
+                latency = perf_counter() - read_time
+                with self._lock:
+                    self._latencies.append(latency)
+                self._put(self._predictions, FramePrediction(frame_index, faces, frame_predictions, latency))
+        self._put_blocking(self._predictions, None)
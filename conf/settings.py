@@ -3,6 +3,10 @@ This module provides aigym settings.
 
 DEBUG - a boolean flag which indicates to turn on or off debugging stuff.
 
+QUEUED_LOGGING - a boolean flag which indicates to write log records in a background thread.
+
+METRICS - a boolean flag which indicates to record timings and counters of backends and datasets stages.
+
 AIGYM_DIR - aigym package directory.
 
 AIGYM_LOGFILE_FILENAME - aigym log file name, defaults to 'aigym.log'
@@ -33,6 +37,10 @@ import os
 
 DEBUG = True
 
+QUEUED_LOGGING = False
+
+METRICS = False
+
 AIGYM_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
 AIGYM_LOGFILE_FILENAME = 'aigym.log'
@@ -5,24 +5,108 @@ They are placed here to make import statements more readable and short.
 """
 from os import path
 from typing import Tuple
+from multiprocessing import Pool
 
-from numpy import ndarray, zeros, uint8, fromstring, array, save, load
-from cv2 import cvtColor, imdecode, COLOR_BGR2GRAY, IMREAD_GRAYSCALE, resize, INTER_CUBIC, error
-from pandas import read_csv
-from PIL.Image import fromarray
-from tqdm import tqdm
+from numpy import ndarray, zeros, uint8, int8, float32, fromstring, save, load, eye, rint
 
-from aigym.conf.settings import RAW_DATASETS_DIR
+from aigym.metrics import metrics
+from aigym.conf.settings import RAW_DATASETS_DIR, HAARCASCADE_FRONTALFACE_CLASSIFIER_FILEPATH
 
 from .abc import RawDataset, PreparedDataset
-from .classifiers import detect_face, FRONTALFACE_CASCADE_CLASSIFIER
-from .mixins import Fer2013DefaultConfigMixin, WithTestLabeledImagesMixin
+from .cache import PreparationCache, file_digest
+from .classifiers import FaceDetector
+from .loaders import BatchLoader
+from .mixins import Fer2013DefaultConfigMixin, WithTestLabeledImagesMixin, StageTimingsMixin
+from .storage import NpyAppender
 
 
-class Fer2013RawDataset(Fer2013DefaultConfigMixin, RawDataset):
+# Raw dataset object owned by a preparation worker process.
+_worker_raw_dataset = None
+
+
+def _init_preparation_worker(raw_dataset_class: type, preparation_attributes: dict):
+    """
+    Initializes preparation worker process.
+
+    Each worker holds its own raw dataset object with its own face detector, which loads its own cascade classifier.
+    Metrics are disabled in workers, stage timings they return are observed by the parent process.
+
+    :param raw_dataset_class: class of raw dataset which is prepared.
+    :param preparation_attributes: dict of attributes values of raw dataset object which is prepared.
+    """
+    global _worker_raw_dataset
+    metrics.disable()
+    _worker_raw_dataset = raw_dataset_class()
+    for attribute_name, attribute_value in preparation_attributes.items():
+        setattr(_worker_raw_dataset, attribute_name, attribute_value)
+
+
+def _convert_in_preparation_worker(row: Tuple) -> Tuple:
+    """
+    Converts (emotion, image data) row in preparation worker process.
+
+    :param row: tuple of emotion scalar and grayscale image data.
+    :return: tuple of three values - label, image, stage timings of the conversion.
+    """
+    label, image = _worker_raw_dataset.to_label_and_image(row)
+    return label, image, _worker_raw_dataset.pop_stage_timings()
+
+
+class Fer2013RawDataset(Fer2013DefaultConfigMixin, StageTimingsMixin, RawDataset):
     """
     OOP representation of fer2013 dataset with default config.
     """
+    def __init__(self, config=None):
+        super().__init__(config)
+        self._face_detector = FaceDetector(
+            HAARCASCADE_FRONTALFACE_CLASSIFIER_FILEPATH,
+            self.face_detection_scale_factor,
+            self.face_detection_min_neighbors,
+        )
+        self._compact = False
+
+    @property
+    def face_detector(self) -> FaceDetector:
+        return self._face_detector
+
+    @face_detector.setter
+    def face_detector(self, obj: FaceDetector):
+        self._face_detector = obj
+
+    @property
+    def compact(self) -> bool:
+        """
+        :return: bool indicating that images are prepared as uint8 and labels as int8 class indices.
+        """
+        return self._compact
+
+    @compact.setter
+    def compact(self, value: bool):
+        self._compact = bool(value)
+
+    @property
+    def preparation_parameters(self) -> dict:
+        """
+        :return: dict of parameters which prepared data depend on, classifier file is identified by its content.
+        """
+        face_detector_parameters = self.face_detector.parameters
+        face_detector_parameters['filepath'] = path.basename(face_detector_parameters['filepath'])
+        return {
+            'face_size': self.face_size,
+            'gray_border_dimensions': self.gray_border_dimensions,
+            'face_detector': self.face_detector.__class__.__name__,
+            'face_detector_parameters': face_detector_parameters,
+            'face_classifier_digest': None if self.face_detector.aligned else file_digest(self.face_detector.filepath),
+            'compact': self.compact,
+        }
+
+    @property
+    def preparation_attributes(self) -> dict:
+        """
+        :return: dict of attributes values which preparation workers must share with self.
+        """
+        return {'compact': self.compact, 'face_detector': self.face_detector}
+
     @staticmethod
     def wrap_with_gray_border(first_dimension: int, second_dimension: int, image):
         """
@@ -44,43 +128,63 @@ class Fer2013RawDataset(Fer2013DefaultConfigMixin, RawDataset):
     @staticmethod
     def gray_scale(image):
         """
+        Grayscales an image.
 
-        :param image:
-        :return:
+        Two dimensional image is treated as already grayscaled one and is returned as is.
+
+        :param image: BGR, grayscale or encoded image object.
+        :return: grayscaled image.
         """
+        if len(image.shape) == 2:
+            return image
+        from cv2 import cvtColor, imdecode, COLOR_BGR2GRAY, IMREAD_GRAYSCALE
         if len(image.shape) > 2 and image.shape[2] == 3:
             image = cvtColor(image, COLOR_BGR2GRAY)
         else:
             image = imdecode(image, IMREAD_GRAYSCALE)
         return image
 
-    def format(self, image, wrap_with_gray_border=True):
+    def format(self, image, wrap_with_gray_border=True, normalize=True):
         """
         Formats an image.
 
         Implemented algorithm contains next steps:
             1.Grayscales the image
-            2.Wraps it with a gray border
+            2.Wraps it with a gray border unless face detector trusts images to be aligned faces
             3.Detects face.
             4.Resizes due to config
-            5.Return formatted image
+            5.Normalizes to [0, 1] range if normalize is True
+            6.Return formatted image
+
+        Time spent in each step is accumulated in self.stage_timings.
 
         :param wrap_with_gray_border: boolean flag indication to wrap with gray border or not.
         :param image: image object.
+        :param normalize: boolean flag indicating to divide resized uint8 image by 255 or not.
         :return: formatted image.
         """
-        image = self.gray_scale(image)
+        from cv2 import resize, INTER_CUBIC, error
 
-        if wrap_with_gray_border:
-            image = self.wrap_with_gray_border(75, 24, image)
+        with self.timed_stage('gray_scale'):
+            image = self.gray_scale(image)
 
-        image = detect_face(image, FRONTALFACE_CASCADE_CLASSIFIER)
+        if wrap_with_gray_border and not self.face_detector.aligned:
+            with self.timed_stage('gray_border'):
+                image = self.wrap_with_gray_border(*self.gray_border_dimensions, image)
+
+        with self.timed_stage('detect_face'):
+            image = self.face_detector.detect(image)
 
         try:
-            return resize(image, (self.face_size, self.face_size), interpolation=INTER_CUBIC) / 255
+            with self.timed_stage('resize'):
+                image = resize(image, (self.face_size, self.face_size), interpolation=INTER_CUBIC)
         except error:
             self.logger.warning("Error occurred during resizing in format of {}".format(self.__class__.__name__))
             return None
+        if normalize:
+            with self.timed_stage('normalize'):
+                image = image / 255
+        return image
 
     def to_vector(self, emotion_scalar: int) -> ndarray:
         """
@@ -93,34 +197,94 @@ class Fer2013RawDataset(Fer2013DefaultConfigMixin, RawDataset):
         result[emotion_scalar] = 1.0
         return result
 
+    def to_label(self, emotion_scalar: int):
+        """
+        Converts emotion scalar value to label.
+
+        :param emotion_scalar: emotion int value.
+        :return: numpy.int8 class index if self.compact is True, otherwise emotion value as vector.
+        """
+        return int8(emotion_scalar) if self.compact else self.to_vector(emotion_scalar)
+
+    def to_images_data(self, pixels) -> ndarray:
+        """
+        Decodes pixels strings to grayscale images data in a single pass.
+
+        :param pixels: iterable of strings with space separated pixels values.
+        :return: numpy.ndarray of uint8 type with (number of strings, face size, face size) shape.
+        """
+        pixels = tuple(pixels)
+        image_size = self.face_size * self.face_size
+        if any(len(row_pixels.split()) != image_size for row_pixels in pixels):
+            raise ValueError("pixels strings must contain {} values each".format(image_size))
+        images_data = fromstring(' '.join(pixels), dtype=uint8, sep=' ')
+        if images_data.size != len(pixels) * image_size:
+            raise ValueError("pixels strings must contain {} values each".format(image_size))
+        return images_data.reshape((len(pixels), self.face_size, self.face_size))
+
     def to_image(self, data):
         """
         Converts data to image.
 
-        :param data: array of binary data
+        :param data: string with space separated pixels values.
         :return: formatted image.
         """
-        return self.format(
-            array(
-                fromarray(
-                    fromstring(str(data), dtype=uint8, sep=' ').reshape((self.face_size, self.face_size))
-                ).convert('RGB')
-            )[:, :, ::-1].copy()
-        )
+        return self.format(self.to_images_data((str(data), ))[0])
+
+    def to_label_and_image(self, row: Tuple) -> Tuple:
+        """
+        Converts (emotion, image data) row to label and image.
+
+        :param row: tuple of emotion scalar and grayscale image data.
+        :return: tuple of two values - label, image.
+        """
+        emotion, image_data = row
+        return self.to_label(emotion), self.format(image_data, normalize=not self.compact)
+
+    def accumulated_stage_timings_of(self, converted_rows):
+        """
+        Accumulates stage timings of rows converted by preparation workers in self.stage_timings.
 
-    def images_and_labels_from(self, data_frame, progress_desc='') -> Tuple:
+        Metrics recorded in worker processes are lost, so timings of each row are observed in this one.
+
+        :param converted_rows: iterable of (label, image, stage timings) tuples.
+        :return: generator of (label, image) tuples.
+        """
+        for label, image, stage_timings in converted_rows:
+            self.stage_timings.update(stage_timings)
+            if metrics.enabled:
+                for stage, seconds in stage_timings.items():
+                    self.observe_stage_timing(stage, seconds)
+            yield label, image
+
+    def images_and_labels_from(self, data_frame, progress_desc='', pool=None, chunk_size=1) -> Tuple:
         """
         Extracts images and labels from data frame.
 
+        If pool is given rows are converted by its worker processes, otherwise in the current one.
+        In both cases images and labels are returned in the original rows order.
+
         :param data_frame: pandas.DataFrame object.
-        :param progress_desc: message to show on left side from progress bar.
+        :param progress_desc: message to show on left side from progress bar, None disables progress bar.
+        :param pool: multiprocessing.Pool object initialized with _init_preparation_worker or None.
+        :param chunk_size: number of rows sent to a worker process at once.
         :return: tuple of two values - images, labels.
         """
+        from tqdm import tqdm
+
         images = []
         labels = []
-        for _, row in tqdm(data_frame.iterrows(), desc=progress_desc):
-            label = self.to_vector(row['emotion'])
-            image = self.to_image(row['pixels'])
+        with self.timed_stage('decode'):
+            images_data = self.to_images_data(data_frame['pixels'])
+        rows = zip(data_frame['emotion'], images_data)
+        if pool is None:
+            converted_rows = map(self.to_label_and_image, rows)
+        else:
+            converted_rows = self.accumulated_stage_timings_of(
+                pool.imap(_convert_in_preparation_worker, rows, chunksize=chunk_size)
+            )
+        progress = tqdm(converted_rows, desc=progress_desc, total=len(data_frame), disable=progress_desc is None)
+        for label, image in progress:
             if image is not None:
                 images.append(image)
                 labels.append(label)
@@ -128,6 +292,83 @@ class Fer2013RawDataset(Fer2013DefaultConfigMixin, RawDataset):
                 pass
         return images, labels
 
+    def splits(self, include_private_test=False) -> Tuple:
+        """
+        Describes dataset splits which are prepared.
+
+        :param include_private_test: boolean flag indicating to include private test split or not.
+        :return: tuple of (usage, images filepath, images labels filepath, progress description) tuples.
+        """
+        splits = (
+            ('Training', self.prepared_images_filepath, self.prepared_images_labels_filepath, 'Converting training'),
+            (
+                'PublicTest',
+                self.prepared_test_images_filepath,
+                self.prepared_test_images_labels_filepath,
+                'Converting test',
+            ),
+        )
+        if include_private_test:
+            splits += (
+                (
+                    'PrivateTest',
+                    self.prepared_private_test_images_filepath,
+                    self.prepared_private_test_images_labels_filepath,
+                    'Converting private test',
+                ),
+            )
+        return splits
+
+    def prepare_in_memory(self, splits: Tuple, pool=None, chunk_size=1):
+        """
+        Prepares splits by reading whole raw dataset file at once.
+
+        :param splits: tuple of splits descriptions returned by self.splits.
+        :param pool: multiprocessing.Pool object initialized with _init_preparation_worker or None.
+        :param chunk_size: number of rows sent to a worker process at once.
+        """
+        from pandas import read_csv
+
+        raw_data = read_csv(path.join(RAW_DATASETS_DIR, self.filename))
+        for usage, images_filepath, images_labels_filepath, progress_desc in splits:
+            images, images_labels = self.images_and_labels_from(
+                raw_data.loc[raw_data['Usage'] == usage], progress_desc, pool, chunk_size
+            )
+            save(images_filepath, images)
+            save(images_labels_filepath, images_labels)
+
+    def prepare_streaming(self, splits: Tuple, pool=None, chunk_size=1, stream_chunk_size=4096):
+        """
+        Prepares splits by reading raw dataset file chunk by chunk.
+
+        Rows of each chunk are routed to their splits and converted results are appended to the splits files,
+        so peak memory usage is bounded by chunk size rather than by dataset size.
+
+        :param splits: tuple of splits descriptions returned by self.splits.
+        :param pool: multiprocessing.Pool object initialized with _init_preparation_worker or None.
+        :param chunk_size: number of rows sent to a worker process at once.
+        :param stream_chunk_size: number of rows read from raw dataset file at once.
+        """
+        from pandas import read_csv
+        from tqdm import tqdm
+
+        appenders = []
+        try:
+            for usage, images_filepath, images_labels_filepath, _ in splits:
+                appenders.append((usage, NpyAppender(images_filepath), NpyAppender(images_labels_filepath)))
+            raw_data_chunks = read_csv(path.join(RAW_DATASETS_DIR, self.filename), chunksize=stream_chunk_size)
+            for raw_data_chunk in tqdm(raw_data_chunks, desc='Converting chunks'):
+                for usage, images_appender, images_labels_appender in appenders:
+                    images, images_labels = self.images_and_labels_from(
+                        raw_data_chunk.loc[raw_data_chunk['Usage'] == usage], None, pool, chunk_size
+                    )
+                    images_appender.append(images)
+                    images_labels_appender.append(images_labels)
+        finally:
+            for _, images_appender, images_labels_appender in appenders:
+                images_appender.close()
+                images_labels_appender.close()
+
     def prepare(self, *args, **kwargs):
         """
         Prepares dataset.
@@ -136,27 +377,71 @@ class Fer2013RawDataset(Fer2013DefaultConfigMixin, RawDataset):
         Dataset filename is taken from self.filename.
         In the last step saves extracted data to corresponding files.
         Names of that files are defined in config mixin.
+
+        Rows can be converted by a pool of worker processes.
+        Number of them is taken from 'workers' keyword argument, defaults to 1 which means no pool is used.
+        Number of rows sent to a worker at once is taken from 'chunk_size' keyword argument, defaults to 64.
+
+        If 'stream' keyword argument is True raw dataset file is read and converted chunk by chunk.
+        Number of rows in such chunk is taken from 'stream_chunk_size' keyword argument, defaults to 4096.
+
+        If 'compact' keyword argument is True images are saved as uint8 and labels as int8 class indices.
+
+        Faces are detected by a detector taken from 'face_detector' keyword argument, defaults to self.face_detector.
+        Time spent in each preparation stage is logged at the end and returned.
+
+        Splits which were prepared from the same raw file content with the same preparation parameters are skipped,
+        unless 'force' keyword argument is True.
+
+        :return: collections.Counter of seconds spent in each preparation stage, empty if nothing was prepared.
         """
-        raw_data = read_csv(path.join(RAW_DATASETS_DIR, self.filename))
+        workers = kwargs.get('workers', 1)
+        chunk_size = kwargs.get('chunk_size', 64)
+        self.compact = kwargs.get('compact', False)
+        if kwargs.get('face_detector') is not None:
+            self.face_detector = kwargs['face_detector']
+
+        cache = PreparationCache(self.prepared_manifest_filepath, RAW_DATASETS_DIR)
+        parameters = self.preparation_parameters
+        parameters['raw_file_digest'] = cache.digest_of(path.join(RAW_DATASETS_DIR, self.filename))
+        splits_keys = {}
+        splits = []
+        for split in self.splits(kwargs.get('include_private_test', False)):
+            usage, images_filepath, images_labels_filepath, _ = split
+            splits_keys[usage] = cache.key(usage, parameters)
+            if kwargs.get('force', False) or not cache.is_fresh(
+                usage, splits_keys[usage], (images_filepath, images_labels_filepath)
+            ):
+                cache.update(usage, None)
+                splits.append(split)
+        cache.save()
+        if not splits:
+            self.logger.debug("{} prepared splits are up to date.".format(self.__class__.__name__))
+            return self.pop_stage_timings()
+
+        pool = None
+        if workers > 1:
+            pool = Pool(workers, _init_preparation_worker, (self.__class__, self.preparation_attributes))
 
-        images, images_labels = self.images_and_labels_from(
-            raw_data.loc[raw_data['Usage'] == 'Training'], 'Converting training'
-        )
-        test_images, test_images_labels = self.images_and_labels_from(
-            raw_data.loc[raw_data['Usage'] == 'PublicTest'], 'Converting test'
-        )
+        try:
+            if kwargs.get('stream', False):
+                self.prepare_streaming(splits, pool, chunk_size, kwargs.get('stream_chunk_size', 4096))
+            else:
+                self.prepare_in_memory(splits, pool, chunk_size)
+        finally:
+            if pool is not None:
+                pool.close()
+                pool.join()
 
-        if kwargs.get('include_private_test', False):
-            private_test_images, private_test_images_labels = self.images_and_labels_from(
-                raw_data.loc[raw_data['Usage'] == 'PrivateTest'], 'Converting private test'
-            )
-            save(self.prepared_private_test_images_filepath, private_test_images)
-            save(self.prepared_private_test_images_labels_filepath, private_test_images_labels)
+        for usage, _, _, _ in splits:
+            cache.update(usage, splits_keys[usage])
+        cache.save()
 
-        save(self.prepared_images_filepath, images)
-        save(self.prepared_images_labels_filepath, images_labels)
-        save(self.prepared_test_images_filepath, test_images)
-        save(self.prepared_test_images_labels_filepath, test_images_labels)
+        stage_timings = self.pop_stage_timings()
+        self.logger.debug("{} preparation stages timings: {}".format(self.__class__.__name__, ', '.join(
+            "{} {:.3f}s".format(stage, seconds) for stage, seconds in stage_timings.items()
+        )))
+        return stage_timings
 
 
 class Fer2013PreparedDataset(Fer2013DefaultConfigMixin, WithTestLabeledImagesMixin, PreparedDataset):
@@ -174,9 +459,21 @@ class Fer2013PreparedDataset(Fer2013DefaultConfigMixin, WithTestLabeledImagesMix
 
         Loaded data are stored in corresponding properties of self.
         Files names are defined in config mixin.
+
+        If 'mmap' keyword argument is True files are memory-mapped in read-only mode instead of being read,
+        so loaded arrays share page cache with other processes which map the same files.
+
+        If 'compact' keyword argument is True images are loaded as uint8 and labels as int8 class indices,
+        so they can be normalized lazily per batch with self.normalize_images and self.to_vectors.
+        If data weren't prepared compactly and 'mmap' is True as well, images are kept memory-mapped as they are,
+        because converting them would read the whole file into memory, and they are used by batches as they are.
+        Otherwise compactly prepared data are normalized while loading.
+        If 'raw' keyword argument is True data are loaded as they were prepared, compactly or not.
         """
-        self.images = load(self.prepared_images_filepath)
-        self.images_labels = load(self.prepared_images_labels_filepath)
+        mmap_mode = 'r' if kwargs.get('mmap', False) else None
+
+        self.images = load(self.prepared_images_filepath, mmap_mode=mmap_mode)
+        self.images_labels = load(self.prepared_images_labels_filepath, mmap_mode=mmap_mode)
 
         if kwargs.get('use_private_test', False):
             prepared_test_images_filepath = self.prepared_private_test_images_filepath
@@ -185,11 +482,105 @@ class Fer2013PreparedDataset(Fer2013DefaultConfigMixin, WithTestLabeledImagesMix
             prepared_test_images_filepath = self.prepared_test_images_filepath
             prepared_test_images_labels_filepath = self.prepared_test_images_labels_filepath
 
-        self.test_images = load(prepared_test_images_filepath)
-        self.test_images_labels = load(prepared_test_images_labels_filepath)
+        self.test_images = load(prepared_test_images_filepath, mmap_mode=mmap_mode)
+        self.test_images_labels = load(prepared_test_images_labels_filepath, mmap_mode=mmap_mode)
+
+        if kwargs.get('raw', False):
+            pass
+        elif kwargs.get('compact', False):
+            if mmap_mode is None:
+                self.images = self.compact_images(self.images)
+                self.test_images = self.compact_images(self.test_images)
+            self.images_labels = self.to_indices(self.images_labels)
+            self.test_images_labels = self.to_indices(self.test_images_labels)
+        else:
+            self.images, self.test_images = self.normalize_images(self.images), self.normalize_images(self.test_images)
+            self.images_labels = self.to_vectors(self.images_labels)
+            self.test_images_labels = self.to_vectors(self.test_images_labels)
 
         self.images = self.images.reshape([-1, self.face_size, self.face_size, 1])
-        self.images_labels = self.images_labels.reshape([-1, len(self.emotion_choices)])
-
         self.test_images = self.test_images.reshape([-1, self.face_size, self.face_size, 1])
-        self.test_images_labels = self.test_images_labels.reshape([-1, len(self.emotion_choices)])
+
+    def batches(self, split='training', batch_size=50, shuffle=True, **kwargs) -> BatchLoader:
+        """
+        Creates loader of normalized mini-batches of a loaded split.
+
+        Load the dataset with 'compact' and 'mmap' keyword arguments to stream batches from disk,
+        so only prefetched batches are held in memory as normalized float32 arrays.
+
+        :param split: 'training' or 'test'.
+        :param batch_size: number of images in a batch.
+        :param shuffle: bool indicating to shuffle images every epoch.
+        :param kwargs: other BatchLoader keyword arguments, e.g. augmentation, prefetch, workers, seed.
+        :return: BatchLoader object.
+        """
+        if split == 'training':
+            images, labels = self.images, self.images_labels
+        elif split == 'test':
+            images, labels = self.test_images, self.test_images_labels
+        else:
+            raise ValueError("unknown split {}".format(split))
+        return BatchLoader(images, labels, batch_size, shuffle, transform=self.to_normalized_batch, **kwargs)
+
+    def to_normalized_batch(self, images: ndarray, labels: ndarray) -> Tuple[ndarray, ndarray]:
+        """
+        :param images: numpy.ndarray of images of a batch.
+        :param labels: numpy.ndarray of labels of a batch.
+        :return: tuple of two values - float32 normalized images, labels vectors.
+        """
+        return self.normalize_images(images).astype(float32, copy=False), self.to_vectors(labels)
+
+    @staticmethod
+    def normalize_images(images: ndarray) -> ndarray:
+        """
+        Normalizes compact uint8 images to float32 values in [0, 1] range.
+
+        Already normalized images are returned as is.
+
+        :param images: numpy.ndarray of images.
+        :return: numpy.ndarray of normalized images.
+        """
+        if images.dtype != uint8:
+            return images
+        return images.astype(float32) / 255
+
+    @staticmethod
+    def compact_images(images: ndarray) -> ndarray:
+        """
+        Converts normalized images to compact uint8 ones.
+
+        Already compact images are returned as is.
+
+        :param images: numpy.ndarray of images.
+        :return: numpy.ndarray of uint8 images.
+        """
+        if images.dtype == uint8:
+            return images
+        return rint(images * 255).astype(uint8)
+
+    def to_vectors(self, labels: ndarray) -> ndarray:
+        """
+        Converts class indices labels to one-hot vectors.
+
+        Labels which are vectors already are returned as is.
+
+        :param labels: numpy.ndarray of labels.
+        :return: numpy.ndarray of labels vectors with (number of labels, number of emotions) shape.
+        """
+        if labels.ndim != 1 or labels.dtype.kind == 'f':
+            return labels.reshape([-1, len(self.emotion_choices)])
+        return eye(len(self.emotion_choices), dtype=float32)[labels]
+
+    @staticmethod
+    def to_indices(labels: ndarray) -> ndarray:
+        """
+        Converts one-hot vectors labels to int8 class indices.
+
+        Labels which are class indices already are returned as is.
+
+        :param labels: numpy.ndarray of labels.
+        :return: numpy.ndarray of int8 class indices.
+        """
+        if labels.ndim == 1:
+            return labels
+        return labels.argmax(axis=1).astype(int8)
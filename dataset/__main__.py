@@ -1,35 +1,109 @@
 """
-usage: python -m aigym.dataset [-h] [-download url] [-prepare dataset name]
+usage: python -m aigym.dataset [-h] [-download url] [-segments n] [-sha256 digest] [-prepare dataset name]
+                               [-workers n] [-chunk-size n] [-stream] [-stream-chunk-size n] [-compact] [-force]
+                               [-scale-factor f] [-min-neighbors n] [-min-face-size n] [-max-face-size n]
+                               [-detection-downscale f] [-trust-aligned]
 
 optional arguments:
   -h, --help                show this help message and exit
   -download url             download dataset file from url
+  -segments n               number of parallel ranged segments used for downloading, defaults to 1
+  -sha256 digest            expected sha256 hex digest of downloaded file
   -prepare dataset name     prepares dataset specified by name
+  -workers n                number of worker processes used for preparation, defaults to 1
+  -chunk-size n             number of rows sent to a preparation worker at once, defaults to 64
+  -stream                   reads and converts raw dataset file chunk by chunk
+  -stream-chunk-size n      number of rows read from raw dataset file at once in stream mode, defaults to 4096
+  -compact                  saves images as uint8 and labels as int8 class indices
+  -force                    prepares dataset even if prepared files are up to date
+  -scale-factor f           how much the image size is reduced at each face detection scale, defaults to 1.3
+  -min-neighbors n          how many neighbors each face candidate should have to retain it, defaults to 5
+  -min-face-size n          minimum size of a detected face side in pixels
+  -max-face-size n          maximum size of a detected face side in pixels
+  -detection-downscale f    factor of image size used for face detection, defaults to 1.0
+  -trust-aligned            skips face detection trusting that images are aligned face crops
 """
 import os
 from argparse import ArgumentParser
-from urllib.request import urlopen, urlsplit
-from struct import pack
-
-from tqdm import tqdm
 
 import aigym.dataset
+from aigym.dataset.classifiers import FaceDetector, AlignedFaceDetector
+from aigym.dataset.download import download, url_filename
 from aigym.conf.settings import RAW_DATASETS_DIR
 
 arg_parser = ArgumentParser('aigym.dataset')
 arg_parser.add_argument('-download', metavar='url', help="download dataset file from url")
+arg_parser.add_argument(
+    '-segments', metavar='n', type=int, default=1, help="number of parallel ranged segments used for downloading"
+)
+arg_parser.add_argument('-sha256', metavar='digest', help="expected sha256 hex digest of downloaded file")
 arg_parser.add_argument('-prepare', metavar='dataset name', help="prepares dataset specified by name")
+arg_parser.add_argument(
+    '-workers', metavar='n', type=int, default=1, help="number of worker processes used for preparation"
+)
+arg_parser.add_argument(
+    '-chunk-size', metavar='n', type=int, default=64, help="number of rows sent to a preparation worker at once"
+)
+arg_parser.add_argument('-stream', action='store_true', help="reads and converts raw dataset file chunk by chunk")
+arg_parser.add_argument(
+    '-stream-chunk-size', metavar='n', type=int, default=4096, help="number of rows read from raw dataset file at once"
+)
+arg_parser.add_argument('-compact', action='store_true', help="saves images as uint8 and labels as int8 class indices")
+arg_parser.add_argument('-force', action='store_true', help="prepares dataset even if prepared files are up to date")
+arg_parser.add_argument(
+    '-scale-factor', metavar='f', type=float, default=1.3,
+    help="how much the image size is reduced at each face detection scale",
+)
+arg_parser.add_argument(
+    '-min-neighbors', metavar='n', type=int, default=5,
+    help="how many neighbors each face candidate should have to retain it",
+)
+arg_parser.add_argument('-min-face-size', metavar='n', type=int, help="minimum size of a detected face side in pixels")
+arg_parser.add_argument('-max-face-size', metavar='n', type=int, help="maximum size of a detected face side in pixels")
+arg_parser.add_argument(
+    '-detection-downscale', metavar='f', type=float, default=1.0, help="factor of image size used for face detection"
+)
+arg_parser.add_argument(
+    '-trust-aligned', action='store_true', help="skips face detection trusting that images are aligned face crops"
+)
 
 parsed_args = arg_parser.parse_args()
 
 if parsed_args.download:
-    source = urlopen(parsed_args.download)
-    filename = os.path.split(urlsplit(parsed_args.download).path)[-1]
-    with open(os.path.join(RAW_DATASETS_DIR, filename), 'wb') as file:
-        for byte in tqdm(source.read(), desc='Downloading from {}'.format(parsed_args.download)):
-            file.write(pack('B', byte))
+    from tqdm import tqdm
+
+    with tqdm(desc='Downloading from {}'.format(parsed_args.download), unit='B', unit_scale=True) as progress_bar:
+        def set_total(length):
+            progress_bar.total = length
+
+        download(
+            parsed_args.download,
+            os.path.join(RAW_DATASETS_DIR, url_filename(parsed_args.download)),
+            segments=parsed_args.segments,
+            sha256=parsed_args.sha256,
+            progress=progress_bar.update,
+            total=set_total,
+        )
 
 if parsed_args.prepare:
     cls = getattr(aigym.dataset, "{}RawDataset".format(parsed_args.prepare.title()), None)
     if cls is not None:
-        cls().prepare()
+        if parsed_args.trust_aligned:
+            face_detector = AlignedFaceDetector()
+        else:
+            face_detector = FaceDetector(
+                scale_factor=parsed_args.scale_factor,
+                min_neighbors=parsed_args.min_neighbors,
+                min_size=(parsed_args.min_face_size, ) * 2 if parsed_args.min_face_size else None,
+                max_size=(parsed_args.max_face_size, ) * 2 if parsed_args.max_face_size else None,
+                downscale=parsed_args.detection_downscale,
+            )
+        cls().prepare(
+            workers=parsed_args.workers,
+            chunk_size=parsed_args.chunk_size,
+            stream=parsed_args.stream,
+            stream_chunk_size=parsed_args.stream_chunk_size,
+            compact=parsed_args.compact,
+            force=parsed_args.force,
+            face_detector=face_detector,
+        )
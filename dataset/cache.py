@@ -0,0 +1,124 @@
+"""
+This module provides content-addressed cache of prepared datasets.
+
+Prepared split is considered up to date if its key matches the one recorded in a manifest file.
+Key is a hash of raw dataset file content, split usage and preparation pipeline parameters,
+so any change of them makes the split to be prepared again.
+"""
+import os
+import json
+from hashlib import sha256
+from typing import Iterable
+
+
+def file_digest(filepath: str, buffer_size: int=1 << 20) -> str:
+    """
+    Calculates sha256 digest of a file content.
+
+    :param filepath: path to the file.
+    :param buffer_size: number of bytes read at once.
+    :return: hex digest str.
+    """
+    digest = sha256()
+    with open(filepath, 'rb') as file:
+        for buffer in iter(lambda: file.read(buffer_size), b''):
+            digest.update(buffer)
+    return digest.hexdigest()
+
+
+class PreparationCache:
+    """
+    Manifest backed cache of prepared dataset splits.
+
+    Manifest is a json file with recorded raw files digests and keys of prepared splits.
+    Raw file digest is recalculated only if the file size or modification time was changed.
+    Raw files are recorded by paths relative to base directory, so moving the directory keeps them recorded.
+    """
+    def __init__(self, manifest_filepath: str, base_dir_path: str=None):
+        """
+        Reads manifest file if it exists.
+
+        :param manifest_filepath: path to the manifest json file.
+        :param base_dir_path: path to the directory of raw files, defaults to the manifest file directory.
+        """
+        self._manifest_filepath = manifest_filepath
+        self._base_dir_path = base_dir_path if base_dir_path is not None else os.path.dirname(manifest_filepath)
+        self._manifest = {'files': {}, 'splits': {}}
+        if os.path.exists(manifest_filepath):
+            try:
+                with open(manifest_filepath) as manifest_file:
+                    self._manifest.update(json.load(manifest_file))
+            except ValueError:
+                pass
+
+    @property
+    def manifest_filepath(self) -> str:
+        return self._manifest_filepath
+
+    def digest_of(self, filepath: str) -> str:
+        """
+        Gets digest of a file content reusing the recorded one if the file wasn't changed.
+
+        :param filepath: path to the file.
+        :return: hex digest str.
+        """
+        stat = os.stat(filepath)
+        relative_filepath = os.path.relpath(filepath, self._base_dir_path)
+        recorded = self._manifest['files'].get(relative_filepath, {})
+        if recorded.get('size') == stat.st_size and recorded.get('mtime_ns') == stat.st_mtime_ns:
+            return recorded['digest']
+        digest = file_digest(filepath)
+        self._manifest['files'][relative_filepath] = {
+            'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'digest': digest,
+        }
+        return digest
+
+    @staticmethod
+    def key(usage: str, parameters: dict) -> str:
+        """
+        Calculates key of a prepared split.
+
+        :param usage: split usage name.
+        :param parameters: dict of json serializable preparation parameters including raw file digest.
+        :return: hex digest str.
+        """
+        return sha256(json.dumps([usage, parameters], sort_keys=True).encode()).hexdigest()
+
+    def key_of(self, usage: str) -> str:
+        """
+        :param usage: split usage name.
+        :return: recorded key of the split or None.
+        """
+        return self._manifest['splits'].get(usage)
+
+    def is_fresh(self, usage: str, key: str, filepaths: Iterable[str]) -> bool:
+        """
+        Checks if prepared split is up to date.
+
+        :param usage: split usage name.
+        :param key: actual key of the split.
+        :param filepaths: paths of the split files.
+        :return: bool indicating that recorded key matches and all split files exist.
+        """
+        return self.key_of(usage) == key and all(os.path.exists(filepath) for filepath in filepaths)
+
+    def update(self, usage: str, key: str):
+        """
+        Records key of a prepared split.
+
+        :param usage: split usage name.
+        :param key: key of the split or None to forget it.
+        """
+        if key is None:
+            self._manifest['splits'].pop(usage, None)
+        else:
+            self._manifest['splits'][usage] = key
+
+    def save(self):
+        """
+        Writes manifest file.
+        """
+        temporary_filepath = '{}.tmp'.format(self._manifest_filepath)
+        with open(temporary_filepath, 'w') as manifest_file:
+            json.dump(self._manifest, manifest_file, indent=2, sort_keys=True)
+        os.replace(temporary_filepath, self._manifest_filepath)
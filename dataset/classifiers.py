@@ -1,17 +1,66 @@
 """
 This module provides convenience interface to cascade classifying.
 
-FRONTALFACE_CASCADE_CLASSIFIER - instance of cv2.CascadeClassifier class for HAARCASCADE_FRONTALFACE_CLASSIFIER_FILEPATH
+FRONTALFACE_CASCADE_CLASSIFIER - lazily loaded cv2.CascadeClassifier for HAARCASCADE_FRONTALFACE_CLASSIFIER_FILEPATH
 
+FaceDetector - thread-safe face detector which can be shared by serving threads.
+
+AlignedFaceDetector - face detector which trusts that images are aligned face crops.
 """
-import cv2
+from threading import Lock, local
+from typing import Iterable, List, Tuple
+
+from numpy import ndarray, asarray, argmax, rint
 
 from aigym.conf.settings import HAARCASCADE_FRONTALFACE_CLASSIFIER_FILEPATH
 
-FRONTALFACE_CASCADE_CLASSIFIER = cv2.CascadeClassifier(HAARCASCADE_FRONTALFACE_CLASSIFIER_FILEPATH)
+
+class LazyCascadeClassifier:
+    """
+    Proxy of cv2.CascadeClassifier which imports cv2 and loads classifier file on first use.
+
+    Pickled proxy keeps only classifier file path, so each process loads its own classifier.
+    """
+    def __init__(self, filepath: str):
+        """
+        :param filepath: path to cascade classifier xml file.
+        """
+        self._filepath = filepath
+        self._classifier = None
+        self._lock = Lock()
+
+    @property
+    def filepath(self) -> str:
+        return self._filepath
+
+    @property
+    def classifier(self):
+        """
+        :return: loaded cv2.CascadeClassifier object.
+        """
+        if self._classifier is None:
+            with self._lock:
+                if self._classifier is None:
+                    from cv2 import CascadeClassifier
+                    self._classifier = CascadeClassifier(self._filepath)
+        return self._classifier
+
+    def __getattr__(self, name: str):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return getattr(self.classifier, name)
+
+    def __getstate__(self) -> dict:
+        return {'filepath': self._filepath}
+
+    def __setstate__(self, state: dict):
+        self.__init__(state['filepath'])
+
+
+FRONTALFACE_CASCADE_CLASSIFIER = LazyCascadeClassifier(HAARCASCADE_FRONTALFACE_CLASSIFIER_FILEPATH)
 
 
-def detect_face(image, classifier):
+def detect_face(image, classifier, scale_factor=1.3, min_neighbors=5):
     """
     Detects a face on image by using cascade classifier.
 
@@ -19,16 +68,182 @@ def detect_face(image, classifier):
 
     :param image: source for face detection.
     :param classifier: cascade classifier object that will be used for face detection.
+    :param scale_factor: how much the image size is reduced at each image scale.
+    :param min_neighbors: how many neighbors each candidate rectangle should have to retain it.
     :return: face image.
     """
     if image is None:
         return None
-    faces = classifier.detectMultiScale(image, scaleFactor=1.3, minNeighbors=5)
+    faces = classifier.detectMultiScale(image, scaleFactor=scale_factor, minNeighbors=min_neighbors)
+    return crop_largest_face(image, faces)
+
+
+def crop_largest_face(image, faces):
+    """
+    Chops image to face max area.
+
+    :param image: image on which faces were detected.
+    :param faces: array-like of (x, y, width, height) faces rectangles.
+    :return: face image or None if there are no faces.
+    """
+    faces = asarray(faces)
     if not len(faces) > 0:
         return None
-    max_area_face = faces[0]
-    for face in faces:
-        if face[2] * face[3] > max_area_face[2] * max_area_face[3]:
-            max_area_face = face
-    face = max_area_face
-    return image[face[1]:(face[1] + face[2]), face[0]:(face[0] + face[3])]
+    x, y, width, height = faces[argmax(faces[:, 2] * faces[:, 3])]
+    return image[y:(y + height), x:(x + width)]
+
+
+class FaceDetector:
+    """
+    Thread-safe face detector.
+
+    cv2.CascadeClassifier objects must not be shared between threads,
+    so each thread which uses the detector lazily gets its own classifier.
+    Pickled detector keeps only its parameters, so each process loads its own classifiers too.
+
+    Detection can be run on a downscaled image, found faces rectangles are mapped back to the full resolution.
+    """
+    aligned = False
+
+    def __init__(self, filepath: str=HAARCASCADE_FRONTALFACE_CLASSIFIER_FILEPATH, scale_factor: float=1.3,
+                 min_neighbors: int=5, min_size: Tuple[int, int]=None, max_size: Tuple[int, int]=None,
+                 downscale: float=1.0):
+        """
+        :param filepath: path to cascade classifier xml file.
+        :param scale_factor: how much the image size is reduced at each image scale.
+        :param min_neighbors: how many neighbors each candidate rectangle should have to retain it.
+        :param min_size: minimum (width, height) of a face in full resolution or None.
+        :param max_size: maximum (width, height) of a face in full resolution or None.
+        :param downscale: factor in (0, 1] range of image size used for detection.
+        """
+        if not 0 < downscale <= 1:
+            raise ValueError("downscale must be in (0, 1] range")
+        self._filepath = filepath
+        self._scale_factor = scale_factor
+        self._min_neighbors = min_neighbors
+        self._min_size = tuple(min_size) if min_size else None
+        self._max_size = tuple(max_size) if max_size else None
+        self._downscale = downscale
+        self._local = local()
+
+    @property
+    def filepath(self) -> str:
+        return self._filepath
+
+    @property
+    def scale_factor(self) -> float:
+        return self._scale_factor
+
+    @property
+    def min_neighbors(self) -> int:
+        return self._min_neighbors
+
+    @property
+    def min_size(self) -> Tuple[int, int]:
+        return self._min_size
+
+    @property
+    def max_size(self) -> Tuple[int, int]:
+        return self._max_size
+
+    @property
+    def downscale(self) -> float:
+        return self._downscale
+
+    @property
+    def parameters(self) -> dict:
+        """
+        :return: dict of parameters which the detector can be created with.
+        """
+        return {
+            'filepath': self._filepath,
+            'scale_factor': self._scale_factor,
+            'min_neighbors': self._min_neighbors,
+            'min_size': self._min_size,
+            'max_size': self._max_size,
+            'downscale': self._downscale,
+        }
+
+    @property
+    def classifier(self):
+        """
+        :return: cv2.CascadeClassifier object of the current thread.
+        """
+        classifier = getattr(self._local, 'classifier', None)
+        if classifier is None:
+            from cv2 import CascadeClassifier
+            classifier = self._local.classifier = CascadeClassifier(self._filepath)
+        return classifier
+
+    def scaled_size(self, size: Tuple[int, int]) -> Tuple[int, int]:
+        """
+        :param size: (width, height) in full resolution.
+        :return: (width, height) in detection resolution.
+        """
+        return tuple(max(int(round(dimension * self._downscale)), 1) for dimension in size)
+
+    def detect_faces(self, image) -> ndarray:
+        """
+        Detects faces on image.
+
+        :param image: grayscale image.
+        :return: numpy.ndarray of (x, y, width, height) faces rectangles in the image resolution.
+        """
+        detection_image = image
+        if self._downscale != 1:
+            from cv2 import resize, INTER_AREA
+            detection_image = resize(image, None, fx=self._downscale, fy=self._downscale, interpolation=INTER_AREA)
+        detection_kwargs = {'scaleFactor': self._scale_factor, 'minNeighbors': self._min_neighbors}
+        if self._min_size:
+            detection_kwargs['minSize'] = self.scaled_size(self._min_size)
+        if self._max_size:
+            detection_kwargs['maxSize'] = self.scaled_size(self._max_size)
+        faces = asarray(self.classifier.detectMultiScale(detection_image, **detection_kwargs)).reshape([-1, 4])
+        if self._downscale != 1:
+            faces = rint(faces / self._downscale).astype(int)
+        return faces
+
+    def detect(self, image):
+        """
+        Detects face on image and chops image to face max area.
+
+        :param image: grayscale image or None.
+        :return: face image or None if there are no faces.
+        """
+        if image is None:
+            return None
+        return crop_largest_face(image, self.detect_faces(image))
+
+    def detect_batch(self, images: Iterable, executor=None) -> List:
+        """
+        Detects faces on a batch of images.
+
+        :param images: iterable of grayscale images.
+        :param executor: concurrent.futures.Executor object used to detect faces concurrently or None.
+        :return: list of face images or None values in the images order.
+        """
+        if executor is None:
+            return [self.detect(image) for image in images]
+        return list(executor.map(self.detect, images))
+
+    def __getstate__(self) -> dict:
+        return self.parameters
+
+    def __setstate__(self, state: dict):
+        self.__init__(**state)
+
+
+class AlignedFaceDetector(FaceDetector):
+    """
+    Face detector for datasets of already aligned face crops, e.g. fer2013.
+
+    Trusts that the whole image is a face, so no cascade classifier is run at all.
+    """
+    aligned = True
+
+    def detect_faces(self, image) -> ndarray:
+        """
+        :param image: grayscale image.
+        :return: numpy.ndarray with a single rectangle of the whole image.
+        """
+        return asarray([[0, 0, image.shape[1], image.shape[0]]])
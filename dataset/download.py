@@ -0,0 +1,200 @@
+"""
+This module provides streaming downloading of raw dataset files.
+
+download - downloads url to a file chunk by chunk, optionally by several parallel ranged segments,
+resumes interrupted downloads with HTTP Range requests and verifies sha256 checksum.
+
+Download is written to '<filepath>.part' file and its progress to '<filepath>.part.json' file,
+the file is moved to its place only after it is completely downloaded and verified.
+Progress is tracked in memory and persisted periodically and when downloading fails.
+"""
+import os
+import json
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+from time import monotonic
+from typing import Callable, List
+from urllib.request import Request, urlopen, urlsplit
+
+from .cache import file_digest
+
+
+def url_filename(url: str) -> str:
+    """
+    :param url: url of a file.
+    :return: name of the file.
+    """
+    return os.path.split(urlsplit(url).path)[-1]
+
+
+def probe(url: str, timeout: float=30) -> tuple:
+    """
+    Requests headers of url.
+
+    :param url: url of a file.
+    :param timeout: seconds to wait for the server.
+    :return: tuple of two values - content length or None if it is unknown, bool indicating Range support.
+    """
+    try:
+        with urlopen(Request(url, method='HEAD'), timeout=timeout) as response:
+            length = response.headers.get('Content-Length')
+            accept_ranges = response.headers.get('Accept-Ranges', '').lower() == 'bytes'
+    except OSError:
+        return None, False
+    return (int(length) if length is not None and length.isdigit() else None), accept_ranges
+
+
+def split_segments(length: int, segments: int) -> List[list]:
+    """
+    :param length: content length.
+    :param segments: number of segments.
+    :return: list of [start, end, downloaded bytes] segments of nearly equal size.
+    """
+    segments = max(min(segments, length), 1)
+    bounds = [length * index // segments for index in range(segments + 1)]
+    return [[start, end, 0] for start, end in zip(bounds[:-1], bounds[1:])]
+
+
+class _DownloadState:
+    """
+    Segments of a download with thread-safe progress persisted to a json file.
+
+    Each segment is advanced by a single thread, progress is persisted every save_bytes bytes
+    or save_interval seconds, whichever comes first, by the thread which advanced it past the threshold.
+    """
+    def __init__(self, filepath: str, url: str, length: int, segments: List[list], save_bytes: int=16 << 20,
+                 save_interval: float=1.0):
+        self.filepath = filepath
+        self.url = url
+        self.length = length
+        self.segments = segments
+        self.save_bytes = save_bytes
+        self.save_interval = save_interval
+        self._unsaved_bytes = 0
+        self._saved_time = monotonic()
+        self._lock = Lock()
+        self._save_lock = Lock()
+
+    @classmethod
+    def load(cls, filepath: str, url: str, length: int, **kwargs):
+        """
+        :return: saved state of the same url and length or None.
+        """
+        try:
+            with open(filepath) as state_file:
+                state = json.load(state_file)
+            if state['url'] == url and state['length'] == length:
+                return cls(filepath, url, length, [list(segment) for segment in state['segments']], **kwargs)
+        except (OSError, ValueError, KeyError, TypeError):
+            pass
+        return None
+
+    def advance(self, segment: list, size: int):
+        segment[2] += size
+        with self._lock:
+            self._unsaved_bytes += size
+            if self._unsaved_bytes < self.save_bytes and monotonic() - self._saved_time < self.save_interval:
+                return
+            self._unsaved_bytes = 0
+            self._saved_time = monotonic()
+        self.save()
+
+    def save(self):
+        with self._save_lock:
+            segments = [list(segment) for segment in self.segments]
+            temporary_filepath = "{}.tmp".format(self.filepath)
+            with open(temporary_filepath, 'w') as state_file:
+                json.dump({'url': self.url, 'length': self.length, 'segments': segments}, state_file)
+            os.replace(temporary_filepath, self.filepath)
+
+
+def _download_segment(url: str, part_filepath: str, state: _DownloadState, segment: list, ranged: bool,
+                      chunk_size: int, progress: Callable[[int], None], timeout: float):
+    """
+    Downloads the rest of a segment to its place in the part file.
+
+    Part file is written unbuffered, so persisted progress never covers bytes which are lost if the process dies.
+    """
+    start, end, downloaded = segment
+    if end is not None and start + downloaded >= end:
+        return
+    headers = {}
+    if ranged:
+        headers['Range'] = "bytes={}-{}".format(start + downloaded, '' if end is None else end - 1)
+    with urlopen(Request(url, headers=headers), timeout=timeout) as response:
+        if ranged and response.status != 206:
+            raise OSError("server ignored Range request of {}".format(url))
+        with open(part_filepath, 'r+b', buffering=0) as part_file:
+            part_file.seek(start + downloaded)
+            for chunk in iter(lambda: response.read(chunk_size), b''):
+                part_file.write(chunk)
+                state.advance(segment, len(chunk))
+                if progress is not None:
+                    progress(len(chunk))
+
+
+def download(url: str, filepath: str, chunk_size: int=1 << 20, segments: int=1, sha256: str=None,
+             progress: Callable[[int], None]=None, total: Callable[[int], None]=None, timeout: float=30,
+             save_bytes: int=16 << 20, save_interval: float=1.0) -> str:
+    """
+    Downloads url to a file.
+
+    Interrupted download of the same url is resumed if the server supports Range requests,
+    otherwise it is started again. Parallel segments are used only if the server supports Range requests
+    and reports content length.
+
+    :param url: url of a file.
+    :param filepath: path of the downloaded file.
+    :param chunk_size: number of bytes read and written at once.
+    :param segments: number of parallel ranged segments.
+    :param sha256: expected sha256 hex digest of the file or None.
+    :param progress: callable which takes number of downloaded bytes, it is called after each chunk.
+    :param total: callable which takes content length or None, it is called before downloading.
+    :param timeout: seconds to wait for the server.
+    :param save_bytes: number of downloaded bytes after which progress is persisted.
+    :param save_interval: seconds after which progress is persisted.
+    :return: filepath.
+    :raise ValueError: if sha256 digest of the downloaded file doesn't match.
+    """
+    part_filepath = "{}.part".format(filepath)
+    state_filepath = "{}.json".format(part_filepath)
+    length, accept_ranges = probe(url, timeout)
+    state_kwargs = {'save_bytes': save_bytes, 'save_interval': save_interval}
+    state = None
+    if os.path.exists(part_filepath):
+        state = _DownloadState.load(state_filepath, url, length, **state_kwargs)
+    if state is not None and not accept_ranges:
+        state = None
+    if state is None:
+        if length is not None and accept_ranges:
+            state = _DownloadState(state_filepath, url, length, split_segments(length, segments), **state_kwargs)
+        else:
+            state = _DownloadState(state_filepath, url, length, [[0, length, 0]], **state_kwargs)
+        with open(part_filepath, 'wb') as part_file:
+            if length is not None:
+                part_file.truncate(length)
+        state.save()
+    if total is not None:
+        total(length)
+    if progress is not None:
+        progress(sum(segment[2] for segment in state.segments))
+    ranged = accept_ranges and length is not None
+    try:
+        with ThreadPoolExecutor(len(state.segments)) as executor:
+            for future in [
+                executor.submit(
+                    _download_segment, url, part_filepath, state, segment, ranged, chunk_size, progress, timeout
+                )
+                for segment in state.segments
+            ]:
+                future.result()
+    except BaseException:
+        state.save()
+        raise
+    if sha256 is not None and file_digest(part_filepath) != sha256.lower():
+        os.remove(part_filepath)
+        os.remove(state_filepath)
+        raise ValueError("sha256 digest of {} doesn't match".format(url))
+    os.replace(part_filepath, filepath)
+    os.remove(state_filepath)
+    return filepath
@@ -0,0 +1,184 @@
+"""
+This module provides streaming mini-batch loading of prepared datasets.
+
+BatchLoader - iterable of shuffled mini-batches read from in-memory or memory-mapped arrays
+and prefetched on background threads.
+
+Augmentation - vectorized per-batch augmentation of normalized images.
+"""
+from queue import Queue, Full
+from threading import Thread, Event
+from typing import Callable, Iterator, Tuple
+
+from numpy import ndarray, arange, clip, float32, pad, sort
+from numpy.random import RandomState
+
+
+class Augmentation:
+    """
+    Random flips, small shifts and brightness changes applied to a whole batch at once.
+
+    Images must be normalized float32 ones with (number of images, height, width, channels) shape.
+    """
+    def __init__(self, flip: float=0.5, max_shift: int=2, brightness: float=0.1):
+        """
+        :param flip: probability of an image to be flipped horizontally.
+        :param max_shift: maximum number of pixels an image is shifted by along each axis.
+        :param brightness: maximum relative change of an image brightness.
+        """
+        if not 0 <= flip <= 1:
+            raise ValueError("flip must be in [0, 1] range")
+        if max_shift < 0 or brightness < 0:
+            raise ValueError("max_shift and brightness must not be negative")
+        self.flip = flip
+        self.max_shift = max_shift
+        self.brightness = brightness
+
+    def __call__(self, images: ndarray, random_state: RandomState) -> ndarray:
+        """
+        Augments batch of images.
+
+        :param images: float32 numpy.ndarray of normalized images.
+        :param random_state: numpy.random.RandomState object.
+        :return: float32 numpy.ndarray of augmented images.
+        """
+        number, height, width = images.shape[:3]
+        if self.flip:
+            flipped = random_state.random_sample(number) < self.flip
+            images[flipped] = images[flipped, :, ::-1]
+        if self.max_shift:
+            shift = self.max_shift
+            padded = pad(images, ((0, 0), (shift, shift), (shift, shift), (0, 0)), mode='edge')
+            rows = arange(height) + random_state.randint(0, 2 * shift + 1, (number, 1))
+            columns = arange(width) + random_state.randint(0, 2 * shift + 1, (number, 1))
+            images = padded[arange(number)[:, None, None], rows[:, :, None], columns[:, None, :]]
+        if self.brightness:
+            factors = 1 + random_state.uniform(-self.brightness, self.brightness, (number, 1, 1, 1))
+            images = clip(images * factors.astype(float32), 0, 1, out=images)
+        return images
+
+
+class BatchLoader:
+    """
+    Iterable of mini-batches of images and labels.
+
+    Each iteration is an epoch. Batches are read by worker threads in batches order and up to prefetch batches
+    of each worker wait for consumption, so reading and augmentation overlap with learning.
+    Indices of a batch are read in ascending order, so memory-mapped arrays are read with less seeking.
+    """
+    def __init__(self, images: ndarray, labels: ndarray, batch_size: int=50, shuffle: bool=True,
+                 drop_last: bool=False, transform: Callable[[ndarray, ndarray], Tuple[ndarray, ndarray]]=None,
+                 augmentation: Callable[[ndarray, RandomState], ndarray]=None, prefetch: int=2, workers: int=1,
+                 seed: int=None):
+        """
+        :param images: numpy.ndarray or numpy.memmap of images.
+        :param labels: numpy.ndarray or numpy.memmap of labels.
+        :param batch_size: number of images in a batch.
+        :param shuffle: bool indicating to shuffle images every epoch.
+        :param drop_last: bool indicating to skip the last batch if it is incomplete.
+        :param transform: callable which takes images and labels of a batch and returns converted ones.
+        :param augmentation: callable which takes transformed images and numpy.random.RandomState object
+        and returns augmented images, e.g. Augmentation object.
+        :param prefetch: number of batches each worker prepares in advance.
+        :param workers: number of worker threads.
+        :param seed: seed of shuffling and augmentation or None for random ones.
+        """
+        if len(images) != len(labels):
+            raise ValueError("images and labels must have the same length")
+        if batch_size < 1 or prefetch < 1 or workers < 1:
+            raise ValueError("batch_size, prefetch and workers must be positive")
+        self.images = images
+        self.labels = labels
+        self.batch_size = batch_size
+        self.shuffle = shuffle
+        self.drop_last = drop_last
+        self.transform = transform
+        self.augmentation = augmentation
+        self.prefetch = prefetch
+        self.workers = workers
+        self.seed = seed if seed is not None else RandomState().randint(1 << 31)
+        self.epoch = 0
+
+    def __len__(self) -> int:
+        if self.drop_last:
+            return len(self.images) // self.batch_size
+        return -(-len(self.images) // self.batch_size)
+
+    def __iter__(self) -> Iterator[Tuple[ndarray, ndarray]]:
+        """
+        Yields batches of an epoch.
+
+        :return: generator of (images, labels) tuples.
+        """
+        epoch, self.epoch = self.epoch, self.epoch + 1
+        batches_indices = self.batches_indices(epoch)
+        stopped = Event()
+        queues = [Queue(self.prefetch) for _ in range(self.workers)]
+        threads = [
+            Thread(
+                target=self._read, args=(epoch, batches_indices, worker_index, queues[worker_index], stopped),
+                name='aigym batch loader {}'.format(worker_index), daemon=True,
+            )
+            for worker_index in range(self.workers)
+        ]
+        for thread in threads:
+            thread.start()
+        try:
+            for batch_index in range(len(batches_indices)):
+                item = queues[batch_index % self.workers].get()
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            stopped.set()
+            for thread in threads:
+                thread.join()
+
+    def batches_indices(self, epoch: int) -> list:
+        """
+        :param epoch: index of an epoch.
+        :return: list of numpy.ndarray of images indices, one per batch.
+        """
+        indices = arange(len(self.images))
+        if self.shuffle:
+            RandomState([self.seed, epoch]).shuffle(indices)
+        if self.drop_last:
+            indices = indices[:len(self) * self.batch_size]
+        return [indices[start:start + self.batch_size] for start in range(0, len(indices), self.batch_size)]
+
+    def batch(self, epoch: int, batch_index: int, indices: ndarray) -> Tuple[ndarray, ndarray]:
+        """
+        Reads, transforms and augments a batch.
+
+        :param epoch: index of an epoch.
+        :param batch_index: index of the batch in the epoch.
+        :param indices: numpy.ndarray of images indices.
+        :return: tuple of two values - images, labels.
+        """
+        indices = sort(indices)
+        images, labels = self.images[indices], self.labels[indices]
+        if self.transform is not None:
+            images, labels = self.transform(images, labels)
+        if self.augmentation is not None:
+            images = self.augmentation(images, RandomState([self.seed, epoch, batch_index]))
+        return images, labels
+
+    def _read(self, epoch: int, batches_indices: list, worker_index: int, queue: Queue, stopped: Event):
+        """
+        Puts every workers-th batch of an epoch starting from worker_index-th one to a queue.
+        """
+        for batch_index in range(worker_index, len(batches_indices), self.workers):
+            if stopped.is_set():
+                return
+            try:
+                item = self.batch(epoch, batch_index, batches_indices[batch_index])
+            except Exception as exception:
+                item = exception
+            while not stopped.is_set():
+                try:
+                    queue.put(item, timeout=0.1)
+                    break
+                except Full:
+                    continue
+            if isinstance(item, Exception):
+                return
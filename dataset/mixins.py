@@ -2,8 +2,12 @@
 Defines a number of mixins which can be used for adding to dataset classes extra functionality.
 """
 import os
+from time import perf_counter
+from contextlib import contextmanager
+from collections import Counter
 
-from aigym.conf.settings import PREPARED_DATASETS_IMAGES_DIR, PREPARED_DATASETS_IMAGES_LABELS_DIR
+from aigym.metrics import metrics
+from aigym.conf.settings import PREPARED_DATASETS_DIR, PREPARED_DATASETS_IMAGES_DIR, PREPARED_DATASETS_IMAGES_LABELS_DIR
 
 
 class LabeledImagesMixin:
@@ -61,6 +65,56 @@ class WithTestLabeledImagesMixin(LabeledImagesMixin):
         self._test_images_labels = objects
 
 
+class StageTimingsMixin:
+    """
+    Mixin which accumulates time spent in named processing stages.
+
+    Defines stage_timings property and timed_stage context manager.
+    If aigym metrics are enabled each stage time is also observed in 'aigym_dataset_stage_seconds' histogram.
+    """
+    @property
+    def stage_timings(self) -> Counter:
+        """
+        :return: collections.Counter of seconds spent in each stage.
+        """
+        if not hasattr(self, '_stage_timings'):
+            self._stage_timings = Counter()
+        return self._stage_timings
+
+    @contextmanager
+    def timed_stage(self, name: str):
+        """
+        Adds time spent in the with block to the stage with a given name.
+
+        :param name: stage name.
+        """
+        started = perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = perf_counter() - started
+            self.stage_timings[name] += elapsed
+            if metrics.enabled:
+                self.observe_stage_timing(name, elapsed)
+
+    def observe_stage_timing(self, name: str, seconds: float):
+        """
+        Observes stage time in aigym metrics labeled by self class name and stage name.
+
+        :param name: stage name.
+        :param seconds: time spent in the stage.
+        """
+        metrics.observe('aigym_dataset_stage_seconds', seconds, dataset=self.__class__.__name__, stage=name)
+
+    def pop_stage_timings(self) -> Counter:
+        """
+        :return: accumulated stage timings, which are reset.
+        """
+        stage_timings = self.stage_timings
+        self._stage_timings = Counter()
+        return stage_timings
+
+
 class ConfigMixin:
     """
     Base class for config mixins.
@@ -97,8 +151,12 @@ class Fer2013DefaultConfigMixin(WithTestPreparedLabeledImagesConfigMixin):
     prepared_test_images_labels_filename = '{}_test_images_labels.npy'.format(filename)
     prepared_private_test_images_filename = '{}_private_test_images.npy'.format(filename)
     prepared_private_test_images_labels_filename = '{}_private_test_images_labels.npy'.format(filename)
+    prepared_manifest_filename = '{}_manifest.json'.format(filename)
     filename += '.csv'
     face_size = 48
+    gray_border_dimensions = (75, 24)
+    face_detection_scale_factor = 1.3
+    face_detection_min_neighbors = 5
     emotion_choices = (
         'angry',
         'disgusted',
@@ -123,3 +181,4 @@ class Fer2013DefaultConfigMixin(WithTestPreparedLabeledImagesConfigMixin):
         PREPARED_DATASETS_IMAGES_LABELS_DIR,
         prepared_private_test_images_labels_filename
     )
+    prepared_manifest_filepath = os.path.join(PREPARED_DATASETS_DIR, prepared_manifest_filename)
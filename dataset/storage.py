@@ -0,0 +1,89 @@
+"""
+This module provides storage routines for prepared datasets data.
+
+NpyAppender - writer which appends arrays to a .npy file chunk by chunk.
+"""
+from numpy import asarray, ascontiguousarray
+from numpy.lib.format import magic, dtype_to_descr
+
+
+class NpyAppender:
+    """
+    Writer which appends arrays to a .npy file without holding all of them in memory.
+
+    Appended arrays are concatenated along the first axis.
+    Header of the file is written with a fixed width placeholder for the first dimension,
+    which is filled in when the appender is closed, so the result is readable by numpy.load.
+    """
+    header_alignment = 64
+    first_dimension_width = 20
+
+    def __init__(self, filepath: str):
+        """
+        Opens file for appending.
+
+        :param filepath: path to the .npy file which will be (re)written.
+        """
+        self._file = open(filepath, 'wb')
+        self._dtype = None
+        self._item_shape = None
+        self._length = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    @property
+    def length(self) -> int:
+        return self._length
+
+    def header(self) -> bytes:
+        """
+        Builds .npy file header with a current length as first dimension.
+
+        :return: bytes object of fixed length for same dtype and item shape.
+        """
+        shape = [str(self._length).rjust(self.first_dimension_width)] + [str(size) for size in self._item_shape]
+        header = "{{'descr': {!r}, 'fortran_order': False, 'shape': ({}{}), }}".format(
+            dtype_to_descr(self._dtype), ', '.join(shape), ',' if len(shape) == 1 else '',
+        )
+        prefix_length = len(magic(1, 0)) + 2
+        header += ' ' * (-(prefix_length + len(header) + 1) % self.header_alignment) + '\n'
+        return magic(1, 0) + len(header).to_bytes(2, 'little') + header.encode('latin1')
+
+    def append(self, arrays):
+        """
+        Appends arrays to the file.
+
+        :param arrays: numpy.ndarray or a sequence of equally shaped arrays.
+        """
+        arrays = asarray(arrays)
+        if not len(arrays):
+            return
+        if self._dtype is None:
+            self._dtype = arrays.dtype
+            self._item_shape = arrays.shape[1:]
+            self._file.write(self.header())
+        elif arrays.shape[1:] != self._item_shape:
+            raise ValueError("can't append arrays of {} shape to arrays of {} shape".format(
+                arrays.shape[1:], self._item_shape
+            ))
+        self._file.write(ascontiguousarray(arrays, self._dtype).tobytes())
+        self._length += len(arrays)
+
+    def close(self):
+        """
+        Writes actual header and closes the file.
+
+        If nothing was appended writes empty float64 array like numpy.save does for an empty list.
+        """
+        if self._file.closed:
+            return
+        if self._dtype is None:
+            self._dtype = asarray([]).dtype
+            self._item_shape = ()
+        self._file.seek(0)
+        self._file.write(self.header())
+        self._file.close()
@@ -2,10 +2,15 @@
 Logging mixins lives here.
 """
 import os
+import atexit
 import logging
+from logging.handlers import QueueListener
+from threading import Lock
 
 from aigym.conf import settings
 
+from .queueing import BoundedQueueHandler, RateLimitFilter
+
 
 class LoggerMixin:
     """
@@ -15,9 +20,14 @@ class LoggerMixin:
         - file handler
         - stream handler
     File handler is used for logging warnings and errors and is always included.
-    Stream handler is used for logging debug messages and is included only if aigym.conf.settings.DEBUG is set to True.
+    Stream handler is used for logging debug messages and is included only if aigym.conf.settings.DEBUG is set to True
+    or logger level is set below logging.WARNING with set_logging_level.
 
     If aigym.conf.settings.DEBUG is True then sets logger level to logging.DEBUG.
+
+    In queued mode, which is enabled with enable_queued_logging or aigym.conf.settings.QUEUED_LOGGING,
+    logger has a single handler which puts records into a bounded queue and handlers above are called
+    by a background listener thread, so logging threads never wait for file or stream writes.
     """
     __logger = logging.getLogger('aigym logger')
 
@@ -27,16 +37,115 @@ class LoggerMixin:
     __file_handler.setLevel(logging.WARNING)
     __file_handler.setFormatter(__formatter)
 
+    __stream_handler = logging.StreamHandler()
+    __stream_handler.setLevel(logging.DEBUG)
+    __stream_handler.setFormatter(__formatter)
+
+    __handlers = [__file_handler]
+
     __logger.addHandler(__file_handler)
 
     if settings.DEBUG:
-        __stream_handler = logging.StreamHandler()
-        __stream_handler.setLevel(logging.DEBUG)
-        __stream_handler.setFormatter(__formatter)
+        __handlers.append(__stream_handler)
 
         __logger.addHandler(__stream_handler)
         __logger.setLevel(logging.DEBUG)
 
+    __queue_handler = None
+
+    __queue_listener = None
+
+    __lock = Lock()
+
     @property
     def logger(self):
         return self.__logger
+
+    @staticmethod
+    def set_logging_level(level: int):
+        """
+        Sets level of aigym logger at runtime regardless of aigym.conf.settings.DEBUG.
+
+        Stream handler is included if the level is below logging.WARNING, because file handler takes only warnings,
+        and is excluded otherwise unless aigym.conf.settings.DEBUG is True.
+
+        :param level: level from builtin logging module, e.g. logging.INFO.
+        """
+        with LoggerMixin.__lock:
+            LoggerMixin.__logger.setLevel(level)
+            stream = level < logging.WARNING or settings.DEBUG
+            if stream and LoggerMixin.__stream_handler not in LoggerMixin.__handlers:
+                LoggerMixin.__handlers.append(LoggerMixin.__stream_handler)
+                LoggerMixin.__attach_handlers()
+            elif not stream and LoggerMixin.__stream_handler in LoggerMixin.__handlers:
+                LoggerMixin.__handlers.remove(LoggerMixin.__stream_handler)
+                LoggerMixin.__attach_handlers()
+
+    @staticmethod
+    def enable_queued_logging(max_queue_size: int=10000, rate: float=None, burst: int=None):
+        """
+        Moves writing of records to a background thread.
+
+        Records which don't fit into the queue are dropped, warnings and errors as well.
+        Queued records are written when queued mode is disabled, which also happens at interpreter exit.
+
+        :param max_queue_size: maximum number of records waiting to be written.
+        :param rate: maximum number of debug and info records per second or None to not limit them.
+        :param burst: maximum number of debug and info records logged at once, defaults to rate.
+        """
+        LoggerMixin.disable_queued_logging()
+        with LoggerMixin.__lock:
+            queue_handler = BoundedQueueHandler(max_queue_size)
+            if rate is not None:
+                queue_handler.addFilter(RateLimitFilter(rate, burst or max(int(rate), 1)))
+            LoggerMixin.__queue_handler = queue_handler
+            LoggerMixin.__queue_listener = QueueListener(queue_handler.queue, respect_handler_level=True)
+            LoggerMixin.__attach_handlers()
+            LoggerMixin.__queue_listener.start()
+
+    @staticmethod
+    def disable_queued_logging():
+        """
+        Writes queued records, stops the background thread and attaches handlers to logger back.
+        """
+        with LoggerMixin.__lock:
+            if LoggerMixin.__queue_listener is None:
+                return
+            queue_listener, LoggerMixin.__queue_listener = LoggerMixin.__queue_listener, None
+            LoggerMixin.__queue_handler = None
+            LoggerMixin.__attach_handlers()
+            queue_listener.stop()
+
+    @staticmethod
+    def logging_statistics() -> dict:
+        """
+        :return: dict with 'queued' bool, numbers of 'dropped' records and records 'suppressed' by rate limit.
+        """
+        queue_handler = LoggerMixin.__queue_handler
+        if queue_handler is None:
+            return {'queued': False, 'dropped': 0, 'suppressed': 0}
+        return {
+            'queued': True,
+            'dropped': queue_handler.dropped,
+            'suppressed': sum(getattr(log_filter, 'suppressed', 0) for log_filter in queue_handler.filters),
+        }
+
+    @staticmethod
+    def __attach_handlers():
+        """
+        Attaches handlers to logger directly or through the queue, must be called with the lock held.
+        """
+        for handler in list(LoggerMixin.__logger.handlers):
+            LoggerMixin.__logger.removeHandler(handler)
+        if LoggerMixin.__queue_listener is not None:
+            LoggerMixin.__queue_listener.handlers = tuple(LoggerMixin.__handlers)
+            LoggerMixin.__logger.addHandler(LoggerMixin.__queue_handler)
+        else:
+            for handler in LoggerMixin.__handlers:
+                LoggerMixin.__logger.addHandler(handler)
+
+
+atexit.register(LoggerMixin.disable_queued_logging)
+
+if settings.QUEUED_LOGGING:
+    LoggerMixin.enable_queued_logging()
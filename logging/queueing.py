@@ -0,0 +1,72 @@
+"""
+Defines logging handlers and filters of queued logging mode.
+
+BoundedQueueHandler - puts records into a bounded queue without blocking, records which don't fit are dropped.
+
+RateLimitFilter - token bucket which limits number of low level records per second.
+"""
+import logging
+from logging.handlers import QueueHandler
+from queue import Queue, Full
+from threading import Lock
+from time import monotonic
+
+
+class BoundedQueueHandler(QueueHandler):
+    """
+    Queue handler which never blocks a logging thread.
+
+    Records are put into a queue of a limited size, when it is full records are dropped and counted.
+    """
+    def __init__(self, max_queue_size: int=10000):
+        """
+        :param max_queue_size: maximum number of records waiting to be written.
+        """
+        super().__init__(Queue(max_queue_size))
+        self.dropped = 0
+        self._dropped_lock = Lock()
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except Full:
+            with self._dropped_lock:
+                self.dropped += 1
+
+
+class RateLimitFilter(logging.Filter):
+    """
+    Passes at most rate records per second with bursts of up to burst records.
+
+    Records with level above max_level, e.g. warnings and errors, are always passed.
+    Suppressed records are counted.
+    """
+    def __init__(self, rate: float=100.0, burst: int=200, max_level: int=logging.INFO):
+        """
+        :param rate: number of passed records per second.
+        :param burst: maximum number of records passed at once.
+        :param max_level: maximum level of limited records.
+        """
+        super().__init__()
+        if rate <= 0 or burst < 1:
+            raise ValueError("rate and burst must be positive")
+        self.rate = rate
+        self.burst = burst
+        self.max_level = max_level
+        self.suppressed = 0
+        self._tokens = float(burst)
+        self._updated = monotonic()
+        self._lock = Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > self.max_level:
+            return True
+        with self._lock:
+            now = monotonic()
+            self._tokens = min(self._tokens + (now - self._updated) * self.rate, self.burst)
+            self._updated = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return True
+            self.suppressed += 1
+            return False
@@ -0,0 +1,15 @@
+"""
+Metrics subsystem of aigym system.
+
+metrics - general metrics registry object for across-system use, it is enabled if aigym.conf.settings.METRICS is True.
+
+Backends stages are timed into 'aigym_backend_stage_seconds' histograms labeled by backend and stage,
+failed stages are counted into 'aigym_backend_stage_errors_total' counters.
+Dataset preparation stages are timed into 'aigym_dataset_stage_seconds' histograms labeled by dataset and stage.
+"""
+from aigym.conf import settings
+
+from .registry import MetricsRegistry, Histogram
+from .exporters import InMemoryExporter, JsonLinesExporter, PrometheusExporter, render_prometheus
+
+metrics = MetricsRegistry(enabled=settings.METRICS)
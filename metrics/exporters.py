@@ -0,0 +1,178 @@
+"""
+Defines exporters of metrics.
+
+InMemoryExporter - keeps recorded values in a bounded list, e.g. for tests and interactive profiling.
+
+JsonLinesExporter - appends each recorded value to a file as a json line.
+
+PrometheusExporter - renders registry in Prometheus text exposition format and can serve it over HTTP.
+"""
+import json
+from collections import deque
+from http.server import HTTPServer, BaseHTTPRequestHandler
+from threading import Lock, Thread
+from typing import List
+
+from .registry import MetricsRegistry
+
+
+class InMemoryExporter:
+    """
+    Keeps the latest recorded values.
+    """
+    def __init__(self, max_records: int=10000):
+        """
+        :param max_records: maximum number of kept records, the oldest ones are dropped.
+        """
+        self._records = deque(maxlen=max_records)
+
+    def export(self, record: dict):
+        self._records.append(record)
+
+    @property
+    def records(self) -> List[dict]:
+        return list(self._records)
+
+    def clear(self):
+        self._records.clear()
+
+
+class JsonLinesExporter:
+    """
+    Appends recorded values to a file, one json object per line.
+    """
+    def __init__(self, filepath: str, flush: bool=False):
+        """
+        :param filepath: path to the file.
+        :param flush: bool indicating to flush the file after each record.
+        """
+        self.filepath = filepath
+        self.flush = flush
+        self._file = open(filepath, 'a')
+        self._lock = Lock()
+
+    def export(self, record: dict):
+        line = json.dumps(record, sort_keys=True) + '\n'
+        with self._lock:
+            self._file.write(line)
+            if self.flush:
+                self._file.flush()
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+def _format_labels(labels: tuple) -> str:
+    if not labels:
+        return ''
+    return '{{{}}}'.format(','.join(
+        '{}="{}"'.format(name, value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for name, value in labels
+    ))
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render_prometheus(registry: MetricsRegistry) -> str:
+    """
+    :param registry: MetricsRegistry object.
+    :return: counters and histograms of registry in Prometheus text exposition format.
+    """
+    lines = []
+    counters = sorted(registry.counters().items())
+    for name in sorted({name for (name, _), _ in counters}):
+        lines.append('# TYPE {} counter'.format(name))
+        lines += [
+            '{}{} {}'.format(name, _format_labels(labels), _format_value(value))
+            for (counter_name, labels), value in counters if counter_name == name
+        ]
+    histograms = sorted(registry.histograms().items(), key=lambda item: item[0])
+    for name in sorted({name for (name, _), _ in histograms}):
+        lines.append('# TYPE {} histogram'.format(name))
+        for (histogram_name, labels), histogram in histograms:
+            if histogram_name != name:
+                continue
+            for bound, count in histogram.cumulative_counts():
+                lines.append('{}_bucket{} {}'.format(
+                    name, _format_labels(labels + (('le', _format_value(bound)), )), count
+                ))
+            lines.append('{}_sum{} {}'.format(name, _format_labels(labels), _format_value(histogram.sum)))
+            lines.append('{}_count{} {}'.format(name, _format_labels(labels), histogram.count))
+    return '\n'.join(lines) + '\n'
+
+
+class PrometheusExporter:
+    """
+    Serves registry in Prometheus text exposition format on '/metrics' path.
+
+    Values are aggregated by the registry, so export does nothing.
+    """
+    def __init__(self, registry: MetricsRegistry):
+        self.registry = registry
+        self._server = None
+        self._thread = None
+
+    def export(self, record: dict):
+        pass
+
+    def render(self) -> str:
+        return render_prometheus(self.registry)
+
+    @property
+    def address(self) -> tuple:
+        """
+        :return: (host, port) tuple of the started server or None.
+        """
+        return None if self._server is None else self._server.server_address[:2]
+
+    def start(self, host: str='127.0.0.1', port: int=9100) -> tuple:
+        """
+        Starts HTTP server in a daemon thread.
+
+        :param host: host to bind.
+        :param port: port to bind, 0 means any free port.
+        :return: (host, port) tuple of the started server.
+        """
+        exporter = self
+
+        class MetricsRequestHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?')[0] != '/metrics':
+                    self.send_error(404)
+                    return
+                body = exporter.render().encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.stop()
+        self._server = HTTPServer((host, port), MetricsRequestHandler)
+        self._thread = Thread(target=self._server.serve_forever, name='aigym metrics', daemon=True)
+        self._thread.start()
+        return self.address
+
+    def stop(self):
+        """
+        Stops HTTP server if it is started.
+        """
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._thread.join()
+            self._server, self._thread = None, None
@@ -0,0 +1,220 @@
+"""
+Defines registry of metrics.
+
+MetricsRegistry - thread-safe collection of counters and histograms with timers and pluggable exporters.
+
+Metrics are identified by a name and a dict of labels, e.g. 'aigym_backend_stage_seconds' with
+{'backend': 'Emrec', 'stage': 'respond_on'} labels. Disabled registry records nothing and its timers are
+a shared no-op context manager, so instrumented code costs a single attribute check.
+"""
+from bisect import bisect_left
+from contextlib import contextmanager
+from functools import wraps
+from threading import Lock
+from time import perf_counter, time
+from typing import Callable, Dict, List, Tuple
+
+DEFAULT_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0,
+)
+
+
+class _NullTimer:
+    """
+    Context manager which does nothing, it is returned by timers of disabled registry.
+    """
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        return False
+
+
+_null_timer = _NullTimer()
+
+
+def labels_key(labels: dict) -> Tuple:
+    """
+    :param labels: dict of labels values.
+    :return: hashable tuple of sorted (name, value) pairs.
+    """
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+
+class Histogram:
+    """
+    Cumulative histogram of observed values with fixed upper bounds of buckets.
+    """
+    def __init__(self, buckets: Tuple[float, ...]=DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative_counts(self) -> List[Tuple[float, int]]:
+        """
+        :return: list of (upper bound, number of values not greater than it) pairs, the last bound is infinity.
+        """
+        cumulative_counts = []
+        count = 0
+        for bound, bucket_count in zip(self.buckets + (float('inf'), ), self.counts):
+            count += bucket_count
+            cumulative_counts.append((bound, count))
+        return cumulative_counts
+
+
+class MetricsRegistry:
+    """
+    Registry of counters and histograms.
+
+    Each recorded value is also passed to exporters as a dict with 'type', 'name', 'labels', 'value'
+    and 'time' keys, exporters are objects with export method taking such dict.
+    """
+    def __init__(self, enabled: bool=False, buckets: Tuple[float, ...]=DEFAULT_BUCKETS):
+        """
+        :param enabled: bool indicating to record metrics.
+        :param buckets: upper bounds of histograms buckets.
+        """
+        self.enabled = enabled
+        self.buckets = buckets
+        self.exporters = []
+        self._counters = {}
+        self._histograms = {}
+        self._lock = Lock()
+
+    def enable(self):
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+
+    def add_exporter(self, exporter):
+        """
+        :param exporter: object with export method taking a recorded value dict.
+        :return: exporter.
+        """
+        self.exporters.append(exporter)
+        return exporter
+
+    def remove_exporter(self, exporter):
+        self.exporters.remove(exporter)
+
+    def _export(self, metric_type: str, name: str, labels: dict, value: float):
+        if self.exporters:
+            record = {'type': metric_type, 'name': name, 'labels': labels, 'value': value, 'time': time()}
+            for exporter in self.exporters:
+                exporter.export(record)
+
+    def increment(self, name: str, value: float=1, **labels):
+        """
+        Increments a counter if self is enabled.
+
+        :param name: counter name.
+        :param value: increment.
+        :param labels: counter labels.
+        """
+        if not self.enabled:
+            return
+        key = (name, labels_key(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+        self._export('counter', name, labels, value)
+
+    def observe(self, name: str, value: float, **labels):
+        """
+        Adds a value to a histogram if self is enabled.
+
+        :param name: histogram name.
+        :param value: observed value.
+        :param labels: histogram labels.
+        """
+        if not self.enabled:
+            return
+        key = (name, labels_key(labels))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram(self.buckets)
+            histogram.observe(value)
+        self._export('histogram', name, labels, value)
+
+    @contextmanager
+    def _timer(self, name: str, labels: dict):
+        started = perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, perf_counter() - started, **labels)
+
+    def timer(self, name: str, **labels):
+        """
+        Creates context manager which observes seconds spent in its with block.
+
+        :param name: histogram name.
+        :param labels: histogram labels.
+        :return: context manager, no-op one if self is disabled.
+        """
+        if not self.enabled:
+            return _null_timer
+        return self._timer(name, labels)
+
+    def timed(self, name: str, **labels) -> Callable:
+        """
+        Creates decorator which observes seconds spent in each call of a function.
+
+        :param name: histogram name.
+        :param labels: histogram labels.
+        :return: decorator.
+        """
+        def decorator(function: Callable) -> Callable:
+            @wraps(function)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return function(*args, **kwargs)
+                with self._timer(name, labels):
+                    return function(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def counters(self) -> Dict[Tuple, float]:
+        """
+        :return: dict of counters values by (name, labels key) pairs.
+        """
+        with self._lock:
+            return dict(self._counters)
+
+    def histograms(self) -> Dict[Tuple, Histogram]:
+        """
+        :return: dict of copies of histograms by (name, labels key) pairs.
+        """
+        with self._lock:
+            histograms = {}
+            for key, histogram in self._histograms.items():
+                histograms[key] = copy = Histogram(histogram.buckets)
+                copy.counts, copy.sum, copy.count = list(histogram.counts), histogram.sum, histogram.count
+            return histograms
+
+    def counter_value(self, name: str, **labels) -> float:
+        """
+        :return: value of a counter, 0 if nothing was counted.
+        """
+        return self.counters().get((name, labels_key(labels)), 0)
+
+    def histogram(self, name: str, **labels) -> Histogram:
+        """
+        :return: copy of a histogram or None if nothing was observed.
+        """
+        return self.histograms().get((name, labels_key(labels)))
+
+    def reset(self):
+        """
+        Removes all recorded values.
+        """
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
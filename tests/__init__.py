@@ -3,4 +3,4 @@ tests package entry point.
 
 __all__ tuple contains names of modules with tests which will be used for testing aigym.
 """
-__all__ = ('backends', )
+__all__ = ('backends', 'imports')
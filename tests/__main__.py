@@ -1,14 +1,33 @@
 """
 Command-line interface to aigym.tests.
 
-usage: python -m aigym.tests [-h] [-run]
+usage: python -m aigym.tests [-h] [-run] [-bench] [-bench-rows BENCH_ROWS]
+                             [-bench-repeat BENCH_REPEAT]
+                             [-bench-output BENCH_OUTPUT]
+                             [-bench-baseline BENCH_BASELINE]
+                             [-bench-tolerance BENCH_TOLERANCE]
 
 optional arguments:
-  -h, --help  show this help message and exit
-  -run        runs aigym tests
+  -h, --help            show this help message and exit
+  -run                  runs aigym tests
+  -bench                runs aigym benchmarks on synthetic fer2013 dataset
+  -bench-rows BENCH_ROWS
+                        number of synthetic dataset rows, default is 300
+  -bench-repeat BENCH_REPEAT
+                        number of measurements of each benchmark, default is 3
+  -bench-output BENCH_OUTPUT
+                        path to json file benchmarks results are written to
+  -bench-baseline BENCH_BASELINE
+                        path to json file with baseline results, exits with
+                        status 1 if some benchmarks regressed
+  -bench-tolerance BENCH_TOLERANCE
+                        allowed relative slowdown against baseline, default is
+                        0.25
 
 """
 import os
+import sys
+import json
 from argparse import ArgumentParser
 from subprocess import run
 
@@ -18,6 +37,21 @@ from aigym import tests
 
 argument_parser = ArgumentParser('aigym.tests')
 argument_parser.add_argument('-run', action='store_true', help="runs aigym tests")
+argument_parser.add_argument('-bench', action='store_true', help="runs aigym benchmarks on synthetic fer2013 dataset")
+argument_parser.add_argument(
+    '-bench-rows', type=int, default=300, help="number of synthetic dataset rows, default is 300"
+)
+argument_parser.add_argument(
+    '-bench-repeat', type=int, default=3, help="number of measurements of each benchmark, default is 3"
+)
+argument_parser.add_argument('-bench-output', help="path to json file benchmarks results are written to")
+argument_parser.add_argument(
+    '-bench-baseline',
+    help="path to json file with baseline results, exits with status 1 if some benchmarks regressed",
+)
+argument_parser.add_argument(
+    '-bench-tolerance', type=float, default=0.25, help="allowed relative slowdown against baseline, default is 0.25"
+)
 
 parsed_arguments = argument_parser.parse_args()
 
@@ -27,3 +61,24 @@ if parsed_arguments.run:
         logger.debug("testing {} package".format(filename))
         run(['python', '-m', 'unittest', os.path.join(os.path.dirname(__file__), "{}.py".format(filename))])
     logger.debug("testing finished.")
+
+if parsed_arguments.bench:
+    from aigym.tests.benchmarks import run_benchmarks, compare_with_baseline, read_results, write_results
+
+    logger.debug("benchmarking started...")
+    results = run_benchmarks(parsed_arguments.bench_rows, parsed_arguments.bench_repeat)
+    logger.debug("benchmarking finished.")
+    if parsed_arguments.bench_output:
+        write_results(parsed_arguments.bench_output, results)
+    else:
+        print(json.dumps(results, indent=2, sort_keys=True))
+    if parsed_arguments.bench_baseline:
+        regressions = compare_with_baseline(
+            results, read_results(parsed_arguments.bench_baseline), parsed_arguments.bench_tolerance
+        )
+        for name, baseline_seconds, seconds in regressions:
+            print("{} regressed: {:.6f}s -> {:.6f}s ({:+.1%})".format(
+                name, baseline_seconds, seconds, seconds / baseline_seconds - 1
+            ))
+        if regressions:
+            sys.exit(1)
@@ -1,10 +1,13 @@
 """
 Contains aigym.app package dummy tests :)
 """
+import json
+import socket
 from unittest import TestCase
 from collections import deque
+from threading import Thread, Event
 
-from aigym.app import AIApplication, BackendedAIApplication
+from aigym.app import AIApplication, BackendedAIApplication, ServingAIApplication
 from aigym.app.structure import DequeValuesDict, ApplicationStructureTemplate
 
 
@@ -27,6 +30,59 @@ class BackendedAIAppTestCase(TestCase):
         self.assertIsNotNone(self.backended_ai_app.backend)
 
 
+class ServingAIAppTestCase(TestCase):
+    def setUp(self):
+        self.entered, self.released = Event(), Event()
+        self.serving_ai_app = ServingAIApplication(self, port=0, max_in_flight=2)
+        self.thread = Thread(target=self.serving_ai_app.run, daemon=True)
+        self.thread.start()
+        self.assertTrue(self.serving_ai_app.wait_ready(5))
+
+    def tearDown(self):
+        self.released.set()
+        self.serving_ai_app.close()
+        self.thread.join(5)
+
+    def respond_on(self, request):
+        self.entered.set()
+        self.released.wait(5)
+        return request.sum(axis=0)
+
+    def request(self, connection, *messages):
+        connection.sendall(''.join(json.dumps(message) + '\n' for message in messages).encode())
+
+    def test_respond(self):
+        self.released.set()
+        with socket.create_connection(self.serving_ai_app.address[:2], 5) as connection:
+            self.request(connection, {'id': 1, 'image': [[1, 2], [3, 4]]}, {'id': 2})
+            lines = connection.makefile()
+            responses = {response['id']: response for response in (json.loads(lines.readline()) for _ in range(2))}
+        self.assertEqual(responses[1], {'id': 1, 'result': [4.0, 6.0]})
+        self.assertIn('KeyError', responses[2]['error'])
+
+    def test_graceful_close(self):
+        with socket.create_connection(self.serving_ai_app.address[:2], 5) as connection:
+            self.request(connection, {'id': 1, 'image': [[1, 2], [3, 4]]})
+            self.assertTrue(self.entered.wait(5))
+            self.serving_ai_app.close()
+            self.released.set()
+            response = json.loads(connection.makefile().readline())
+        self.assertEqual(response, {'id': 1, 'result': [4.0, 6.0]})
+        self.thread.join(5)
+        self.assertFalse(self.thread.is_alive())
+        self.assertIsNone(self.serving_ai_app.address)
+
+    def test_close_timeout(self):
+        self.serving_ai_app.shutdown_timeout = 0.1
+        with socket.create_connection(self.serving_ai_app.address[:2], 5) as connection:
+            self.request(connection, {'id': 1, 'image': [[1, 2], [3, 4]]})
+            self.assertTrue(self.entered.wait(5))
+            self.serving_ai_app.close()
+            self.thread.join(5)
+            self.assertFalse(self.thread.is_alive())
+            self.assertEqual(connection.makefile().readline(), '')
+
+
 class DequeValuesDictTestCase(TestCase):
     @classmethod
     def setUpClass(cls):
@@ -2,9 +2,117 @@
 Contains aigym.backends package tests.
 """
 import os
+import shutil
 from unittest import TestCase
+from tempfile import TemporaryDirectory
+from concurrent.futures import ThreadPoolExecutor
+from threading import Event, Lock
+from time import sleep
 
-from aigym.backends import EmrecBackend
+from numpy import ones, zeros, full, eye, array, array_equal, save, uint8, int8, float32, hstack, dstack
+from numpy import shares_memory
+
+from aigym.backends import EmrecBackend, TrainingConfig
+from aigym.backends.base import DNNBackend
+from aigym.backends.batching import MicroBatcher
+from aigym.backends.caching import PredictionCache
+from aigym.backends.benchmarks import training_config_variants, relocated_backend_class
+from aigym.backends.checkpoints import CheckpointIndex, read_checkpoint_state
+from aigym.backends.plots import compute_emrecbackend_model_prediction_matrix
+from aigym.backends.inference import InferencePreprocessor
+from aigym.backends.pool import BackendWorkerPool
+from aigym.backends.registry import ModelRegistry
+from aigym.backends.reloading import ModelReloader
+from aigym.backends.streaming import VideoStreamPipeline
+from aigym.dataset import Fer2013RawDataset, Fer2013PreparedDataset
+from aigym.dataset.classifiers import FaceDetector
+from aigym.tests.benchmarks import synthetic_face_images, redirect_filepaths
+
+
+class SumBackend:
+    """
+    Model-less backend which responds with sums of images, used by worker pool tests.
+
+    Its process exits on images with values above 100 and it raises an exception which can't be pickled on 50.
+    """
+    def build_algorithm(self):
+        pass
+
+    def create_model(self):
+        pass
+
+    def load_model(self):
+        pass
+
+    def respond_on_batch(self, requests):
+        if requests.max() < 0:
+            raise ValueError("negative images")
+        if requests.max() > 100:
+            os._exit(1)
+        if requests.max() == 50:
+            raise ValueError(Lock())
+        return requests.sum(axis=(1, 2, 3))
+
+
+class SumModel:
+    """
+    Model which predicts sums of images, used by micro-batching tests.
+    """
+    def predict(self, images):
+        return images.reshape([len(images), -1]).sum(axis=1, keepdims=True)
+
+
+class FileSession:
+    """
+    Session of a file model which only records that it was closed.
+    """
+    closed = False
+
+    def close(self):
+        self.closed = True
+
+
+class FileModel:
+    """
+    Model whose weights are a text of its file, used by hot reloading tests.
+    """
+    weights = None
+
+    def __init__(self):
+        self.session = FileSession()
+
+    def save(self, filepath):
+        with open(filepath, 'w') as model_file:
+            model_file.write(self.weights)
+
+    def load(self, filepath):
+        with open(filepath) as model_file:
+            self.weights = model_file.read()
+
+
+class FileModelBackend(DNNBackend):
+    """
+    DNN backend with file models stored in a temporary directory, used by hot reloading tests.
+    """
+    model_file_dir_path = None
+
+    def setup(self):
+        pass
+
+    def build_algorithm(self):
+        pass
+
+    def learn_model(self):
+        pass
+
+    def build_in_new_graph(self):
+        return None, FileModel()
+
+    def respond_on(self, request):
+        with self.model_in_use() as model:
+            if request is not None:
+                request.wait(5)
+            return model.weights
 
 
 class EmrecBackendTestCase(TestCase):
@@ -29,6 +137,10 @@ class EmrecBackendTestCase(TestCase):
         self.emrec_backend.load_model()
         self.assertIsNotNone(self.emrec_backend.model.predictor)
 
+    def test_model_version(self):
+        self.assertEqual(self.emrec_backend.model_version, self.emrec_backend.model_registry.latest_version)
+        self.assertTrue(self.emrec_backend.model_registry.metadata(self.emrec_backend.model_version)['architecture'])
+
     def test_respond_on(self):
         self.assertIsNone(self.emrec_backend.respond_on(None))
 
@@ -36,5 +148,497 @@ class EmrecBackendTestCase(TestCase):
     @classmethod
     def tearDownClass(cls):
         for dir_item in os.listdir(cls.emrec_backend.model_file_dir_path):
-            os.remove(os.path.join(cls.emrec_backend.model_file_dir_path, dir_item))
+            dir_item_path = os.path.join(cls.emrec_backend.model_file_dir_path, dir_item)
+            if os.path.isdir(dir_item_path):
+                shutil.rmtree(dir_item_path)
+            else:
+                os.remove(dir_item_path)
         del cls.emrec_backend
+
+
+class EmrecBackendMicroBatchingTestCase(TestCase):
+    def setUp(self):
+        self.emrec_backend = EmrecBackend()
+        self.emrec_backend.model = SumModel()
+
+    def test_respond_on_micro_batch(self):
+        results = self.emrec_backend.respond_on_micro_batch([ones((48, 48)), ones((3, 48, 48, 1))])
+        self.assertEqual([result.tolist() for result in results], [[[2304.0]], [[2304.0]] * 3])
+
+    def test_multiple_images_request(self):
+        self.emrec_backend.enable_micro_batching(max_wait=0.01)
+        try:
+            with ThreadPoolExecutor(2) as executor:
+                results = list(executor.map(self.emrec_backend.respond_on, [ones((48, 48)), ones((2, 48, 48))]))
+        finally:
+            self.emrec_backend.disable_micro_batching()
+        self.assertEqual([result.tolist() for result in results], [[[2304.0]], [[2304.0]] * 2])
+
+
+class TrainingConfigTestCase(TestCase):
+    def test_defaults(self):
+        self.assertEqual(
+            TrainingConfig().to_dict(),
+            {
+                'batch_size': 50, 'epochs': 100, 'snapshot_step': 200, 'snapshot_epoch': True,
+                'tensorboard_verbose': 3, 'threads': 0, 'keep_best_checkpoints': 1,
+            },
+        )
+
+    def test_replace(self):
+        training_config = TrainingConfig(batch_size=32)
+        self.assertEqual(training_config.replace(epochs=5), TrainingConfig(batch_size=32, epochs=5))
+        self.assertEqual(training_config.batch_size, 32)
+
+    def test_validation(self):
+        for kwargs in ({'batch_size': 0}, {'snapshot_step': 0}, {'tensorboard_verbose': 4}, {'threads': -1}):
+            with self.subTest(**kwargs):
+                with self.assertRaises(ValueError):
+                    TrainingConfig(**kwargs)
+
+    def test_variants(self):
+        variants = training_config_variants(TrainingConfig())
+        self.assertEqual(variants[0], TrainingConfig())
+        self.assertEqual(len(variants), len({repr(variant) for variant in variants}))
+        self.assertIn(TrainingConfig(tensorboard_verbose=0), variants)
+
+    def test_relocated_backend_class(self):
+        with TemporaryDirectory() as dir_path:
+            backend = relocated_backend_class(EmrecBackend, dir_path)()
+            self.assertEqual(backend.name, 'Emrec')
+            self.assertEqual(sorted(os.listdir(dir_path)), ['checkpoints', 'learn_logs', 'models'])
+
+
+class CheckpointIndexTestCase(TestCase):
+    def setUp(self):
+        self.temporary_dir = TemporaryDirectory()
+
+    def checkpoint(self, step):
+        path = os.path.join(self.temporary_dir.name, 'Model-{}'.format(step))
+        for extension in ('index', 'meta', 'data-00000-of-00001'):
+            open('{}.{}'.format(path, extension), 'w').close()
+        return path
+
+    def test_record(self):
+        checkpoint_index = CheckpointIndex(self.temporary_dir.name, keep_best=2)
+        for step, accuracy in ((100, 0.5), (200, 0.7), (300, 0.6), (400, 0.4), (500, None)):
+            checkpoint_index.record(self.checkpoint(step), step // 100, step, {'val_acc': accuracy})
+        self.assertEqual([entry['step'] for entry in checkpoint_index.best], [200, 300])
+        self.assertEqual(checkpoint_index.latest['epoch'], 5)
+        self.assertEqual(
+            sorted(os.listdir(self.temporary_dir.name)),
+            sorted(['index.json'] + ['Model-{}.{}'.format(step, extension) for step in (200, 300, 500)
+                                     for extension in ('data-00000-of-00001', 'index', 'meta')]),
+        )
+        reread_checkpoint_index = CheckpointIndex(self.temporary_dir.name)
+        self.assertEqual(reread_checkpoint_index.entries, checkpoint_index.entries)
+        self.assertEqual(reread_checkpoint_index.path_of(reread_checkpoint_index.latest), self.checkpoint(500))
+
+    def test_malformed_index(self):
+        with open(os.path.join(self.temporary_dir.name, CheckpointIndex.filename), 'w') as index_file:
+            index_file.write('{"checkpoints": [{"path": "Model-1"}, 1')
+        self.assertIsNone(CheckpointIndex(self.temporary_dir.name).latest)
+
+    def test_read_checkpoint_state(self):
+        self.assertEqual(read_checkpoint_state(self.temporary_dir.name), [])
+        with open(os.path.join(self.temporary_dir.name, 'checkpoint'), 'w') as state_file:
+            state_file.write(
+                'model_checkpoint_path: "Model: \\"best\\"-200"\n'
+                'all_model_checkpoint_paths: "/absolute/Model-100"\n'
+                'all_model_checkpoint_paths: "Model: \\"best\\"-200"\n'
+                'malformed line\n'
+            )
+        self.assertEqual(
+            read_checkpoint_state(self.temporary_dir.name),
+            ['/absolute/Model-100', os.path.join(self.temporary_dir.name, 'Model: "best"-200')],
+        )
+
+    def tearDown(self):
+        self.temporary_dir.cleanup()
+
+
+class ModelRegistryTestCase(TestCase):
+    def setUp(self):
+        self.temporary_dir = TemporaryDirectory()
+        self.model_registry = ModelRegistry(os.path.join(self.temporary_dir.name, 'Model'))
+
+    def save(self, dir_path):
+        with open(os.path.join(dir_path, 'Model.model'), 'w') as model_file:
+            model_file.write('weights')
+
+    def test_publish(self):
+        self.assertIsNone(self.model_registry.latest_version)
+        self.assertEqual(self.model_registry.publish(self.save, metrics={'accuracy': 0.5}), 1)
+        self.assertEqual(self.model_registry.publish(self.save, dataset_digest='digest'), 2)
+        self.assertEqual(self.model_registry.versions, [1, 2])
+        self.assertEqual(self.model_registry.metadata(1)['metrics'], {'accuracy': 0.5})
+        self.assertEqual(self.model_registry.metadata(2)['dataset_digest'], 'digest')
+        self.assertEqual(list(self.model_registry.metadata(2)['files']), ['Model.model'])
+        self.assertEqual(sorted(os.listdir(self.model_registry.dir_path)), ['1', '2'])
+
+    def test_failed_publish(self):
+        with self.assertRaises(OSError):
+            self.model_registry.publish(lambda dir_path: open(os.path.join(dir_path, 'missing', 'file'), 'w'))
+        self.assertEqual(os.listdir(self.model_registry.dir_path), [])
+
+    def test_verify(self):
+        version = self.model_registry.publish(self.save)
+        self.model_registry.verify(version)
+        with open(self.model_registry.artifact_path(version, 'Model.model'), 'a') as model_file:
+            model_file.write('corruption')
+        with self.assertRaises(ValueError):
+            self.model_registry.verify(version)
+
+    def test_remove(self):
+        version = self.model_registry.publish(self.save)
+        self.model_registry.remove(version)
+        self.assertEqual(self.model_registry.versions, [])
+        with self.assertRaises(KeyError):
+            self.model_registry.metadata(version)
+
+    def tearDown(self):
+        self.temporary_dir.cleanup()
+
+
+class ModelReloaderTestCase(TestCase):
+    def setUp(self):
+        self.temporary_dir = TemporaryDirectory()
+        self.backend = FileModelBackend()
+        self.backend.model_file_dir_path = self.temporary_dir.name
+        self.backend.model = FileModel()
+        self.publish('1')
+        self.backend.load_model()
+
+    def publish(self, weights):
+        model = FileModel()
+        model.weights = weights
+        return self.backend.model_registry.publish(
+            lambda dir_path: model.save(os.path.join(dir_path, self.backend.model_filename))
+        )
+
+    def test_reload(self):
+        model_reloader = ModelReloader(self.backend)
+        self.assertFalse(model_reloader.reload())
+        released = Event()
+        with ThreadPoolExecutor(2) as executor:
+            in_flight = executor.submit(self.backend.respond_on, released)
+            sleep(0.05)
+            self.publish('2')
+            reloaded = executor.submit(model_reloader.reload)
+            sleep(0.05)
+            self.assertEqual(self.backend.respond_on(None), '2')
+            self.assertFalse(reloaded.done())
+            released.set()
+            self.assertEqual(in_flight.result(5), '1')
+            self.assertTrue(reloaded.result(5))
+        self.assertEqual(self.backend.model_version, 2)
+
+    def test_load_saved_version(self):
+        self.backend.model.weights = '2'
+        version = self.backend.save_model()
+        self.backend.model.weights = 'learned further'
+        self.backend.load_model(version)
+        self.assertEqual(self.backend.respond_on(None), '2')
+        self.assertTrue(ModelReloader(self.backend, version=1).reload())
+        self.assertEqual(self.backend.respond_on(None), '1')
+
+    def test_release_models(self):
+        models = [self.backend.model]
+        model_reloader = ModelReloader(self.backend)
+        for weights in ('2', '3', '4'):
+            self.publish(weights)
+            self.assertTrue(model_reloader.reload())
+            models.append(self.backend.model)
+        self.assertEqual([model.session.closed for model in models], [True, True, False, False])
+        self.assertEqual(self.backend.respond_on(None), '4')
+
+    def test_rollback(self):
+        self.publish('2')
+        self.backend.load_model()
+        self.assertTrue(ModelReloader(self.backend, version=1).reload())
+        self.assertEqual((self.backend.model_version, self.backend.respond_on(None)), (1, '1'))
+
+    def test_watching(self):
+        with ModelReloader(self.backend, interval=0.01):
+            self.publish('2')
+            for _ in range(100):
+                if self.backend.model_version == 2:
+                    break
+                sleep(0.01)
+        self.assertEqual(self.backend.respond_on(None), '2')
+
+    def tearDown(self):
+        self.temporary_dir.cleanup()
+
+
+class PredictionCacheTestCase(TestCase):
+    def test_key_of(self):
+        self.assertEqual(PredictionCache.key_of(ones((2, 2)), 1), PredictionCache.key_of(ones((2, 2)), 1))
+        self.assertNotEqual(PredictionCache.key_of(ones((2, 2)), 1), PredictionCache.key_of(ones((2, 2)), 2))
+        self.assertNotEqual(PredictionCache.key_of(ones((2, 2)), 1), PredictionCache.key_of(ones((4, )), 1))
+        self.assertNotEqual(PredictionCache.key_of(ones((2, 2)), 1), PredictionCache.key_of(ones((2, 2), uint8), 1))
+
+    def test_eviction(self):
+        prediction_cache = PredictionCache(max_size=2)
+        for key in ('a', 'b', 'a', 'c'):
+            if not prediction_cache.get(key)[0]:
+                prediction_cache.put(key, key.upper())
+        self.assertEqual(prediction_cache.get('a'), (True, 'A'))
+        self.assertEqual(prediction_cache.get('b'), (False, None))
+        self.assertEqual(
+            prediction_cache.statistics(), {'hits': 2, 'misses': 4, 'evictions': 1, 'size': 2, 'hit_rate': 1 / 3}
+        )
+
+    def test_ttl(self):
+        prediction_cache = PredictionCache(ttl=0.01)
+        prediction_cache.put('a', 'A')
+        sleep(0.02)
+        self.assertEqual(prediction_cache.get('a'), (False, None))
+
+    def test_generation(self):
+        prediction_cache = PredictionCache()
+        generation = prediction_cache.generation
+        prediction_cache.clear()
+        prediction_cache.put('a', 'A', generation)
+        self.assertEqual(len(prediction_cache), 0)
+
+    def test_backend_invalidation(self):
+        with TemporaryDirectory() as dir_path:
+            backend = FileModelBackend()
+            backend.model_file_dir_path = dir_path
+            backend.model = FileModel()
+            backend.enable_prediction_cache()
+            responses = []
+
+            def respond(request):
+                responses.append(backend.model.weights)
+                return backend.model.weights
+
+            for weights in ('1', '2'):
+                model = FileModel()
+                model.weights = weights
+                backend.model_registry.publish(
+                    lambda version_dir_path: model.save(os.path.join(version_dir_path, backend.model_filename))
+                )
+                backend.load_model()
+                self.assertEqual([backend.respond_on_cached(ones((2, 2)), respond) for _ in range(3)], [weights] * 3)
+            self.assertEqual(responses, ['1', '2'])
+            self.assertEqual(backend.prediction_cache.statistics()['hits'], 4)
+            backend.disable_prediction_cache()
+            self.assertIsNone(backend.prediction_cache)
+
+
+class InferencePreprocessorTestCase(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        first_face, second_face = synthetic_face_images(2)
+        cls.image = hstack([first_face, full((48, 30), 90, uint8), second_face])
+
+    def test_preprocess(self):
+        inference_preprocessor = InferencePreprocessor(border=51)
+        faces, faces_images = inference_preprocessor.preprocess(dstack([self.image] * 3))
+        self.assertEqual(len(faces), 2)
+        self.assertEqual(faces_images.shape, (2, 48, 48, 1))
+        self.assertEqual(faces_images.dtype, float32)
+        self.assertTrue(0 <= faces_images.min() and faces_images.max() <= 1)
+        height, width = self.image.shape
+        self.assertTrue((faces >= 0).all())
+        self.assertTrue((faces[:, 0] + faces[:, 2] <= width).all() and (faces[:, 1] + faces[:, 3] <= height).all())
+
+    def test_clip_faces(self):
+        faces = InferencePreprocessor.clip_faces(array([[-10, 5, 30, 30], [40, 40, 20, 20]]), (50, 50))
+        self.assertEqual(faces.tolist(), [[0, 5, 20, 30], [40, 40, 10, 10]])
+
+    def test_buffers_reuse(self):
+        inference_preprocessor = InferencePreprocessor(border=51, max_faces=1)
+        first_faces, first_faces_images = inference_preprocessor.preprocess(self.image)
+        second_faces, second_faces_images = inference_preprocessor.preprocess(self.image)
+        self.assertEqual(len(first_faces), 1)
+        self.assertTrue(shares_memory(first_faces_images, second_faces_images))
+
+    def test_matches_preparation(self):
+        image = synthetic_face_images(1)[0]
+        faces, faces_images = EmrecBackend().inference_preprocessor.preprocess(image)
+        prepared_image = Fer2013RawDataset().format(image)
+        largest_face_image = faces_images[(faces[:, 2] * faces[:, 3]).argmax(), :, :, 0]
+        self.assertTrue(abs(largest_face_image - prepared_image).max() < 1e-6)
+
+    def test_no_faces(self):
+        faces, faces_images = InferencePreprocessor().preprocess(zeros((48, 48), uint8))
+        self.assertEqual((faces.shape, faces_images.shape), ((0, 4), (0, 48, 48, 1)))
+
+
+class MicroBatcherTestCase(TestCase):
+    def setUp(self):
+        self.batches_sizes = []
+        self.micro_batcher = MicroBatcher(self.handle, max_batch_size=8, max_wait=0.05)
+
+    def handle(self, requests):
+        self.batches_sizes.append(len(requests))
+        return [request * 2 for request in requests]
+
+    def test_call(self):
+        with ThreadPoolExecutor(16) as executor:
+            results = list(executor.map(self.micro_batcher, range(32)))
+        self.assertEqual(results, [request * 2 for request in range(32)])
+        self.assertLess(len(self.batches_sizes), 32)
+        self.assertLessEqual(max(self.batches_sizes), 8)
+
+    def test_handler_exception(self):
+        with self.assertRaises(TypeError):
+            self.micro_batcher(None)
+
+    def test_submit_while_closing(self):
+        with ThreadPoolExecutor(8) as executor:
+            futures = [executor.submit(self.micro_batcher.submit, request) for request in range(200)]
+            self.micro_batcher.close()
+        for request, future in enumerate(futures):
+            try:
+                self.assertEqual(future.result(5).result(5), request * 2)
+            except RuntimeError:
+                pass
+
+    def tearDown(self):
+        self.micro_batcher.close()
+
+
+class VideoStreamPipelineTestCase(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        from cv2 import VideoWriter, VideoWriter_fourcc
+
+        cls.temporary_dir = TemporaryDirectory()
+        cls.video_filepath = os.path.join(cls.temporary_dir.name, 'video.avi')
+        video_writer = VideoWriter(cls.video_filepath, VideoWriter_fourcc(*'MJPG'), 25, (96, 96))
+        for _ in range(10):
+            video_writer.write(zeros((96, 96, 3), uint8))
+        video_writer.release()
+
+    def respond_on_batch(self, requests):
+        return zeros((len(requests), 7))
+
+    def test_iteration(self):
+        pipeline = VideoStreamPipeline(self, self.video_filepath, overflow_policy='block', frame_step=2)
+        frames_predictions = list(pipeline)
+        self.assertEqual([frame_prediction.frame_index for frame_prediction in frames_predictions], [0, 2, 4, 6, 8])
+        self.assertEqual(pipeline.latency_stats['frames'], 5)
+
+    def test_slow_consumer(self):
+        pipeline = VideoStreamPipeline(self, self.video_filepath, queue_size=1, overflow_policy='block')
+        frames_indices = []
+        for frame_prediction in pipeline:
+            sleep(0.01)
+            self.assertLessEqual(pipeline._predictions.qsize(), 1)
+            frames_indices.append(frame_prediction.frame_index)
+        self.assertEqual(frames_indices, list(range(10)))
+
+    def test_dropping_policies(self):
+        for overflow_policy in ('drop_oldest', 'skip_newest'):
+            with self.subTest(overflow_policy=overflow_policy):
+                pipeline = VideoStreamPipeline(self, self.video_filepath, queue_size=1, overflow_policy=overflow_policy)
+                frames_indices = []
+                for frame_prediction in pipeline:
+                    sleep(0.02)
+                    frames_indices.append(frame_prediction.frame_index)
+                self.assertEqual(frames_indices, sorted(set(frames_indices)))
+                self.assertTrue(set(frames_indices) <= set(range(10)))
+                if overflow_policy == 'drop_oldest':
+                    self.assertEqual(frames_indices[-1], 9)
+                else:
+                    self.assertEqual(frames_indices[0], 0)
+                    self.assertEqual(len(frames_indices) + pipeline.dropped_frames_number, 10)
+
+    def test_early_stop(self):
+        pipeline = VideoStreamPipeline(self, self.video_filepath, queue_size=1, overflow_policy='block')
+        for frame_prediction in pipeline:
+            self.assertEqual(frame_prediction.frame_index, 0)
+            break
+        self.assertFalse(any(thread.is_alive() for thread in pipeline._threads))
+
+    def test_backend_preprocessor(self):
+        self.inference_preprocessor = InferencePreprocessor(border=51)
+        try:
+            pipeline = VideoStreamPipeline(self, self.video_filepath)
+            self.assertIs(pipeline.preprocessor, self.inference_preprocessor)
+            self.assertEqual(VideoStreamPipeline(self, self.video_filepath, FaceDetector()).preprocessor.border, 51)
+        finally:
+            del self.inference_preprocessor
+
+    def test_invalid_overflow_policy(self):
+        with self.assertRaises(ValueError):
+            VideoStreamPipeline(self, self.video_filepath, overflow_policy='unknown')
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.temporary_dir.cleanup()
+
+
+class PredictionMatrixTestCase(TestCase):
+    predicted_labels = array([0, 1, 1, 1, 2, 3])
+
+    def setUp(self):
+        self.temporary_dir = TemporaryDirectory()
+        self.prepared_dataset = Fer2013PreparedDataset()
+        redirect_filepaths(self.prepared_dataset, self.temporary_dir.name)
+        for images_filepath, labels_filepath in (
+                (self.prepared_dataset.prepared_images_filepath, self.prepared_dataset.prepared_images_labels_filepath),
+                (self.prepared_dataset.prepared_test_images_filepath,
+                 self.prepared_dataset.prepared_test_images_labels_filepath),
+        ):
+            save(images_filepath, zeros((6, 48, 48), uint8))
+            save(labels_filepath, array([0, 0, 1, 1, 1, 3], int8))
+        self.responded = 0
+
+    def respond_on_batch(self, requests):
+        self.assertEqual(requests.dtype, float32)
+        predicted_labels = self.predicted_labels[self.responded:self.responded + len(requests)]
+        self.responded += len(requests)
+        return eye(7)[predicted_labels]
+
+    def test_compute(self):
+        data = compute_emrecbackend_model_prediction_matrix(self, batch_size=4)
+        expected_data = zeros((7, 7))
+        expected_data[0, :2] = 0.5
+        expected_data[1, 1:3] = 2 / 3, 1 / 3
+        expected_data[3, 3] = 1.0
+        self.assertTrue(array_equal(data.round(6), expected_data.round(6)))
+        self.assertEqual(data.sum(axis=1).round(6).tolist(), [1.0, 1.0, 0.0, 1.0, 0.0, 0.0, 0.0])
+
+    def tearDown(self):
+        self.temporary_dir.cleanup()
+
+
+class BackendWorkerPoolTestCase(TestCase):
+    def test_dispatch(self):
+        for dispatch in ('round_robin', 'least_loaded'):
+            with self.subTest(dispatch=dispatch):
+                with BackendWorkerPool(SumBackend, workers=2, dispatch=dispatch, request_shape=(2, 2, 1)) as pool:
+                    futures = [pool.submit(ones((index % 3 + 1, 2, 2, 1))) for index in range(16)]
+                    results = [future.result(10) for future in futures]
+                    self.assertEqual(pool.loads, (0, 0))
+                self.assertEqual([result.tolist() for result in results], [[4.0] * (i % 3 + 1) for i in range(16)])
+
+    def test_exception(self):
+        with BackendWorkerPool(SumBackend, workers=1, request_shape=(2, 2, 1)) as pool:
+            with self.assertRaises(ValueError):
+                pool.respond_on(-ones((2, 2, 1)))
+            with self.assertRaises(ValueError):
+                pool.submit(ones((33, 2, 2, 1)))
+            self.assertEqual(pool.respond_on(ones((2, 2, 1))).tolist(), [4.0])
+
+    def test_unpicklable_exception(self):
+        with BackendWorkerPool(SumBackend, workers=1, request_shape=(2, 2, 1), timeout=10) as pool:
+            with self.assertRaises(RuntimeError):
+                pool.respond_on(full((2, 2, 1), 50))
+            self.assertEqual(pool.respond_on(ones((2, 2, 1))).tolist(), [4.0])
+
+    def test_dead_worker(self):
+        with BackendWorkerPool(SumBackend, workers=1, request_shape=(2, 2, 1), slots=1, timeout=10) as pool:
+            with self.assertRaises(RuntimeError):
+                pool.respond_on(full((2, 2, 1), 101))
+            self.assertEqual(pool.loads, (0,))
+            self.assertEqual(pool.respond_on(ones((2, 2, 1))).tolist(), [4.0])
+
+    def test_invalid_dispatch(self):
+        with self.assertRaises(ValueError):
+            BackendWorkerPool(SumBackend, dispatch='unknown')
@@ -0,0 +1,268 @@
+"""
+Contains aigym benchmarks of dataset preparation, dataset loading and inference.
+
+write_synthetic_fer2013_csv - writes fer2013 format csv file with generated face images.
+
+run_benchmarks - measures hot paths on synthetic data and returns machine-readable results.
+
+compare_with_baseline - finds benchmarks which became slower than in stored baseline results.
+
+Results are dicts with 'meta' and 'benchmarks' keys, the latter maps benchmark names to median seconds:
+    prepare.<stage> - seconds spent in a Fer2013RawDataset.prepare stage, e.g. prepare.decode, prepare.detect_face.
+    prepare.total - seconds spent in the whole Fer2013RawDataset.prepare.
+    load.<mode> - seconds spent in Fer2013PreparedDataset.load in default, mmap and compact modes.
+    respond_on.<batch size> - seconds spent in EmrecBackend.respond_on with a batch of images.
+"""
+import os
+import csv
+import json
+import platform
+from importlib.util import find_spec
+from statistics import median
+from tempfile import TemporaryDirectory
+from time import perf_counter
+from typing import Callable, Iterable, List
+
+import numpy
+from numpy import full, uint8, clip
+from numpy.random import RandomState
+
+from aigym.logging import logger
+
+FER2013_USAGES = (('Training', 0.8), ('PublicTest', 0.1), ('PrivateTest', 0.1))
+
+LOAD_MODES = (('default', {}), ('mmap', {'mmap': True}), ('compact', {'compact': True}))
+
+RESPOND_ON_BATCH_SIZES = (1, 8, 32, 128)
+
+
+def synthetic_face_images(number: int, face_size: int=48, seed: int=0) -> numpy.ndarray:
+    """
+    Draws cartoon faces which are found by frontal face cascade classifier after wrapping with gray border.
+
+    :param number: number of images.
+    :param face_size: size of square images.
+    :param seed: seed of random variations of faces.
+    :return: numpy.ndarray of uint8 type with (number, face size, face size) shape.
+    """
+    from cv2 import ellipse, line, GaussianBlur
+
+    random_state = RandomState(seed)
+    scale = face_size / 48
+    images = []
+    for _ in range(number):
+        image = full((face_size, face_size), 90, uint8)
+        x, y = [int(round(24 * scale)) + random_state.randint(-2, 3) for _ in range(2)]
+        ellipse(image, (x, y + int(2 * scale)), (int(18 * scale), int(22 * scale)), 0, 0, 360,
+                int(random_state.randint(170, 220)), -1)
+        ellipse(image, (x - int(8 * scale), y - int(4 * scale)), (int(4 * scale), int(2 * scale)), 0, 0, 360, 40, -1)
+        ellipse(image, (x + int(8 * scale), y - int(4 * scale)), (int(4 * scale), int(2 * scale)), 0, 0, 360, 40, -1)
+        line(image, (x, y - int(2 * scale)), (x - 1, y + int(6 * scale)), 120, 1)
+        ellipse(image, (x, y + int(12 * scale)), (int(7 * scale), int(3 * scale)), 0, 0, 360, 60, -1)
+        image = GaussianBlur(image, (3, 3), 0).astype(int) + random_state.randint(-10, 11, image.shape)
+        images.append(clip(image, 0, 255).astype(uint8))
+    return numpy.asarray(images).reshape((number, face_size, face_size))
+
+
+def write_synthetic_fer2013_csv(filepath: str, rows: int=300, seed: int=0, emotions_number: int=7,
+                                face_size: int=48) -> str:
+    """
+    Writes fer2013 format csv file with 'emotion', 'pixels' and 'Usage' columns.
+
+    Rows are split between Training, PublicTest and PrivateTest usages in 8:1:1 proportion.
+
+    :param filepath: path of the written file.
+    :param rows: number of rows.
+    :param seed: seed of generated emotions and images.
+    :param emotions_number: number of emotion classes.
+    :param face_size: size of square images.
+    :return: filepath.
+    """
+    random_state = RandomState(seed)
+    usages = []
+    for usage, proportion in FER2013_USAGES:
+        usages += [usage] * int(round(rows * proportion))
+    usages = (usages + [FER2013_USAGES[0][0]] * rows)[:rows]
+    emotions = random_state.randint(emotions_number, size=rows)
+    images = synthetic_face_images(rows, face_size, seed)
+    with open(filepath, 'w', newline='') as csv_file:
+        writer = csv.writer(csv_file)
+        writer.writerow(('emotion', 'pixels', 'Usage'))
+        for emotion, image, usage in zip(emotions, images, usages):
+            writer.writerow((int(emotion), ' '.join(map(str, image.ravel())), usage))
+    return filepath
+
+
+def redirect_filepaths(dataset, dir_path: str):
+    """
+    Points prepared files of a dataset to a directory, so benchmarks don't touch real datasets.
+
+    :param dataset: dataset object with config mixin.
+    :param dir_path: path to the directory.
+    """
+    for attribute_name in dir(dataset):
+        if attribute_name.endswith('_filepath'):
+            filename = os.path.basename(getattr(dataset, attribute_name))
+            setattr(dataset, attribute_name, os.path.join(dir_path, filename))
+
+
+def measure(function: Callable, repeat: int=3) -> float:
+    """
+    :param function: callable without arguments.
+    :param repeat: number of calls.
+    :return: median of seconds spent in a call.
+    """
+    timings = []
+    for _ in range(repeat):
+        started = perf_counter()
+        function()
+        timings.append(perf_counter() - started)
+    return median(timings)
+
+
+def benchmark_prepare(dir_path: str, raw_filepath: str, repeat: int=3, **prepare_kwargs) -> dict:
+    """
+    :param dir_path: path to a directory where dataset is prepared.
+    :param raw_filepath: path to fer2013 format csv file.
+    :param repeat: number of preparations.
+    :param prepare_kwargs: keyword arguments of Fer2013RawDataset.prepare.
+    :return: dict of median seconds spent in each preparation stage and in the whole preparation.
+    """
+    from aigym.dataset import Fer2013RawDataset
+
+    raw_dataset = Fer2013RawDataset()
+    raw_dataset.filename = os.path.abspath(raw_filepath)
+    redirect_filepaths(raw_dataset, dir_path)
+    prepare_kwargs = dict(prepare_kwargs, force=True, include_private_test=True)
+    stages_timings = []
+    total_timings = []
+    for _ in range(repeat):
+        started = perf_counter()
+        stages_timings.append(raw_dataset.prepare(**prepare_kwargs))
+        total_timings.append(perf_counter() - started)
+    results = {
+        "prepare.{}".format(stage): median(stage_timings.get(stage, 0.0) for stage_timings in stages_timings)
+        for stage in sorted(set().union(*stages_timings))
+    }
+    results['prepare.total'] = median(total_timings)
+    return results
+
+
+def benchmark_load(dir_path: str, repeat: int=3) -> dict:
+    """
+    :param dir_path: path to a directory with prepared dataset.
+    :param repeat: number of loads in each mode.
+    :return: dict of median seconds spent in Fer2013PreparedDataset.load in each mode.
+    """
+    from aigym.dataset import Fer2013PreparedDataset
+
+    prepared_dataset = Fer2013PreparedDataset()
+    redirect_filepaths(prepared_dataset, dir_path)
+    return {
+        "load.{}".format(mode): measure(lambda: prepared_dataset.load(**load_kwargs), repeat)
+        for mode, load_kwargs in LOAD_MODES
+    }
+
+
+def benchmark_respond_on(dir_path: str, batch_sizes: Iterable[int]=RESPOND_ON_BATCH_SIZES, repeat: int=3) -> dict:
+    """
+    Measures EmrecBackend.respond_on of a freshly created model on batches of synthetic face images.
+
+    :param dir_path: path to a directory where model files are written.
+    :param batch_sizes: numbers of images predicted at once.
+    :param repeat: number of predictions of each batch size.
+    :return: dict of median seconds spent in a prediction of each batch size, empty if tflearn isn't installed.
+    """
+    if find_spec('tflearn') is None:
+        logger.warning("respond_on benchmarks are skipped, tflearn isn't installed")
+        return {}
+
+    from tensorflow import Graph
+    from aigym.backends import EmrecBackend
+    from aigym.backends.benchmarks import relocated_backend_class
+
+    benchmarked_backend_class = relocated_backend_class(EmrecBackend, dir_path)
+    batch_sizes = tuple(batch_sizes)
+    results = {}
+    with Graph().as_default():
+        backend = benchmarked_backend_class()
+        backend.build_algorithm()
+        backend.create_model()
+        face_size = backend.prepared_dataset.face_size
+        images = synthetic_face_images(max(batch_sizes), face_size).astype(numpy.float32) / 255
+        backend.respond_on(images[:1])
+        for batch_size in batch_sizes:
+            results["respond_on.{}".format(batch_size)] = measure(
+                lambda: backend.respond_on(images[:batch_size]), repeat
+            )
+    return results
+
+
+def run_benchmarks(rows: int=300, repeat: int=3, batch_sizes: Iterable[int]=RESPOND_ON_BATCH_SIZES,
+                   seed: int=0) -> dict:
+    """
+    Runs all benchmarks on a synthetic fer2013 dataset in a temporary directory.
+
+    :param rows: number of synthetic dataset rows.
+    :param repeat: number of measurements of each benchmark.
+    :param batch_sizes: numbers of images predicted at once by respond_on.
+    :param seed: seed of the synthetic dataset.
+    :return: dict with 'meta' and 'benchmarks' keys.
+    """
+    benchmarks = {}
+    with TemporaryDirectory() as dir_path:
+        raw_filepath = write_synthetic_fer2013_csv(os.path.join(dir_path, 'fer2013.csv'), rows, seed)
+        logger.debug("benchmarking preparation...")
+        benchmarks.update(benchmark_prepare(dir_path, raw_filepath, repeat))
+        logger.debug("benchmarking loading...")
+        benchmarks.update(benchmark_load(dir_path, repeat))
+        logger.debug("benchmarking inference...")
+        benchmarks.update(benchmark_respond_on(dir_path, batch_sizes, repeat))
+    return {
+        'meta': {
+            'rows': rows,
+            'repeat': repeat,
+            'seed': seed,
+            'python': platform.python_version(),
+            'numpy': numpy.__version__,
+            'machine': platform.machine(),
+        },
+        'benchmarks': benchmarks,
+    }
+
+
+def compare_with_baseline(results: dict, baseline: dict, tolerance: float=0.25) -> List[tuple]:
+    """
+    Finds benchmarks which are slower than in baseline results by more than tolerance.
+
+    Benchmarks which are missing in one of results are ignored.
+
+    :param results: results returned by run_benchmarks.
+    :param baseline: baseline results returned by run_benchmarks.
+    :param tolerance: allowed relative slowdown, e.g. 0.25 allows results to be 25% slower.
+    :return: list of (name, baseline seconds, seconds) tuples of regressed benchmarks sorted by name.
+    """
+    regressions = []
+    for name, seconds in sorted(results['benchmarks'].items()):
+        baseline_seconds = baseline['benchmarks'].get(name)
+        if baseline_seconds is not None and seconds > baseline_seconds * (1 + tolerance):
+            regressions.append((name, baseline_seconds, seconds))
+    return regressions
+
+
+def read_results(filepath: str) -> dict:
+    """
+    :param filepath: path to json file with results.
+    :return: results.
+    """
+    with open(filepath) as results_file:
+        return json.load(results_file)
+
+
+def write_results(filepath: str, results: dict):
+    """
+    :param filepath: path to json file with results.
+    :param results: results returned by run_benchmarks.
+    """
+    with open(filepath, 'w') as results_file:
+        json.dump(results, results_file, indent=2, sort_keys=True)
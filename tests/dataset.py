@@ -2,11 +2,30 @@
 Contains aigym.dataset package tests.
 """
 import os
+import re
+import json
+from hashlib import sha256
+from http.server import HTTPServer, BaseHTTPRequestHandler
+from pickle import dumps, loads
+from threading import Thread
+from concurrent.futures import ThreadPoolExecutor
+from tempfile import TemporaryDirectory
 
+from importlib.util import find_spec
 from unittest import TestCase, skipUnless
 
+from numpy import zeros, uint8, int8, float32, array, arange, concatenate, load, save, memmap, array_equal
+from numpy import fromstring
+from numpy.random import RandomState
+
 from aigym.dataset import Fer2013RawDataset, Fer2013PreparedDataset
-from aigym.dataset.classifiers import FRONTALFACE_CASCADE_CLASSIFIER, detect_face
+from aigym.dataset.cache import PreparationCache
+from aigym.dataset.storage import NpyAppender
+from aigym.dataset.loaders import BatchLoader, Augmentation
+from aigym.dataset.download import download, split_segments
+from aigym.dataset.classifiers import FRONTALFACE_CASCADE_CLASSIFIER, FaceDetector, AlignedFaceDetector
+from aigym.dataset.classifiers import detect_face, crop_largest_face
+from aigym.tests.benchmarks import write_synthetic_fer2013_csv, benchmark_prepare, compare_with_baseline
 
 
 class Fer2013DatasetTestCase(TestCase):
@@ -38,6 +57,383 @@ class Fer2013DatasetTestCase(TestCase):
         )
 
 
+class Fer2013RawDatasetDecodingTestCase(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.fer2013_raw_dataset = Fer2013RawDataset()
+
+    def test_to_images_data(self):
+        images_data = self.fer2013_raw_dataset.to_images_data(('1 ' * 48 * 48, '255 ' * 48 * 48))
+        self.assertEqual(images_data.shape, (2, 48, 48))
+        self.assertEqual(images_data.dtype, uint8)
+        self.assertEqual(images_data[1, 0, 0], 255)
+
+    def test_to_images_data_with_invalid_pixels(self):
+        with self.assertRaises(ValueError):
+            self.fer2013_raw_dataset.to_images_data(('1 2 3', ))
+        with self.assertRaises(ValueError):
+            self.fer2013_raw_dataset.to_images_data(('1 ' * (48 * 48 - 1), '1 ' * (48 * 48 + 1)))
+
+    @skipUnless(find_spec('PIL'), "Pillow is not installed")
+    def test_to_images_data_matches_pil_conversion(self):
+        from PIL.Image import fromarray
+
+        with TemporaryDirectory() as dir_path:
+            raw_filepath = write_synthetic_fer2013_csv(os.path.join(dir_path, 'raw.csv'), rows=10)
+            with open(raw_filepath) as raw_file:
+                pixels = [line.split(',')[1] for line in raw_file.readlines()[1:]]
+        for row_pixels, image_data in zip(pixels, self.fer2013_raw_dataset.to_images_data(pixels)):
+            bgr_image = array(
+                fromarray(fromstring(row_pixels, dtype=uint8, sep=' ').reshape((48, 48))).convert('RGB')
+            )[:, :, ::-1].copy()
+            self.assertTrue(array_equal(self.fer2013_raw_dataset.gray_scale(bgr_image), image_data))
+            expected_image = self.fer2013_raw_dataset.format(bgr_image)
+            image = self.fer2013_raw_dataset.format(image_data)
+            self.assertTrue(expected_image is None and image is None or array_equal(expected_image, image))
+
+    def test_gray_scale_keeps_grayscale_image(self):
+        image = zeros((48, 48), uint8)
+        self.assertIs(self.fer2013_raw_dataset.gray_scale(image), image)
+
+
+class Fer2013PreparedDatasetMmapTestCase(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.temporary_dir = TemporaryDirectory()
+        cls.fer2013_prepared_dataset = Fer2013PreparedDataset()
+        for attribute_name in dir(cls.fer2013_prepared_dataset):
+            if attribute_name.endswith('_filepath'):
+                filepath = os.path.join(cls.temporary_dir.name, '{}.npy'.format(attribute_name))
+                setattr(cls.fer2013_prepared_dataset, attribute_name, filepath)
+                save(filepath, zeros((3, 7) if 'labels' in attribute_name else (3, 48, 48)))
+
+    def test_load_mmap(self):
+        self.fer2013_prepared_dataset.load(mmap=True)
+        self.assertIsInstance(self.fer2013_prepared_dataset.images, memmap)
+        self.assertEqual(self.fer2013_prepared_dataset.images.shape, (3, 48, 48, 1))
+        self.assertEqual(self.fer2013_prepared_dataset.test_images_labels.shape, (3, 7))
+        self.assertFalse(self.fer2013_prepared_dataset.images.flags.writeable)
+
+    def test_load_compact_mmap(self):
+        self.fer2013_prepared_dataset.load(compact=True, mmap=True)
+        self.assertIsInstance(self.fer2013_prepared_dataset.images, memmap)
+        self.assertEqual(self.fer2013_prepared_dataset.images_labels.dtype, int8)
+        images, labels = next(iter(self.fer2013_prepared_dataset.batches(batch_size=2, shuffle=False)))
+        self.assertEqual((images.dtype, images.shape, labels.shape), (float32, (2, 48, 48, 1), (2, 7)))
+
+    @classmethod
+    def tearDownClass(cls):
+        del cls.fer2013_prepared_dataset
+        cls.temporary_dir.cleanup()
+
+
+class Fer2013PreparedDatasetCompactTestCase(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.fer2013_prepared_dataset = Fer2013PreparedDataset()
+
+    def test_labels_conversion(self):
+        indices = array([0, 3, 6], int8)
+        vectors = self.fer2013_prepared_dataset.to_vectors(indices)
+        self.assertEqual(vectors.shape, (3, 7))
+        self.assertTrue(array_equal(self.fer2013_prepared_dataset.to_indices(vectors), indices))
+
+    def test_images_conversion(self):
+        images = arange(256, dtype=uint8).reshape([-1, 16])
+        normalized_images = self.fer2013_prepared_dataset.normalize_images(images)
+        self.assertEqual(normalized_images.max(), 1.0)
+        self.assertTrue(array_equal(self.fer2013_prepared_dataset.compact_images(normalized_images), images))
+
+
+class BatchLoaderTestCase(TestCase):
+    def setUp(self):
+        self.images = arange(10 * 4, dtype=uint8).reshape([10, 2, 2, 1])
+        self.labels = arange(10, dtype=int8)
+
+    def test_epoch(self):
+        batch_loader = BatchLoader(self.images, self.labels, batch_size=4, workers=2, prefetch=1, seed=0)
+        batches = list(batch_loader)
+        self.assertEqual([len(images) for images, _ in batches], [4, 4, 2])
+        labels = concatenate([labels for _, labels in batches])
+        self.assertEqual(sorted(labels), list(self.labels))
+        self.assertTrue(all(array_equal(images[:, 0, 0, 0], labels * 4) for images, labels in batches))
+        self.assertFalse(array_equal(concatenate([labels for _, labels in batch_loader]), labels))
+
+    def test_determinism(self):
+        first_labels, second_labels = (
+            concatenate([labels for _, labels in BatchLoader(self.images, self.labels, 3, workers=3, seed=1)])
+            for _ in range(2)
+        )
+        self.assertTrue(array_equal(first_labels, second_labels))
+
+    def test_drop_last_without_shuffle(self):
+        batch_loader = BatchLoader(self.images, self.labels, batch_size=4, shuffle=False, drop_last=True)
+        self.assertEqual(len(batch_loader), 2)
+        self.assertEqual([list(labels) for _, labels in batch_loader], [[0, 1, 2, 3], [4, 5, 6, 7]])
+
+    def test_exception(self):
+        batch_loader = BatchLoader(self.images, self.labels, transform=lambda images, labels: 1 / 0)
+        with self.assertRaises(ZeroDivisionError):
+            list(batch_loader)
+
+    def test_prepared_dataset_batches(self):
+        fer2013_prepared_dataset = Fer2013PreparedDataset()
+        fer2013_prepared_dataset.images, fer2013_prepared_dataset.images_labels = self.images, self.labels % 7
+        images, labels = next(iter(fer2013_prepared_dataset.batches(batch_size=10, shuffle=False)))
+        self.assertEqual((images.dtype, images.max()), (float32, 39 / 255))
+        self.assertEqual(labels.shape, (10, 7))
+
+
+class AugmentationTestCase(TestCase):
+    def setUp(self):
+        self.images = RandomState(0).random_sample((8, 6, 6, 1)).astype(float32)
+
+    def test_flip(self):
+        augmented_images = Augmentation(flip=1, max_shift=0, brightness=0)(self.images.copy(), RandomState(0))
+        self.assertTrue(array_equal(augmented_images, self.images[:, :, ::-1]))
+
+    def test_shift_and_brightness(self):
+        augmented_images = Augmentation(flip=0, max_shift=1, brightness=0.2)(self.images.copy(), RandomState(0))
+        self.assertEqual((augmented_images.shape, augmented_images.dtype), (self.images.shape, float32))
+        self.assertTrue(0 <= augmented_images.min() and augmented_images.max() <= 1)
+        self.assertFalse(array_equal(augmented_images, self.images))
+
+    def test_invalid_flip(self):
+        with self.assertRaises(ValueError):
+            Augmentation(flip=2)
+
+
+class RangeRequestHandler(BaseHTTPRequestHandler):
+    """
+    Serves server.content supporting Range requests if server.accept_ranges is True.
+    """
+    def do_HEAD(self):
+        self.respond(send_body=False)
+
+    def do_GET(self):
+        self.respond(send_body=True)
+
+    def respond(self, send_body):
+        content = self.server.content
+        match = re.match(r'bytes=(\d+)-(\d*)$', self.headers.get('Range', ''))
+        if match and self.server.accept_ranges:
+            start = int(match.group(1))
+            end = int(match.group(2)) + 1 if match.group(2) else len(content)
+            self.send_response(206)
+            self.send_header('Content-Range', 'bytes {}-{}/{}'.format(start, end - 1, len(content)))
+            content = content[start:end]
+            self.server.ranges.append((start, end))
+        else:
+            self.send_response(200)
+        if self.server.accept_ranges:
+            self.send_header('Accept-Ranges', 'bytes')
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        if send_body:
+            self.wfile.write(content)
+
+    def log_message(self, *args):
+        pass
+
+
+class DownloadTestCase(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = HTTPServer(('127.0.0.1', 0), RangeRequestHandler)
+        cls.server.content = bytes(range(256)) * 1000
+        cls.server_thread = Thread(target=cls.server.serve_forever, daemon=True)
+        cls.server_thread.start()
+        cls.url = 'http://127.0.0.1:{}/fer2013.tar.gz'.format(cls.server.server_address[1])
+
+    def setUp(self):
+        self.server.accept_ranges = True
+        self.server.ranges = []
+        self.temporary_dir = TemporaryDirectory()
+        self.filepath = os.path.join(self.temporary_dir.name, 'fer2013.tar.gz')
+
+    def read(self):
+        with open(self.filepath, 'rb') as file:
+            return file.read()
+
+    def test_download(self):
+        downloaded = []
+        download(self.url, self.filepath, chunk_size=4096, progress=downloaded.append)
+        self.assertEqual(self.read(), self.server.content)
+        self.assertEqual(sum(downloaded), len(self.server.content))
+        self.assertEqual(os.listdir(self.temporary_dir.name), ['fer2013.tar.gz'])
+
+    def test_segments(self):
+        download(self.url, self.filepath, segments=4, sha256=sha256(self.server.content).hexdigest())
+        self.assertEqual(self.read(), self.server.content)
+        self.assertEqual(len(self.server.ranges), 4)
+
+    def test_resume(self):
+        content = self.server.content
+        segments = split_segments(len(content), 2)
+        segments[0][2] = 1000
+        with open(self.filepath + '.part', 'wb') as part_file:
+            part_file.write(content[:1000] + bytes(len(content) - 1000))
+        with open(self.filepath + '.part.json', 'w') as state_file:
+            json.dump({'url': self.url, 'length': len(content), 'segments': segments}, state_file)
+        download(self.url, self.filepath)
+        self.assertEqual(self.read(), content)
+        self.assertEqual(self.server.ranges, [(1000, segments[0][1]), (segments[1][0], len(content))])
+
+    def test_progress_saved_on_error(self):
+        def progress(size):
+            downloaded.append(size)
+            if sum(downloaded) >= 3 * 4096:
+                raise ConnectionResetError("connection lost")
+
+        downloaded = []
+        with self.assertRaises(ConnectionResetError):
+            download(self.url, self.filepath, chunk_size=4096, progress=progress, save_interval=3600)
+        with open(self.filepath + '.part.json') as state_file:
+            self.assertEqual(json.load(state_file)['segments'][0][2], 3 * 4096)
+        download(self.url, self.filepath, chunk_size=4096)
+        self.assertEqual(self.read(), self.server.content)
+        self.assertEqual(self.server.ranges[-1], (3 * 4096, len(self.server.content)))
+
+    def test_without_ranges(self):
+        self.server.accept_ranges = False
+        download(self.url, self.filepath, segments=4)
+        self.assertEqual(self.read(), self.server.content)
+
+    def test_checksum_mismatch(self):
+        with self.assertRaises(ValueError):
+            download(self.url, self.filepath, sha256='0' * 64)
+        self.assertEqual(os.listdir(self.temporary_dir.name), [])
+
+    def tearDown(self):
+        self.temporary_dir.cleanup()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+
+class NpyAppenderTestCase(TestCase):
+    def test_append(self):
+        chunks = [arange(i * 14, (i + 1) * 14, dtype=float).reshape([-1, 7]) for i in range(3)]
+        with TemporaryDirectory() as dir_path:
+            filepath = os.path.join(dir_path, 'appended.npy')
+            with NpyAppender(filepath) as appender:
+                for chunk in chunks:
+                    appender.append(chunk)
+            self.assertTrue(array_equal(load(filepath), concatenate(chunks)))
+
+    def test_append_nothing(self):
+        with TemporaryDirectory() as dir_path:
+            filepath = os.path.join(dir_path, 'empty.npy')
+            with NpyAppender(filepath) as appender:
+                appender.append([])
+            self.assertEqual(load(filepath).shape, (0, ))
+
+
+class PreparationCacheTestCase(TestCase):
+    def test_key(self):
+        self.assertEqual(PreparationCache.key('Training', {'a': 1}), PreparationCache.key('Training', {'a': 1}))
+        self.assertNotEqual(PreparationCache.key('Training', {'a': 1}), PreparationCache.key('Training', {'a': 2}))
+        self.assertNotEqual(PreparationCache.key('Training', {'a': 1}), PreparationCache.key('PublicTest', {'a': 1}))
+
+    def test_is_fresh(self):
+        with TemporaryDirectory() as dir_path:
+            manifest_filepath = os.path.join(dir_path, 'manifest.json')
+            raw_filepath = os.path.join(dir_path, 'raw.csv')
+            with open(raw_filepath, 'w') as raw_file:
+                raw_file.write('emotion,pixels,Usage\n')
+            cache = PreparationCache(manifest_filepath)
+            key = cache.key('Training', {'raw_file_digest': cache.digest_of(raw_filepath)})
+            cache.update('Training', key)
+            cache.save()
+            self.assertTrue(PreparationCache(manifest_filepath).is_fresh('Training', key, (raw_filepath, )))
+            self.assertFalse(PreparationCache(manifest_filepath).is_fresh('Training', 'other key', (raw_filepath, )))
+
+    def test_relocation(self):
+        with TemporaryDirectory() as dir_path:
+            raw_filepath = os.path.join(dir_path, 'checkout', 'raw.csv')
+            os.mkdir(os.path.dirname(raw_filepath))
+            with open(raw_filepath, 'w') as raw_file:
+                raw_file.write('emotion,pixels,Usage\n')
+            cache = PreparationCache(os.path.join(dir_path, 'checkout', 'manifest.json'))
+            digest = cache.digest_of(raw_filepath)
+            cache.save()
+            os.rename(os.path.dirname(raw_filepath), os.path.join(dir_path, 'moved'))
+            moved_cache = PreparationCache(os.path.join(dir_path, 'moved', 'manifest.json'))
+            with open(moved_cache.manifest_filepath) as manifest_file:
+                self.assertEqual(list(json.load(manifest_file)['files']), ['raw.csv'])
+            self.assertEqual(moved_cache.digest_of(os.path.join(dir_path, 'moved', 'raw.csv')), digest)
+
+    def test_parameters_without_absolute_paths(self):
+        parameters = Fer2013RawDataset().preparation_parameters
+        self.assertEqual(parameters['face_detector_parameters']['filepath'], 'haarcascade_frontalface_default.xml')
+        self.assertNotIn(os.sep, json.dumps(parameters))
+
+
+class SyntheticFer2013BenchmarksTestCase(TestCase):
+    def test_benchmark_prepare(self):
+        with TemporaryDirectory() as dir_path:
+            raw_filepath = write_synthetic_fer2013_csv(os.path.join(dir_path, 'raw.csv'), rows=20)
+            results = benchmark_prepare(dir_path, raw_filepath, repeat=1)
+            self.assertTrue(
+                {'prepare.decode', 'prepare.detect_face', 'prepare.resize', 'prepare.total'} <= set(results)
+            )
+            self.assertEqual(len(load(os.path.join(dir_path, 'fer2013_images.npy'))), 16)
+
+    def test_prepare_with_workers(self):
+        with TemporaryDirectory() as dir_path:
+            raw_filepath = write_synthetic_fer2013_csv(os.path.join(dir_path, 'raw.csv'), rows=20)
+            prepared_arrays = []
+            for prepare_kwargs in ({}, {'workers': 2, 'chunk_size': 3}):
+                benchmark_prepare(dir_path, raw_filepath, repeat=1, **prepare_kwargs)
+                prepared_arrays.append([
+                    load(os.path.join(dir_path, filename)) for filename in sorted(os.listdir(dir_path))
+                    if filename.endswith('.npy')
+                ])
+            self.assertEqual(len(prepared_arrays[0]), 6)
+            for serial_array, parallel_array in zip(*prepared_arrays):
+                self.assertTrue(array_equal(serial_array, parallel_array))
+
+    def test_compare_with_baseline(self):
+        baseline = {'benchmarks': {'load.default': 1.0, 'load.mmap': 1.0, 'prepare.total': 1.0}}
+        results = {'benchmarks': {'load.default': 1.1, 'load.mmap': 1.5, 'respond_on.1': 1.0}}
+        self.assertEqual(compare_with_baseline(results, baseline, tolerance=0.25), [('load.mmap', 1.0, 1.5)])
+
+
 class DatasetClassifiersModuleTestCase(TestCase):
     def test_detect_face(self):
         self.assertIsNone(detect_face(None, FRONTALFACE_CASCADE_CLASSIFIER))
+
+    def test_crop_largest_face(self):
+        image = arange(100 * 100).reshape([100, 100])
+        face = crop_largest_face(image, array([[0, 0, 10, 10], [5, 20, 30, 30], [50, 50, 30, 30]]))
+        self.assertTrue(array_equal(face, image[20:50, 5:35]))
+        self.assertIsNone(crop_largest_face(image, ()))
+
+
+class FaceDetectorTestCase(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.face_detector = FaceDetector()
+
+    def test_detect(self):
+        self.assertIsNone(self.face_detector.detect(None))
+
+    def test_detect_batch(self):
+        images = [zeros((96, 96), uint8) for _ in range(4)]
+        with ThreadPoolExecutor(2) as executor:
+            self.assertEqual(self.face_detector.detect_batch(images, executor), [None] * 4)
+
+    def test_pickling(self):
+        face_detector = loads(dumps(FaceDetector(min_size=(30, 30), downscale=0.5)))
+        self.assertEqual(face_detector.min_size, (30, 30))
+        self.assertEqual(face_detector.downscale, 0.5)
+
+    def test_invalid_downscale(self):
+        with self.assertRaises(ValueError):
+            FaceDetector(downscale=2)
+
+    def test_aligned_face_detector(self):
+        image = arange(48 * 40, dtype=uint8).reshape([48, 40])
+        self.assertTrue(array_equal(AlignedFaceDetector().detect(image), image))
@@ -0,0 +1,86 @@
+"""
+Contains aigym cold start tests.
+
+Each import or command-line interface help is run in a fresh interpreter and must fit in its time budget
+without importing heavy dependencies, which must be loaded only on their first use.
+Budgets are generous, they are multiplied by AIGYM_TIME_BUDGET_SCALE environment variable, e.g. on slow machines.
+"""
+import os
+import sys
+from subprocess import run, PIPE
+from time import monotonic
+from unittest import TestCase
+from unittest.mock import patch
+
+from numpy import zeros, uint8
+
+from aigym.conf.settings import AIGYM_DIR, HAARCASCADE_FRONTALFACE_CLASSIFIER_FILEPATH
+
+HEAVY_MODULES_NAMES = ('tensorflow', 'tflearn', 'cv2', 'pandas', 'PIL', 'tqdm', 'matplotlib')
+
+TIME_BUDGET_SCALE = float(os.environ.get('AIGYM_TIME_BUDGET_SCALE', 1.0))
+
+IMPORT_TIME_BUDGETS = (
+    ('aigym', 1.0),
+    ('aigym.conf', 1.0),
+    ('aigym.conf.settings', 1.0),
+    ('aigym.metrics', 1.0),
+    ('aigym.dataset', 2.0),
+    ('aigym.backends', 2.0),
+)
+
+HELP_TIME_BUDGETS = (
+    ('aigym', 2.0),
+    ('aigym.app', 2.0),
+    ('aigym.dataset', 3.0),
+    ('aigym.backends', 3.0),
+    ('aigym.tests', 2.0),
+)
+
+
+def run_python(*args: str):
+    """
+    Runs python interpreter with aigym on its path.
+
+    :param args: interpreter arguments.
+    :return: tuple of two values - completed process object, elapsed seconds.
+    """
+    env = dict(os.environ, PYTHONPATH=os.path.dirname(AIGYM_DIR))
+    started = monotonic()
+    completed_process = run((sys.executable, ) + args, stdout=PIPE, stderr=PIPE, env=env, universal_newlines=True)
+    return completed_process, monotonic() - started
+
+
+class ColdStartTestCase(TestCase):
+    def test_imports(self):
+        for module_name, budget in IMPORT_TIME_BUDGETS:
+            with self.subTest(module_name=module_name):
+                completed_process, elapsed = run_python(
+                    '-c',
+                    "import sys, {}; print(' '.join(name for name in {!r} if name in sys.modules))".format(
+                        module_name, HEAVY_MODULES_NAMES
+                    ),
+                )
+                self.assertEqual(completed_process.returncode, 0, completed_process.stderr)
+                self.assertEqual(completed_process.stdout.strip(), '')
+                self.assertLess(elapsed, budget * TIME_BUDGET_SCALE)
+
+    def test_command_line_interfaces_help(self):
+        for module_name, budget in HELP_TIME_BUDGETS:
+            with self.subTest(module_name=module_name):
+                completed_process, elapsed = run_python('-m', module_name, '-h')
+                self.assertEqual(completed_process.returncode, 0, completed_process.stderr)
+                self.assertLess(elapsed, budget * TIME_BUDGET_SCALE)
+
+
+class LazyCascadeClassifierTestCase(TestCase):
+    def test_classifier_loaded_on_first_detection(self):
+        import cv2
+        from aigym.dataset.classifiers import LazyCascadeClassifier, detect_face
+
+        with patch('cv2.CascadeClassifier', wraps=cv2.CascadeClassifier) as cascade_classifier_class:
+            lazy_cascade_classifier = LazyCascadeClassifier(HAARCASCADE_FRONTALFACE_CLASSIFIER_FILEPATH)
+            cascade_classifier_class.assert_not_called()
+            for _ in range(2):
+                detect_face(zeros((48, 48), uint8), lazy_cascade_classifier)
+            cascade_classifier_class.assert_called_once_with(HAARCASCADE_FRONTALFACE_CLASSIFIER_FILEPATH)
@@ -1,11 +1,16 @@
 """
 Contains aigym.logging package tests.
 """
+import os
+import logging
+from concurrent.futures import ThreadPoolExecutor
 from unittest import TestCase
+from uuid import uuid4
 
-from aigym.conf.settings import DEBUG
+from aigym.conf.settings import DEBUG, AIGYM_DIR, AIGYM_LOGFILE_FILENAME
 from aigym.logging import logger
 from aigym.logging.mixins import LoggerMixin
+from aigym.logging.queueing import BoundedQueueHandler, RateLimitFilter
 
 
 class LoggingTestCase(TestCase):
@@ -25,3 +30,55 @@ class LoggingTestCase(TestCase):
 
     def test_mixin_logger_and_global_logger_equality(self):
         self.assertEqual(self.logger_mixin.logger, logger)
+
+
+class QueuedLoggingTestCase(TestCase):
+    def setUp(self):
+        self.level = logger.level
+
+    def test_queued_logging(self):
+        LoggerMixin.enable_queued_logging()
+        self.assertEqual(len(logger.handlers), 1)
+        self.assertIsInstance(logger.handlers[0], BoundedQueueHandler)
+        message = "queued logging test {}".format(uuid4().hex)
+        logger.warning(message)
+        LoggerMixin.disable_queued_logging()
+        self.assertEqual(len(logger.handlers), 2 if DEBUG else 1)
+        with open(os.path.join(AIGYM_DIR, AIGYM_LOGFILE_FILENAME)) as log_file:
+            self.assertIn(message, log_file.read())
+
+    def test_suppressed_records(self):
+        LoggerMixin.set_logging_level(logging.DEBUG)
+        LoggerMixin.enable_queued_logging(max_queue_size=1000, rate=1, burst=3)
+        for index in range(10):
+            logger.debug("queued record {}".format(index))
+        self.assertEqual(LoggerMixin.logging_statistics()['suppressed'], 7)
+
+    def test_stream_handler_detached(self):
+        LoggerMixin.set_logging_level(logging.DEBUG)
+        self.assertEqual(len(logger.handlers), 2)
+        LoggerMixin.set_logging_level(logging.WARNING)
+        self.assertEqual(len(logger.handlers), 2 if DEBUG else 1)
+
+    def test_rate_limit_filter(self):
+        rate_limit_filter = RateLimitFilter(rate=1, burst=2)
+        records = [logging.makeLogRecord({'levelno': logging.DEBUG}) for _ in range(3)]
+        self.assertEqual([rate_limit_filter.filter(record) for record in records], [True, True, False])
+        self.assertTrue(rate_limit_filter.filter(logging.makeLogRecord({'levelno': logging.ERROR})))
+        self.assertEqual(rate_limit_filter.suppressed, 1)
+
+    def test_bounded_queue_handler(self):
+        queue_handler = BoundedQueueHandler(max_queue_size=1)
+        for _ in range(3):
+            queue_handler.handle(logging.makeLogRecord({'msg': 'record'}))
+        self.assertEqual(queue_handler.dropped, 2)
+        record = logging.makeLogRecord({'msg': 'record'})
+        with ThreadPoolExecutor(4) as executor:
+            list(executor.map(lambda _: [queue_handler.enqueue(record) for _ in range(1000)], range(4)))
+        self.assertEqual(queue_handler.dropped, 4002)
+
+    def tearDown(self):
+        LoggerMixin.disable_queued_logging()
+        LoggerMixin.set_logging_level(logging.WARNING)
+        logger.setLevel(self.level)
+        self.assertEqual(LoggerMixin.logging_statistics()['queued'], False)
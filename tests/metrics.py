@@ -0,0 +1,120 @@
+"""
+Contains aigym.metrics package tests.
+"""
+import os
+import json
+from tempfile import TemporaryDirectory
+from unittest import TestCase
+from urllib.request import urlopen
+
+from aigym.metrics import metrics, MetricsRegistry, InMemoryExporter, JsonLinesExporter, PrometheusExporter
+from aigym.metrics import render_prometheus
+from aigym.backends.base import instrumented
+from aigym.dataset.mixins import StageTimingsMixin
+
+
+class InstrumentedBackend:
+    name = 'Instrumented'
+
+    @instrumented('respond_on')
+    def respond_on(self, request):
+        if request is None:
+            raise ValueError("request is None")
+        return request
+
+
+class MetricsRegistryTestCase(TestCase):
+    def setUp(self):
+        self.registry = MetricsRegistry(enabled=True, buckets=(0.1, 1.0))
+        self.exporter = self.registry.add_exporter(InMemoryExporter())
+
+    def test_disabled(self):
+        self.registry.disable()
+        self.registry.increment('requests_total')
+        with self.registry.timer('seconds'):
+            pass
+        self.assertEqual(self.registry.counters(), {})
+        self.assertEqual(self.registry.histograms(), {})
+        self.assertEqual(self.exporter.records, [])
+
+    def test_counters_and_histograms(self):
+        self.registry.increment('requests_total', backend='Emrec')
+        self.registry.increment('requests_total', 2, backend='Emrec')
+        for value in (0.05, 0.5, 5.0):
+            self.registry.observe('seconds', value, stage='resize')
+        self.assertEqual(self.registry.counter_value('requests_total', backend='Emrec'), 3)
+        histogram = self.registry.histogram('seconds', stage='resize')
+        self.assertEqual(histogram.count, 3)
+        self.assertEqual(histogram.cumulative_counts(), [(0.1, 1), (1.0, 2), (float('inf'), 3)])
+        self.assertEqual(len(self.exporter.records), 5)
+        self.assertEqual(self.exporter.records[-1]['labels'], {'stage': 'resize'})
+
+    def test_timed(self):
+        timed_function = self.registry.timed('seconds', stage='sum')(sum)
+        self.assertEqual(timed_function((1, 2)), 3)
+        with self.registry.timer('seconds', stage='sum'):
+            pass
+        self.assertEqual(self.registry.histogram('seconds', stage='sum').count, 2)
+
+    def test_render_prometheus(self):
+        self.registry.increment('requests_total', backend='Em"rec')
+        self.registry.observe('seconds', 0.5)
+        text = render_prometheus(self.registry)
+        self.assertIn('# TYPE requests_total counter\nrequests_total{backend="Em\\"rec"} 1\n', text)
+        self.assertIn('seconds_bucket{le="1.0"} 1\n', text)
+        self.assertIn('seconds_bucket{le="+Inf"} 1\n', text)
+        self.assertIn('seconds_count 1\n', text)
+
+
+class MetricsExportersTestCase(TestCase):
+    def test_json_lines_exporter(self):
+        registry = MetricsRegistry(enabled=True)
+        with TemporaryDirectory() as dir_path:
+            filepath = os.path.join(dir_path, 'metrics.jsonl')
+            with registry.add_exporter(JsonLinesExporter(filepath)):
+                registry.increment('requests_total')
+                registry.observe('seconds', 0.5, stage='resize')
+            with open(filepath) as metrics_file:
+                records = [json.loads(line) for line in metrics_file]
+        self.assertEqual([record['type'] for record in records], ['counter', 'histogram'])
+        self.assertEqual(records[1]['labels'], {'stage': 'resize'})
+
+    def test_prometheus_exporter(self):
+        registry = MetricsRegistry(enabled=True)
+        registry.increment('requests_total')
+        exporter = PrometheusExporter(registry)
+        host, port = exporter.start(port=0)
+        try:
+            with urlopen("http://{}:{}/metrics".format(host, port)) as response:
+                self.assertIn('requests_total 1', response.read().decode())
+        finally:
+            exporter.stop()
+        self.assertIsNone(exporter.address)
+
+
+class MetricsInstrumentationTestCase(TestCase):
+    def setUp(self):
+        metrics.reset()
+        metrics.enable()
+
+    def test_instrumented_backend(self):
+        backend = InstrumentedBackend()
+        backend.respond_on(1)
+        with self.assertRaises(ValueError):
+            backend.respond_on(None)
+        histogram = metrics.histogram('aigym_backend_stage_seconds', backend='Instrumented', stage='respond_on')
+        self.assertEqual(histogram.count, 2)
+        self.assertEqual(
+            metrics.counter_value('aigym_backend_stage_errors_total', backend='Instrumented', stage='respond_on'), 1
+        )
+
+    def test_dataset_stages(self):
+        stage_timings_mixin = StageTimingsMixin()
+        with stage_timings_mixin.timed_stage('resize'):
+            pass
+        histogram = metrics.histogram('aigym_dataset_stage_seconds', dataset='StageTimingsMixin', stage='resize')
+        self.assertEqual(histogram.count, 1)
+
+    def tearDown(self):
+        metrics.disable()
+        metrics.reset()